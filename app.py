@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request
+from flask import Flask, Response, render_template, request
 import os
 from config import Config
 from blueprints.dashboard import dashboard_blueprint
@@ -10,6 +10,7 @@ from blueprints.edgar import edgar_blueprint
 from blueprints.court_listener import court_listener_blueprint
 from blueprints.lobby_view import lobby_view_blueprint
 from common import CustomLogger, log_function
+from utils.metrics import render as render_metrics
 
 # Initialize the logger
 logger = CustomLogger.get_logger(__name__)
@@ -36,6 +37,11 @@ def home():
     logger.info("Home page accessed")
     return render_template('index.html')  # Ensure 'index.html' exists in templates/
 
+# Prometheus scrape target: stage latencies, counters and cache hit rates of every worker process
+@app.route('/metrics')
+def metrics():
+    return Response(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 # Unified 404 Error Handler with logging
 @app.errorhandler(404)
 @log_function(logger)
@@ -71,6 +77,12 @@ for directory in required_dirs:
         print(f"Error creating directory {directory}: {e}")
         raise  # Re-raise the exception after logging
 
+# Heavy libraries and clients load on first use; a pre-forking server
+# importing this module in its parent loads them once for all its workers
+if Config.PREWARM:
+    from utils.warmup import warmup
+    warmup()
+
 # Run the application
 if __name__ == '__main__':
     logger.info("Starting the application")
@@ -0,0 +1,5 @@
+# benchmarks/__init__.py
+#
+# Reproducible performance benchmarks of the search and extraction pipeline:
+# synthetic SEDB CSVs and Form 990 PDFs, a mock chat completions server and
+# the stage and end-to-end runner. Run with: python -m benchmarks.run --quick
@@ -0,0 +1,200 @@
+# benchmarks/mock_llm.py
+
+# Standard library imports
+import re
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Third-party library imports
+import yaml
+
+# Start standalone with: python -m benchmarks.mock_llm --port 8099 --latency 0.5
+# and point GPT_API_ENDPOINT at http://127.0.0.1:8099/v1
+_SECTIONS_RE = re.compile(r'Extract only these top-level schema sections: ([^.\n]+)\.')
+_TEXT_RE = re.compile(r'IRS Form 990 Text:\n```text\n(.*)\n```', re.DOTALL)
+_EIN_RE = re.compile(r'\b(\d{2})-?(\d{7})\b')
+_NAME_RE = re.compile(r'Name of organization\s*\n\s*(.+)')
+_YEAR_RE = re.compile(r'For the (\d{4}) calendar year')
+
+# Rough tokens per character of English filing text, as the chunker estimates
+CHARS_PER_TOKEN = 4
+
+
+class MockSettings:
+    """
+    Response timing and failure behaviour of the mock server. Each call
+    sleeps latency + prompt/completion tokens at the given rates, with
+    +/- jitter (a fraction of the total); error_rate of the calls answer
+    429 so the client's retries are exercised.
+    """
+
+    def __init__(self, latency=0.5, jitter=0.2, prompt_tokens_per_second=0.0, completion_tokens_per_second=0.0,
+                 error_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.prompt_tokens_per_second = prompt_tokens_per_second
+        self.completion_tokens_per_second = completion_tokens_per_second
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'errors': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+
+    def delay(self, prompt_tokens, completion_tokens):
+        seconds = self.latency
+        if self.prompt_tokens_per_second:
+            seconds += prompt_tokens / self.prompt_tokens_per_second
+        if self.completion_tokens_per_second:
+            seconds += completion_tokens / self.completion_tokens_per_second
+        with self.lock:
+            return max(0.0, seconds * (1 + self.rng.uniform(-self.jitter, self.jitter)))
+
+    def fail(self):
+        with self.lock:
+            return self.error_rate > 0 and self.rng.random() < self.error_rate
+
+
+def _fill(template, rng, text_fields):
+    # Mirrors the schema skeleton with plausible values
+    if isinstance(template, dict):
+        return {key: text_fields.get(key) or _fill(value, rng, text_fields) for key, value in template.items()}
+    if isinstance(template, list):
+        return [_fill(template[0], rng, {}) for _ in range(rng.randint(1, 4))] if template else []
+    if isinstance(template, bool):
+        return rng.random() < 0.5
+    if isinstance(template, (int, float)):
+        return rng.randint(0, 5000000)
+    return f"SYNTHETIC {rng.randint(1, 9999)}"
+
+
+def completion_content(prompt, schema):
+    """
+    The JSON answer for a prompt: the requested schema sections (all of
+    them unless the prompt names some) filled deterministically from the
+    prompt's hash, with the filing's EIN, name and year where the text has them.
+    """
+    rng = random.Random(hashlib.sha256(prompt.encode('utf-8')).hexdigest())
+    match = _SECTIONS_RE.search(prompt)
+    sections = [key.strip() for key in match.group(1).split(',')] if match else list(schema)
+    text_match = _TEXT_RE.search(prompt)
+    text = text_match.group(1) if text_match else ''
+    text_fields = {}
+    ein = _EIN_RE.search(text)
+    if ein:
+        text_fields['ein'] = ein.group(1) + ein.group(2)
+    name = _NAME_RE.search(text)
+    if name:
+        text_fields['name'] = name.group(1).strip()
+    year = _YEAR_RE.search(text)
+    if year:
+        text_fields['tax_year'] = year.group(1)
+    return json.dumps({section: _fill(schema[section], rng, text_fields if section == 'general_info' else {})
+                       for section in sections if section in schema})
+
+
+def _handler(settings, schema):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                request = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                self._send(400, {'error': {'message': 'Invalid JSON body', 'type': 'invalid_request_error'}})
+                return
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                self._send(404, {'error': {'message': f"Unknown path {self.path}", 'type': 'invalid_request_error'}})
+                return
+            prompt = '\n'.join(str(message.get('content', '')) for message in request.get('messages', []))
+            content = completion_content(prompt, schema)
+            prompt_tokens = len(prompt) // CHARS_PER_TOKEN
+            completion_tokens = len(content) // CHARS_PER_TOKEN
+            failed = settings.fail()
+            time.sleep(settings.delay(prompt_tokens, 0 if failed else completion_tokens))
+            with settings.lock:
+                settings.stats['requests'] += 1
+                if failed:
+                    settings.stats['errors'] += 1
+                else:
+                    settings.stats['prompt_tokens'] += prompt_tokens
+                    settings.stats['completion_tokens'] += completion_tokens
+            if failed:
+                self._send(429, {'error': {'message': 'Rate limit reached (mock)', 'type': 'rate_limit_error'}})
+                return
+            self._send(200, {
+                'id': f"chatcmpl-mock-{hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:24]}",
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': request.get('model', 'mock'),
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content},
+                             'finish_reason': 'stop'}],
+                'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                          'total_tokens': prompt_tokens + completion_tokens},
+            })
+
+        def log_message(self, format, *args):
+            # One line per request would dominate the benchmark output
+            pass
+
+    return Handler
+
+
+def load_schema(schema_path):
+    with open(schema_path, 'r', encoding='utf-8') as f:
+        return (yaml.safe_load(f) or {}).get('schema', {})
+
+
+def start_server(schema_path, settings=None, host='127.0.0.1', port=0):
+    """
+    Starts the mock chat completions server on a daemon thread (port 0 picks
+    a free port).
+    Returns:
+        tuple: (server, base_url for GPT_API_ENDPOINT).
+    """
+    settings = settings or MockSettings()
+    server = ThreadingHTTPServer((host, port), _handler(settings, load_schema(schema_path)))
+    server.daemon_threads = True
+    server.settings = settings
+    threading.Thread(target=server.serve_forever, name='mock-llm', daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve a mock OpenAI chat completions endpoint for benchmarks.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--schema', default='data/schema/schema.yaml', help='Schema whose sections are answered')
+    parser.add_argument('--latency', type=float, default=0.5, help='Base seconds per call')
+    parser.add_argument('--jitter', type=float, default=0.2, help='Latency varies by +/- this fraction')
+    parser.add_argument('--prompt-tps', type=float, default=0.0, help='Prompt tokens processed per second (0: free)')
+    parser.add_argument('--completion-tps', type=float, default=0.0, help='Completion tokens per second (0: free)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of calls answered with 429')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    settings = MockSettings(args.latency, args.jitter, args.prompt_tps, args.completion_tps, args.error_rate, args.seed)
+    server, base_url = start_server(args.schema, settings, args.host, args.port)
+    print(f"Mock chat completions at {base_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(json.dumps(settings.stats))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
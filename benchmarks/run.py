@@ -0,0 +1,484 @@
+# benchmarks/run.py
+
+# Standard library imports
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import datetime
+import subprocess
+
+# Local imports (benchmark helpers only: pipeline modules read Config when
+# imported, so they are imported once the benchmark environment is set)
+from benchmarks import synthetic_sedb, synthetic_990
+from benchmarks.mock_llm import MockSettings, start_server
+
+# Run with: python -m benchmarks.run [--quick] [--baseline previous-results.json]
+# Generates (or reuses) the synthetic data under --workdir, times each
+# pipeline stage in this process against it, runs the batch runner end to
+# end at each concurrency level in a fresh process with empty caches, then
+# writes the results file and checks it against thresholds.json. A threshold
+# whose metric the run did not produce fails unless it is marked "optional"
+# or --allow-missing is given (OCR needs tesseract and poppler installed).
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA_DIR = os.path.join(REPO_DIR, 'data', 'schema')
+THRESHOLDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'thresholds.json')
+
+# 'full' is the size of the IRS BMF with a few hundred searched entities;
+# 'quick' runs in a couple of minutes for a pre-deploy check
+PROFILES = {
+    'quick': {'sedb_rows': 50000, 'entities': 12, 'years': 2, 'pages': 8, 'image_ratio': 0.25,
+              'concurrency': [1, 4], 'latency': 0.2},
+    'full': {'sedb_rows': synthetic_sedb.FULL_SCALE_ROWS, 'entities': 200, 'years': 3, 'pages': 16,
+             'image_ratio': 0.25, 'concurrency': [1, 4, 8, 16], 'latency': 1.0},
+}
+LAST_TAX_YEAR = 2021
+
+
+def _log(message):
+    print(f"[benchmark] {message}", file=sys.stderr, flush=True)
+
+
+def summarize(samples):
+    """
+    Count, total, mean, median, 95th percentile and max of a list of seconds.
+    """
+    if not samples:
+        return {'n': 0}
+    ordered = sorted(samples)
+
+    def percentile(share):
+        return ordered[min(len(ordered) - 1, max(0, int(round(share * len(ordered) + 0.5)) - 1))]
+
+    return {
+        'n': len(ordered),
+        'total': round(sum(ordered), 6),
+        'mean': round(sum(ordered) / len(ordered), 6),
+        'p50': round(percentile(0.5), 6),
+        'p95': round(percentile(0.95), 6),
+        'max': round(ordered[-1], 6),
+    }
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def prepare_data(workdir, params, seed):
+    """
+    Generates the synthetic SEDB, the filings and the names file under
+    workdir/data, unless a manifest shows they were generated with the same
+    parameters.
+    Returns:
+        dict: The manifest (paths, parameters, entities and filings).
+    """
+    data_dir = os.path.join(workdir, 'data')
+    manifest_path = os.path.join(data_dir, 'manifest.json')
+    wanted = {key: params[key] for key in ('sedb_rows', 'entities', 'years', 'pages', 'image_ratio')}
+    wanted['seed'] = seed
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('params') == wanted:
+            _log(f"Reusing synthetic data in {data_dir}")
+            return manifest
+    shutil.rmtree(data_dir, ignore_errors=True)
+
+    _log(f"Generating {params['sedb_rows']} SEDB records")
+    sedb_dir = os.path.join(data_dir, 'sedb')
+    _, entities = synthetic_sedb.generate(sedb_dir, params['sedb_rows'], seed=seed, sample=params['entities'])
+    years = tuple(range(LAST_TAX_YEAR - params['years'] + 1, LAST_TAX_YEAR + 1))
+    _log(f"Generating {len(entities) * len(years)} filings of {params['pages']} pages")
+    pdf_dir = os.path.join(data_dir, 'pdfs')
+    filings = synthetic_990.generate(pdf_dir, entities, years, params['pages'], params['image_ratio'], seed=seed)
+    names_path = os.path.join(data_dir, 'entities.txt')
+    with open(names_path, 'w', encoding='utf-8') as f:
+        f.writelines(f"{entity['NAME']}\n" for entity in entities)
+
+    manifest = {'params': wanted, 'sedb_dir': sedb_dir, 'pdf_dir': pdf_dir, 'names_path': names_path,
+                'entities': [{'ein': entity['EIN'], 'name': entity['NAME']} for entity in entities],
+                'filings': filings}
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def benchmark_env(workdir, run_name, manifest, endpoint, log_level):
+    """
+    Environment of one benchmark run: the synthetic data and mock endpoint,
+    the repo's schema files, and caches, results, jobs, metrics and logs of
+    its own under workdir/runs/<run_name>.
+    """
+    run_dir = os.path.join(workdir, 'runs', run_name)
+    index_dir = os.path.join(workdir, 'index')
+    return {
+        'SEDB_FOLDER': manifest['sedb_dir'],
+        'SEDB_INDEX_DIR': os.path.join(index_dir, 'sedb'),
+        'PDF_FOLDER': manifest['pdf_dir'],
+        'FILING_INDEX_PATH': os.path.join(index_dir, 'filings.pickle'),
+        'EFILE_XML_FOLDER': os.path.join(workdir, 'efile_xml'),
+        'EFILE_INDEX_PATH': os.path.join(index_dir, 'efile.pickle'),
+        'SCHEMA_PATH': os.path.join(SCHEMA_DIR, 'schema.yaml'),
+        'PROMPTS_PATH': os.path.join(SCHEMA_DIR, 'prompts.yaml'),
+        'OUTPUT_REQUIREMENTS_SCHEMA': os.path.join(SCHEMA_DIR, 'output_requirements_schema.yaml'),
+        'GPT_API_ENDPOINT': endpoint,
+        'OPENAI_API_KEY': 'benchmark',
+        'PARSE_CACHE_DIR': os.path.join(run_dir, 'cache', 'parsed'),
+        'LLM_CACHE_DIR': os.path.join(run_dir, 'cache', 'llm'),
+        'RESULTS_DB_PATH': os.path.join(run_dir, 'results.sqlite3'),
+        'JOBS_DIR': os.path.join(run_dir, 'jobs'),
+        'BATCH_CHECKPOINT_DIR': run_dir,
+        'METRICS_DIR': os.path.join(run_dir, 'metrics'),
+        'SHARED_ENTITY_990': os.path.join(run_dir, 'shared_entity_990'),
+        'PARSED_TEXT_DIR': os.path.join(run_dir, 'parsed_text'),
+        'LOG_FILE': os.path.join(run_dir, 'logs', 'app.log'),
+        'UTILS_LOG_FILE': os.path.join(run_dir, 'logs', 'utils.log'),
+        'SEARCH_LOG_FILE': os.path.join(run_dir, 'logs', 'search.log'),
+        'GPT_HANDLER_FILE': os.path.join(run_dir, 'logs', 'gpt_handler.log'),
+        'LOG_LEVEL': log_level,
+    }
+
+
+def ocr_available():
+    return bool(shutil.which('tesseract') and shutil.which('pdftoppm'))
+
+
+def run_stages(manifest, ocr_pages):
+    """
+    Times each pipeline stage in this process on the synthetic data, cold
+    where it matters (the SEDB and filing indexes are built from scratch)
+    and per item otherwise.
+    Returns:
+        dict: {stage: summarize() of its samples, plus stage-specific counts}.
+    """
+    from utils.sedb_index import refresh_index, lookup_eins, search_entities
+    from utils.filing_index import find_filings
+    from utils.utils_functions import search_pdf_by_ein
+    from utils.staging import new_stage_stats
+    from utils.parse_engine import extract_pages_direct, ocr_page_window, join_pages
+    from utils.text_cleaner import clean_text
+    from utils.form990_rules import extract_fields, model_targets
+    from utils.chunking import build_chunks
+    from utils.prompt_templates import get_template, build_prompt
+    from utils.extraction_engine import complete_many
+    from utils.resource_governor import rss_bytes
+
+    stages = {}
+    entities = manifest['entities']
+
+    rss_before = rss_bytes()
+    shards, seconds = _timed(refresh_index)
+    rss_after = rss_bytes()
+    stages['sedb_index_build'] = {**summarize([seconds]), 'shards': len(shards),
+                                  'rss_bytes': (rss_after - rss_before) if rss_before and rss_after else None}
+    _log(f"SEDB index built in {seconds:.2f}s")
+
+    samples, found = [], 0
+    for entity in entities:
+        matches, seconds = _timed(lookup_eins, entity['name'])
+        samples.append(seconds)
+        found += any(ein == entity['ein'] for ein, _ in matches)
+    stages['sedb_lookup'] = {**summarize(samples), 'found': found}
+    stages['sedb_typeahead'] = summarize([_timed(search_entities, entity['name'][:12])[1] for entity in entities])
+
+    _, seconds = _timed(find_filings, entities[0]['ein'])
+    stages['filing_index_build'] = summarize([seconds])
+    stages['filing_lookup'] = summarize([_timed(find_filings, entity['ein'])[1] for entity in entities])
+
+    staging_dir = os.path.join(os.environ['JOBS_DIR'], 'staging')
+    samples, stage_stats = [], new_stage_stats()
+    for entity in entities:
+        os.makedirs(staging_dir, exist_ok=True)
+        samples.append(_timed(search_pdf_by_ein, entity['ein'], stage_stats, dest_dir=staging_dir)[1])
+        shutil.rmtree(staging_dir)
+    stages['staging'] = {**summarize(samples), 'stats': stage_stats}
+    _log("Timed index lookups and staging")
+
+    text_filings = [filing for filing in manifest['filings'] if filing['kind'] == 'text']
+    if text_filings:
+        # Untimed warm-up: the first parse and clean pay for lazy imports and compiled patterns
+        clean_text(join_pages(extract_pages_direct(text_filings[0]['path'])['pages']))
+    texts, samples, page_samples = [], [], []
+    for filing in text_filings:
+        result = extract_pages_direct(filing['path'])
+        samples.append(result['seconds'])
+        page_samples.append(result['seconds'] / max(1, result['page_count'] or 1))
+        texts.append(join_pages(result['pages']))
+    stages['parse_direct'] = summarize(samples)
+    stages['parse_direct_page'] = summarize(page_samples)
+
+    image_filings = [filing for filing in manifest['filings'] if filing['kind'] == 'image']
+    if not ocr_available():
+        stages['parse_ocr_page'] = {'n': 0, 'skipped': 'tesseract or pdftoppm is not installed'}
+    else:
+        samples = []
+        for filing in image_filings:
+            for page_number in range(1, filing['pages'] + 1):
+                if len(samples) >= ocr_pages:
+                    break
+                samples.extend(ocr_page_window(filing['path'], page_number, page_number)['page_seconds'])
+        stages['parse_ocr_page'] = summarize(samples)
+    _log(f"Timed parsing of {len(texts)} text-layer filings")
+
+    cleaned, samples = [], []
+    for text in texts:
+        (cleaned_text, _), seconds = _timed(clean_text, text)
+        cleaned.append(cleaned_text)
+        samples.append(seconds)
+    stages['clean_text'] = summarize(samples)
+
+    template = get_template()
+    rule_samples, chunk_samples, prompt_samples = [], [], []
+    prompts = {}
+    for index, text in enumerate(cleaned):
+        rules, seconds = _timed(extract_fields, text)
+        rule_samples.append(seconds)
+        schema_keys, fields = model_targets(rules, list(template['schema']))
+        chunks, seconds = _timed(build_chunks, text, schema_keys)
+        chunk_samples.append(seconds)
+        for chunk_index, chunk in enumerate(chunks):
+            chunk_fields = [path for path in fields if path.split('.')[0] in chunk['schema_keys']]
+            prompts[(index, chunk_index)], seconds = _timed(build_prompt, chunk['text'], chunk['schema_keys'],
+                                                            template, chunk_fields)
+            prompt_samples.append(seconds)
+    stages['rule_extract'] = summarize(rule_samples)
+    stages['chunking'] = summarize(chunk_samples)
+    stages['prompt_build'] = summarize(prompt_samples)
+
+    responses, seconds = _timed(complete_many, prompts)
+    stages['gpt_call'] = {**summarize([response['seconds'] for response in responses.values()]),
+                          'failed': sum(1 for response in responses.values() if response['error'])}
+    stages['gpt_batch'] = {**summarize([seconds]), 'calls': len(prompts)}
+    _log(f"Timed {len(prompts)} GPT calls against the mock server")
+    return stages
+
+
+def run_end_to_end(workdir, manifest, endpoint, log_level, concurrency):
+    """
+    Runs the batch runner over every entity with `concurrency` workers per
+    stage, in a fresh process with empty caches and results.
+    Returns:
+        dict: Throughput and per-stage mean seconds from the batch summary.
+    """
+    run_name = f"c{concurrency}"
+    env = benchmark_env(workdir, run_name, manifest, endpoint, log_level)
+    run_dir = env['BATCH_CHECKPOINT_DIR']
+    shutil.rmtree(run_dir, ignore_errors=True)
+    os.makedirs(run_dir)
+    checkpoint = os.path.join(run_dir, 'entities.checkpoint.jsonl')
+    command = [sys.executable, '-m', 'utils.batch_runner', manifest['names_path'], '--checkpoint', checkpoint,
+               '--workers', str(concurrency), '--max-in-flight', str(concurrency * 2)]
+    _log(f"End-to-end run at concurrency {concurrency}")
+    start = time.perf_counter()
+    with open(os.path.join(run_dir, 'batch_output.log'), 'w', encoding='utf-8') as output:
+        returncode = subprocess.call(command, cwd=REPO_DIR, env={**os.environ, **env}, stdout=output,
+                                     stderr=subprocess.STDOUT)
+    wall_seconds = time.perf_counter() - start
+    summary_path = f"{os.path.splitext(checkpoint)[0]}.summary.json"
+    if returncode != 0 or not os.path.exists(summary_path):
+        return {'error': f"batch runner exited with {returncode}; see {run_dir}/batch_output.log"}
+    with open(summary_path, 'r', encoding='utf-8') as f:
+        summary = json.load(f)
+    return {
+        'concurrency': concurrency,
+        'entities': summary['entities'],
+        'done': summary['done'],
+        'failed': summary['failed'],
+        'filings': summary['filings'],
+        'seconds': summary['seconds'],
+        'wall_seconds': round(wall_seconds, 3),
+        'entities_per_minute': summary['entities_per_minute'],
+        'filings_per_minute': summary['filings_per_minute'],
+        'stages': {name: totals['mean_seconds'] for name, totals in summary['stages'].items()},
+        'peak_rss_bytes': max((stats.get('peak_rss') or 0 for stats in summary['memory']['stages'].values()),
+                              default=0) or summary['memory']['rss'],
+    }
+
+
+def _flatten(value, prefix=''):
+    if isinstance(value, dict):
+        flat = {}
+        for key, item in value.items():
+            flat.update(_flatten(item, f"{prefix}{key}."))
+        return flat
+    return {prefix[:-1]: value} if isinstance(value, (int, float)) and not isinstance(value, bool) else {}
+
+
+def check_results(results, limits, baseline=None, tolerance=0.25, min_delta=0.005, absolute=True,
+                  allow_missing=False):
+    """
+    Checks results against limits ({metric: {'max': x} or {'min': x}}, metric
+    being a dotted path into the results such as 'stages.sedb_lookup.p95')
+    and, with a baseline results file, flags any of those metrics that got
+    worse by more than tolerance (a share of the baseline value) and by more
+    than min_delta, so millisecond jitter in fast stages is not a regression.
+    A metric missing from the results (e.g. OCR skipped without tesseract)
+    fails its check unless the limit is marked 'optional' or allow_missing is set.
+    Returns:
+        list: One {'metric', 'value', 'status' ('ok', 'failed', 'missing'), 'reason'} per metric.
+    """
+    flat = _flatten(results)
+    baseline_flat = _flatten(baseline) if baseline else {}
+    checks = []
+    for metric, limit in sorted(limits.items()):
+        value = flat.get(metric)
+        check = {'metric': metric, 'value': value, 'status': 'ok', 'reason': None}
+        if value is None:
+            if allow_missing or limit.get('optional'):
+                check['status'] = 'missing'
+            else:
+                check['status'] = 'failed'
+                check['reason'] = 'no value in the results (--allow-missing to accept)'
+            checks.append(check)
+            continue
+        reasons = []
+        if absolute and 'max' in limit and value > limit['max']:
+            reasons.append(f"above the limit {limit['max']}")
+        if absolute and 'min' in limit and value < limit['min']:
+            reasons.append(f"below the limit {limit['min']}")
+        previous = baseline_flat.get(metric)
+        if previous:
+            check['baseline'] = previous
+            if 'max' in limit and value > previous * (1 + tolerance) and value - previous > min_delta:
+                reasons.append(f"{value / previous - 1:.0%} slower than the baseline {previous}")
+            if 'min' in limit and value < previous * (1 - tolerance) and previous - value > min_delta:
+                reasons.append(f"{1 - value / previous:.0%} below the baseline {previous}")
+        if reasons:
+            check['status'] = 'failed'
+            check['reason'] = '; '.join(reasons)
+        checks.append(check)
+    return checks
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, stderr=subprocess.DEVNULL,
+                                       text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the pipeline on synthetic data with a mock LLM server.')
+    parser.add_argument('--quick', action='store_true', help="Use the small 'quick' profile instead of 'full'")
+    parser.add_argument('--workdir', default=os.path.join(REPO_DIR, 'data', 'benchmark'),
+                        help='Synthetic data, indexes and per-run state (default: data/benchmark)')
+    parser.add_argument('--output', help='Results file (default: <workdir>/results-<profile>.json)')
+    parser.add_argument('--thresholds', default=THRESHOLDS_PATH, help='Regression thresholds per profile')
+    parser.add_argument('--baseline', help='Earlier results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed regression against the baseline, as a share (default: 0.25)')
+    parser.add_argument('--min-delta', type=float, default=0.005,
+                        help='Smaller regressions against the baseline are ignored (default: 0.005, i.e. 5ms)')
+    parser.add_argument('--sedb-rows', type=int, help='SEDB records to generate')
+    parser.add_argument('--entities', type=int, help='Entities given filings and searched')
+    parser.add_argument('--years', type=int, help='Filings (tax years) per entity')
+    parser.add_argument('--pages', type=int, help='Pages per filing')
+    parser.add_argument('--image-ratio', type=float, help='Share of image-only (scanned) filings')
+    parser.add_argument('--concurrency', help='Comma-separated batch workers per stage, e.g. 1,4,8')
+    parser.add_argument('--latency', type=float, help='Mock LLM base seconds per call')
+    parser.add_argument('--jitter', type=float, default=0.2, help='Mock LLM latency varies by +/- this share')
+    parser.add_argument('--completion-tps', type=float, default=0.0, help='Mock LLM completion tokens per second')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of mock LLM calls answered with 429')
+    parser.add_argument('--ocr-pages', type=int, default=20, help='Pages OCR\'d for the OCR stage timing')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--log-level', default='WARNING', help='LOG_LEVEL of the benchmarked pipeline')
+    parser.add_argument('--skip-end-to-end', action='store_true', help='Only time the individual stages')
+    parser.add_argument('--allow-missing', action='store_true',
+                        help='Do not fail thresholds whose metric the run did not produce (e.g. OCR without tesseract)')
+    args = parser.parse_args(argv)
+
+    profile = 'quick' if args.quick else 'full'
+    params = dict(PROFILES[profile])
+    overrides = {'sedb_rows': args.sedb_rows, 'entities': args.entities, 'years': args.years, 'pages': args.pages,
+                 'image_ratio': args.image_ratio, 'latency': args.latency,
+                 'concurrency': [int(level) for level in args.concurrency.split(',')] if args.concurrency else None}
+    customized = {key: value for key, value in overrides.items() if value is not None and value != params[key]}
+    params.update(customized)
+
+    # Read before the run so a bad path fails fast
+    with open(args.thresholds, 'r', encoding='utf-8') as f:
+        limits = json.load(f).get(profile, {})
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    workdir = os.path.abspath(args.workdir)
+    manifest = prepare_data(workdir, params, args.seed)
+    settings = MockSettings(params['latency'], args.jitter, completion_tokens_per_second=args.completion_tps,
+                            error_rate=args.error_rate, seed=args.seed)
+    server, endpoint = start_server(os.path.join(SCHEMA_DIR, 'schema.yaml'), settings)
+    _log(f"Mock chat completions at {endpoint}")
+
+    # Indexes are rebuilt from scratch so the stage timings include the cold build
+    shutil.rmtree(os.path.join(workdir, 'index'), ignore_errors=True)
+    stage_env = benchmark_env(workdir, 'stages', manifest, endpoint, args.log_level)
+    shutil.rmtree(stage_env['BATCH_CHECKPOINT_DIR'], ignore_errors=True)
+    os.environ.update(stage_env)
+    started = time.time()
+    stages = run_stages(manifest, args.ocr_pages)
+
+    end_to_end = {}
+    if not args.skip_end_to_end:
+        for concurrency in params['concurrency']:
+            end_to_end[f"c{concurrency}"] = run_end_to_end(workdir, manifest, endpoint, args.log_level, concurrency)
+    server.shutdown()
+
+    results = {
+        'meta': {
+            'profile': profile if not customized else f"{profile}+custom",
+            'params': {**params, 'seed': args.seed, 'jitter': args.jitter, 'completion_tps': args.completion_tps,
+                       'error_rate': args.error_rate, 'log_level': args.log_level},
+            'started': datetime.datetime.fromtimestamp(started, datetime.timezone.utc).isoformat(),
+            'seconds': round(time.time() - started, 3),
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'ocr_available': ocr_available(),
+            'mock_llm': settings.stats,
+        },
+        'stages': stages,
+        'end_to_end': end_to_end,
+    }
+
+    # Absolute limits only hold for the profile's own sizes; a baseline still applies
+    # End-to-end levels left out on purpose (--skip-end-to-end, --concurrency) are not checked
+    limits = {metric: limit for metric, limit in limits.items()
+              if not metric.startswith('end_to_end.') or metric.split('.')[1] in end_to_end}
+    checks = check_results(results, limits, baseline, args.tolerance, args.min_delta, absolute=not customized,
+                           allow_missing=args.allow_missing)
+    results['checks'] = checks
+    results['passed'] = all(check['status'] != 'failed' for check in checks)
+
+    output = args.output or os.path.join(workdir, f"results-{profile}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+
+    for name, stats in stages.items():
+        if stats.get('n'):
+            print(f"{name:20} n={stats['n']:<5} p50={stats['p50']:.4f}s p95={stats['p95']:.4f}s max={stats['max']:.4f}s")
+        else:
+            print(f"{name:20} {stats.get('skipped', 'no samples')}")
+    for run in end_to_end.values():
+        if 'error' in run:
+            print(f"end-to-end: {run['error']}")
+            continue
+        print(f"end-to-end c={run['concurrency']:<3} {run['entities_per_minute']} entities/min, "
+              f"{run['filings_per_minute']} filings/min ({run['done']} done, {run['failed']} failed)")
+    for check in checks:
+        if check['status'] != 'ok':
+            print(f"{check['status'].upper()}: {check['metric']} = {check['value']} {check['reason'] or ''}")
+    print(f"Results written to {output}: {'passed' if results['passed'] else 'REGRESSION'}")
+    return 0 if results['passed'] else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
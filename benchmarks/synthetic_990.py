@@ -0,0 +1,230 @@
+# benchmarks/synthetic_990.py
+
+# Standard library imports
+import os
+import zlib
+import random
+import textwrap
+
+# Third-party library imports
+from PIL import Image, ImageDraw, ImageFont
+
+# US Letter in PDF points; the text layer is set in 9pt Courier
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+FONT_SIZE = 9
+LEADING = 11
+MARGIN = 36
+LINE_CHARS = 100
+LINES_PER_PAGE = (PAGE_HEIGHT - 2 * MARGIN) // LEADING
+
+_PEOPLE = ('JANE DOE', 'JOHN SMITH', 'MARIA GARCIA', 'ROBERT JOHNSON', 'LINDA WILLIAMS', 'DAVID BROWN',
+           'SUSAN MILLER', 'JAMES DAVIS', 'KAREN WILSON', 'MICHAEL MOORE', 'PATRICIA TAYLOR', 'THOMAS ANDERSON')
+_TITLES = ('PRESIDENT', 'VICE PRESIDENT', 'TREASURER', 'SECRETARY', 'DIRECTOR', 'EXECUTIVE DIRECTOR', 'CHAIR')
+_PURPOSES = ('GENERAL SUPPORT', 'SCHOLARSHIPS', 'FOOD ASSISTANCE', 'YOUTH PROGRAMS', 'DISASTER RELIEF',
+             'CAPITAL CAMPAIGN', 'MEDICAL RESEARCH', 'ARTS EDUCATION')
+_MISSIONS = ('TO PROVIDE SAFE AND AFFORDABLE HOUSING FOR LOW INCOME FAMILIES IN THE REGION.',
+             'TO SUPPORT LOCAL SCHOOLS THROUGH SCHOLARSHIPS, MENTORING AND LITERACY PROGRAMS.',
+             'TO RELIEVE HUNGER BY COLLECTING AND DISTRIBUTING FOOD TO PARTNER PANTRIES.',
+             'TO PRESERVE AND SHARE THE HISTORY OF THE COMMUNITY THROUGH EXHIBITS AND EVENTS.')
+_EXPENSE_LINES = ('Grants and other assistance to domestic organizations', 'Compensation of current officers',
+                  'Other salaries and wages', 'Pension plan accruals and contributions', 'Payroll taxes',
+                  'Fees for services (legal)', 'Fees for services (accounting)', 'Advertising and promotion',
+                  'Office expenses', 'Information technology', 'Occupancy', 'Travel', 'Conferences, meetings',
+                  'Interest', 'Depreciation, depletion, and amortization', 'Insurance')
+
+
+def _amount(value):
+    return f"{value:,}"
+
+
+def filing_pages(organization, tax_year, pages=12, seed=0):
+    """
+    Text of a synthetic Form 990 laid out like a parsed filing: the header,
+    Part I summary lines, Part VII officers, a Schedule I grant list and
+    Part IX expense pages up to `pages` pages, with the running header real
+    filings repeat on every page.
+    Args:
+        organization (dict): An SEDB record ({column: value}) with EIN and NAME.
+    Returns:
+        list: One list of text lines per page.
+    """
+    rng = random.Random(f"{seed}:{organization['EIN']}:{tax_year}")
+    ein, name = organization['EIN'], organization['NAME']
+    revenue = rng.randint(50000, 50000000)
+    expenses = int(revenue * rng.uniform(0.7, 1.1))
+    net_assets = rng.randint(10000, 80000000)
+    members = [(rng.choice(_PEOPLE), rng.choice(_TITLES), rng.choice((0, 0, rng.randint(20000, 400000))))
+               for _ in range(rng.randint(3, 12))]
+    grants = [(f"{rng.choice(('COMMUNITY', 'REGIONAL', 'COUNTY'))} {rng.choice(('SCHOOL', 'CLINIC', 'SHELTER'))} "
+               f"{rng.randint(1, 99)}", f"{rng.randint(10, 99)}-{rng.randint(1000000, 9999999)}",
+               rng.randint(1000, 500000), rng.choice(_PURPOSES)) for _ in range(rng.randint(5, 40))]
+
+    result = [[
+        f"Form 990 Return of Organization Exempt From Income Tax OMB No. 1545-0047 {tax_year}",
+        "Department of the Treasury Internal Revenue Service Open to Public Inspection",
+        f"A For the {tax_year} calendar year, or tax year beginning 01-01-{tax_year}, and ending 12-31-{tax_year}",
+        "B Check if applicable: Address change Name change Initial return Final return Amended return",
+        "C Name of organization",
+        name,
+        "D Employer identification number",
+        f"{ein[:2]}-{ein[2:]}",
+        f"Doing business as {organization.get('ICO', '').lstrip('% ')}",
+        f"Number and street {organization.get('STREET', '')} Room/suite E Telephone number",
+        f"City or town {organization.get('CITY', '')}, {organization.get('STATE', '')} {organization.get('ZIP', '')}",
+        f"G Gross receipts $ {_amount(int(revenue * 1.05))}",
+        f"F Name and address of principal officer: {members[0][0]}",
+        "I Tax-exempt status: X 501(c)(3) 501(c) ( ) (insert no.) 4947(a)(1) or 527",
+        "Part I Summary",
+        f"1 Briefly describe the organization's mission or most significant activities: {rng.choice(_MISSIONS)}",
+        "2 Check this box if the organization discontinued its operations or disposed of more than 25% of its net assets.",
+        f"3 Number of voting members of the governing body (Part VI, line 1a) 3 {len(members)}",
+        f"4 Number of independent voting members of the governing body (Part VI, line 1b) 4 {len(members) - 1}",
+        f"8 Contributions and grants (Part VIII, line 1h) {_amount(int(revenue * 0.7))} {_amount(int(revenue * 0.75))}",
+        f"9 Program service revenue (Part VIII, line 2g) {_amount(int(revenue * 0.2))} {_amount(int(revenue * 0.2))}",
+        f"12 Total revenue - add lines 8 through 11 {_amount(int(revenue * 0.93))} {_amount(revenue)}",
+        f"13 Grants and similar amounts paid (Part IX, column (A), lines 1-3) {_amount(sum(g[2] for g in grants))}",
+        f"18 Total expenses. Add lines 13-17 {_amount(int(expenses * 0.95))} {_amount(expenses)}",
+        f"19 Revenue less expenses. Subtract line 18 from line 12 {_amount(revenue - expenses)}",
+        f"22 Net assets or fund balances. Subtract line 21 from line 20 {_amount(int(net_assets * 0.9))} "
+        f"{_amount(net_assets)}",
+    ]]
+
+    part_vii = [
+        "Part VII Compensation of Officers, Directors, Trustees, Key Employees, Highest Compensated Employees,",
+        "and Independent Contractors",
+        "Section A. Officers, Directors, Trustees, Key Employees, and Highest Compensated Employees",
+        "(A) Name and title (B) Average hours per week (C) Position (D) Reportable compensation",
+    ]
+    for number, (person, title, compensation) in enumerate(members, start=1):
+        part_vii.append(f"({number}) {person} {rng.choice((1, 5, 10, 40))}.00 X {_amount(compensation)} 0 "
+                        f"{_amount(compensation // 10)}")
+        part_vii.append(title)
+    part_vii.append(f"1b Sub-total {_amount(sum(member[2] for member in members))}")
+    result.append(part_vii)
+
+    schedule_i = [
+        f"Schedule I (Form 990) {tax_year}",
+        "Grants and Other Assistance to Organizations, Governments, and Individuals in the United States",
+        "Part II Grants and Other Assistance to Domestic Organizations and Domestic Governments.",
+        "(a) Name and address of organization (b) EIN (c) IRC section (d) Amount of cash grant (h) Purpose",
+    ]
+    for recipient, recipient_ein, amount, purpose in grants:
+        schedule_i.append(f"{recipient} {recipient_ein} 501(c)(3) {_amount(amount)} {purpose}")
+    result.extend(schedule_i[start:start + LINES_PER_PAGE - 2] for start in range(0, len(schedule_i), LINES_PER_PAGE - 2))
+
+    while len(result) < pages:
+        part_ix = ["Part IX Statement of Functional Expenses",
+                   "(A) Total expenses (B) Program service expenses (C) Management and general (D) Fundraising"]
+        for number, label in enumerate(_EXPENSE_LINES * 3, start=1):
+            total = rng.randint(0, max(1, expenses // 20))
+            part_ix.append(f"{number % 24 + 1} {label} {_amount(total)} {_amount(total * 7 // 10)} "
+                           f"{_amount(total * 2 // 10)} {_amount(total - total * 9 // 10)}")
+        result.append(part_ix)
+
+    result = result[:max(pages, 1)]
+    for number, page in enumerate(result, start=1):
+        page.insert(0, f"Form 990 ({tax_year}) Page {number}")
+    return result
+
+
+def _wrapped(lines):
+    wrapped = []
+    for line in lines:
+        wrapped.extend(textwrap.wrap(line, LINE_CHARS) or [''])
+    return wrapped[:LINES_PER_PAGE]
+
+
+def _pdf_string(line):
+    return line.encode('latin-1', 'replace').replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def write_text_pdf(path, pages):
+    """
+    Writes a PDF with a text layer (Flate-compressed content streams, the
+    way producers of e-filed 990s emit them); PyPDF2 reads the lines back.
+    """
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>"]
+    kids = []
+    for lines in pages:
+        content = [f"BT /F1 {FONT_SIZE} Tf {LEADING} TL {MARGIN} {PAGE_HEIGHT - MARGIN} Td".encode()]
+        content.extend(b"(" + _pdf_string(line) + b") '" for line in _wrapped(lines))
+        content.append(b"ET")
+        stream = zlib.compress(b"\n".join(content))
+        objects.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        kids.append(len(objects) + 1)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << /F1 3 0 R >> >> "
+                       b"/Contents %d 0 R >>" % (PAGE_WIDTH, PAGE_HEIGHT, len(objects)))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % kid for kid in kids), len(kids))
+
+    body = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(body))
+        body += b"%d 0 obj\n" % number + obj + b"\nendobj\n"
+    xref = len(body)
+    body += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    body += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    body += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, 'wb') as f:
+        f.write(body)
+
+
+def _font(dpi):
+    try:
+        return ImageFont.load_default(size=FONT_SIZE * dpi // 72)
+    except TypeError:
+        # Pillow < 10.1 only has the small bitmap font
+        return ImageFont.load_default()
+
+
+def write_image_pdf(path, pages, dpi=150):
+    """
+    Writes a scanned-style PDF: each page is a grayscale JPEG with no text
+    layer, so the parse engine has to OCR every page.
+    """
+    font = _font(dpi)
+    images = []
+    for lines in pages:
+        image = Image.new('L', (PAGE_WIDTH * dpi // 72, PAGE_HEIGHT * dpi // 72), 255)
+        draw = ImageDraw.Draw(image)
+        y = MARGIN * dpi // 72
+        for line in _wrapped(lines):
+            draw.text((MARGIN * dpi // 72, y), line, fill=0, font=font)
+            y += LEADING * dpi // 72
+        images.append(image)
+    images[0].save(path, 'PDF', resolution=dpi, save_all=True, append_images=images[1:])
+    for image in images:
+        image.close()
+
+
+def filing_name(ein, tax_year):
+    """
+    Filing file name as the filing index parses it: EIN, then the tax period.
+    """
+    return f"{ein}_{tax_year}12_990.pdf"
+
+
+def generate(folder, organizations, years=(2019, 2020, 2021), pages=12, image_ratio=0.25, dpi=150, seed=0):
+    """
+    Writes one filing per organization and tax year under folder/<year>/,
+    a share image_ratio of them image-only, spread evenly over the filings.
+    Returns:
+        list: {'path', 'ein', 'tax_year', 'kind' ('text' or 'image'), 'pages'} per filing.
+    """
+    filings = []
+    for organization in organizations:
+        for tax_year in years:
+            directory = os.path.join(folder, str(tax_year))
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, filing_name(organization['EIN'], tax_year))
+            index = len(filings)
+            kind = 'image' if int((index + 1) * image_ratio) > int(index * image_ratio) else 'text'
+            content = filing_pages(organization, tax_year, pages, seed)
+            if kind == 'image':
+                write_image_pdf(path, content, dpi)
+            else:
+                write_text_pdf(path, content)
+            filings.append({'path': path, 'ein': organization['EIN'], 'tax_year': tax_year, 'kind': kind,
+                            'pages': len(content)})
+    return filings
@@ -0,0 +1,130 @@
+# benchmarks/synthetic_sedb.py
+
+# Standard library imports
+import os
+import csv
+import random
+
+# The IRS Exempt Organizations Business Master File, as split into the SEDB
+# files 1.csv .. 13.csv (same columns as data/Shared_Entity_Name_Database_(SEDB)/4.csv)
+COLUMNS = ('EIN', 'NAME', 'ICO', 'STREET', 'CITY', 'STATE', 'ZIP', 'GROUP', 'SUBSECTION', 'AFFILIATION',
+           'CLASSIFICATION', 'RULING', 'DEDUCTIBILITY', 'FOUNDATION', 'ACTIVITY', 'ORGANIZATION', 'STATUS',
+           'TAX_PERIOD', 'ASSET_CD', 'INCOME_CD', 'FILING_REQ_CD', 'PF_FILING_REQ_CD', 'ACCT_PD', 'ASSET_AMT',
+           'INCOME_AMT', 'REVENUE_AMT', 'NTEE_CD', 'SORT_NAME')
+FILE_COUNT = 13
+# Records in the full BMF
+FULL_SCALE_ROWS = 1950000
+
+_PLACES = ('SPRINGFIELD', 'RIVERSIDE', 'FRANKLIN', 'GREENVILLE', 'BRISTOL', 'CLINTON', 'FAIRVIEW', 'SALEM',
+           'MADISON', 'GEORGETOWN', 'ARLINGTON', 'ASHLAND', 'DOVER', 'OXFORD', 'JACKSON', 'BURLINGTON',
+           'MANCHESTER', 'MILTON', 'NEWPORT', 'AUBURN', 'DAYTON', 'LEXINGTON', 'MILFORD', 'WINCHESTER')
+_STATES = ('AL', 'AZ', 'CA', 'CO', 'CT', 'FL', 'GA', 'IL', 'IN', 'KY', 'MA', 'MD', 'MI', 'MN', 'MO', 'NC', 'NJ',
+           'NY', 'OH', 'OR', 'PA', 'PR', 'TN', 'TX', 'VA', 'WA', 'WI')
+_QUALIFIERS = ('FIRST', 'NEW', 'UNITED', 'NATIONAL', 'GREATER', 'COMMUNITY', 'FRIENDS OF THE', 'ST MARYS',
+               'GRACE', 'HOPE', 'HERITAGE', 'CHILDRENS', 'VETERANS', 'PUBLIC', 'REGIONAL', 'AMERICAN')
+_SUBJECTS = ('ARTS', 'HOUSING', 'FOOD BANK', 'LIBRARY', 'HISTORICAL', 'YOUTH SOCCER', 'ANIMAL RESCUE', 'HOSPICE',
+             'MUSIC', 'GARDEN', 'SCHOLARSHIP', 'LITERACY', 'HEALTH', 'WATERSHED', 'BAPTIST', 'FIRE RELIEF',
+             'PARENT TEACHER', 'ROTARY', 'LEGAL AID', 'SENIOR CENTER')
+_KINDS = ('FOUNDATION', 'ASSOCIATION', 'SOCIETY', 'CHURCH', 'COUNCIL', 'ALLIANCE', 'FUND', 'CENTER', 'CLUB',
+          'COALITION', 'TRUST', 'LEAGUE', 'INSTITUTE', 'PROJECT', 'NETWORK')
+_SUFFIXES = ('INC', 'INC', 'INC', '', 'CORPORATION', 'LTD', 'CORP')
+_STREETS = ('MAIN ST', 'OAK AVE', 'PO BOX', 'CHURCH ST', 'MARKET ST', 'PARK AVE', 'ELM ST', 'WASHINGTON BLVD')
+_PEOPLE = ('JANE DOE', 'JOHN SMITH', 'MARIA GARCIA', 'ROBERT JOHNSON', 'LINDA WILLIAMS', 'DAVID BROWN',
+           'SUSAN MILLER', 'JAMES DAVIS', 'KAREN WILSON', 'MICHAEL MOORE')
+_NTEE = ('A20', 'B82', 'E70', 'K31', 'L21', 'N64', 'O50', 'P20', 'S20', 'T20', 'X20', 'Y40', '')
+
+
+def rows_per_file(rows, files=FILE_COUNT):
+    """
+    Splits rows over the SEDB files as evenly as the division allows.
+    """
+    return [rows // files + (1 if index < rows % files else 0) for index in range(files)]
+
+
+def make_ein(index, seed=0):
+    """
+    The index-th synthetic EIN: 9 digits, unique per index and seed.
+    """
+    return f"{100000000 + (index * 37 + seed * 7919) % 899999999:09d}"
+
+
+def make_name(rng, index):
+    """
+    An organization name in BMF style. Names repeat across the file like the
+    real BMF's do; the index suffix on some keeps most of them distinct.
+    """
+    words = [rng.choice(_QUALIFIERS), rng.choice(_SUBJECTS), rng.choice(_KINDS)]
+    if rng.random() < 0.6:
+        words.append(f"OF {rng.choice(_PLACES)}")
+    if rng.random() < 0.5:
+        words.append(f"CHAPTER {index % 997 + 1}")
+    suffix = rng.choice(_SUFFIXES)
+    if suffix:
+        words.append(suffix)
+    return ' '.join(words)
+
+
+def make_row(rng, index, seed=0):
+    ein = make_ein(index, seed)
+    name = make_name(rng, index)
+    assets = rng.choice((0, rng.randint(1, 99999), rng.randint(100000, 9999999), rng.randint(10000000, 999999999)))
+    revenue = int(assets * rng.uniform(0.05, 1.5)) if assets else rng.randint(0, 50000)
+    return (
+        ein,
+        name,
+        f"% {rng.choice(_PEOPLE)}" if rng.random() < 0.4 else '',
+        f"{rng.randint(1, 9999)} {rng.choice(_STREETS)}",
+        rng.choice(_PLACES),
+        rng.choice(_STATES),
+        f"{rng.randint(501, 99950):05d}-{rng.randint(0, 9999):04d}",
+        rng.choice(('0000', '0000', '0000', f"{rng.randint(1, 9999):04d}")),
+        rng.choice(('03', '03', '03', '04', '06', '07', '13')),
+        rng.choice(('3', '3', '9', '1')),
+        rng.choice(('1000', '1200', '2000', '7000')),
+        f"{rng.randint(1940, 2023)}{rng.randint(1, 12):02d}",
+        rng.choice(('1', '1', '2', '4')),
+        rng.choice(('10', '15', '16', '17', '04')),
+        '000000000',
+        '1',
+        '01',
+        f"{rng.randint(2018, 2023)}{rng.choice(('06', '12', '12', '12'))}" if assets else '',
+        str(min(9, len(str(assets)) - 1)) if assets else '0',
+        str(min(9, len(str(revenue)) - 1)) if revenue else '0',
+        rng.choice(('01', '01', '02', '06')),
+        '0',
+        rng.choice(('12', '12', '12', '06', '09')),
+        str(assets) if assets else '',
+        str(revenue) if revenue else '',
+        str(revenue) if revenue else '',
+        rng.choice(_NTEE),
+        name.rsplit(' INC', 1)[0] if rng.random() < 0.1 else '',
+    )
+
+
+def generate(folder, rows=FULL_SCALE_ROWS, seed=0, files=FILE_COUNT, sample=0):
+    """
+    Writes rows synthetic BMF records to folder/1.csv .. folder/<files>.csv.
+    The same rows and seed always produce byte-identical files.
+    Returns:
+        tuple: (CSV paths written, up to `sample` records spread evenly over
+        the files as {column: value}, e.g. the entities to give filings).
+    """
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(seed)
+    step = max(1, rows // sample) if sample else 0
+    paths = []
+    sampled = []
+    index = 0
+    for number, count in enumerate(rows_per_file(rows, files), start=1):
+        path = os.path.join(folder, f"{number}.csv")
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(COLUMNS)
+            for _ in range(count):
+                row = make_row(rng, index, seed)
+                writer.writerow(row)
+                if step and index % step == 0 and len(sampled) < sample:
+                    sampled.append(dict(zip(COLUMNS, row)))
+                index += 1
+        paths.append(path)
+    return paths, sampled
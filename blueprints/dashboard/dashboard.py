@@ -1,19 +1,184 @@
 # blueprints/dashboard/dashboard.py
 
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, jsonify, request
+import gzip
 import json
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
 from config import Config
-import logging
+from utils.results_store import query_filings, filing_history, generation
+from utils.visualization import dashboard_payload
+from utils.entity_graph import neighborhood, shortest_path, money_flows
+from common import CustomLogger
 
 dashboard_blueprint = Blueprint('dashboard', __name__)
-logger = logging.getLogger(__name__)
+logger = CustomLogger.get_logger(__name__)
+
+# Payload sections a client can select with ?fields=
+PAYLOAD_FIELDS = ('filings', 'visualization', 'analysis_summary')
+
+# Rendered /data responses for this worker, keyed by normalized query, valid
+# for one results store generation: {key: {'etag', 'body', 'gzip'}}
+_cache = OrderedDict()
+_cache_generation = None
+_cache_lock = threading.Lock()
+
+def _int_arg(name, default=None):
+    value = request.args.get(name)
+    if value in (None, ''):
+        return default
+    return int(value)
+
+def _cached(key, current_generation):
+    global _cache_generation
+    with _cache_lock:
+        if _cache_generation != current_generation:
+            # Results changed since these were rendered
+            _cache.clear()
+            _cache_generation = current_generation
+        entry = _cache.get(key)
+        if entry is not None:
+            _cache.move_to_end(key)
+        return entry
+
+def _store(key, entry, current_generation):
+    with _cache_lock:
+        if _cache_generation != current_generation:
+            return
+        _cache[key] = entry
+        while len(_cache) > Config.DASHBOARD_CACHE_ENTRIES:
+            _cache.popitem(last=False)
+
+def _render(job_id, filters, fields, include_data):
+    """
+    Queries the results store and renders the selected payload sections as
+    a JSON body with its ETag.
+    """
+    filings = query_filings(job_id=job_id, **filters)
+    if job_id and not filings and not filters['offset']:
+        return None
+    payload = dashboard_payload(filings) if {'visualization', 'analysis_summary'} & set(fields) else {}
+    data = {field: payload[field] for field in fields if field in payload}
+    if 'filings' in fields:
+        if not include_data:
+            filings = [{key: value for key, value in filing.items() if key != 'data'} for filing in filings]
+        data['filings'] = filings
+    data['page'] = {'limit': filters['limit'], 'offset': filters['offset'], 'count': len(filings)}
+    body = json.dumps({'data': data}, separators=(',', ':')).encode('utf-8')
+    return {'etag': hashlib.sha256(body).hexdigest()[:32], 'body': body, 'gzip': None}
+
+def _respond(entry):
+    """
+    Answers 304 when the client already has this entry, otherwise sends it,
+    gzipped when the client accepts it and the body is worth compressing.
+    """
+    if request.if_none_match.contains(entry['etag']):
+        response = Response(status=304)
+    elif ('gzip' in request.headers.get('Accept-Encoding', '')
+          and len(entry['body']) >= Config.DASHBOARD_GZIP_MIN_BYTES):
+        if entry['gzip'] is None:
+            entry['gzip'] = gzip.compress(entry['body'], compresslevel=6)
+        response = Response(entry['gzip'], mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(entry['body'], mimetype='application/json')
+    response.set_etag(entry['etag'])
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
 
 @dashboard_blueprint.route('/data', methods=['GET'])
 def get_dashboard_data():
+    # Filters map onto indexed columns of the results store, so only matching rows are read
+    job_id = request.args.get('job_id')
+    try:
+        filters = {
+            'ein': request.args.get('ein'),
+            'name': request.args.get('name'),
+            'min_revenue': _int_arg('min_revenue'),
+            'max_revenue': _int_arg('max_revenue'),
+            'year': request.args.get('year'),
+            'limit': min(_int_arg('limit', Config.DASHBOARD_PAGE_SIZE), Config.DASHBOARD_MAX_PAGE_SIZE),
+            'offset': _int_arg('offset', 0),
+        }
+    except ValueError:
+        return jsonify({'error': 'limit, offset, min_revenue and max_revenue must be integers'}), 400
+    fields = [field for field in request.args.get('fields', ','.join(PAYLOAD_FIELDS)).split(',') if field]
+    if not fields or set(fields) - set(PAYLOAD_FIELDS):
+        return jsonify({'error': f"fields must be a comma-separated subset of {', '.join(PAYLOAD_FIELDS)}"}), 400
+    include_data = request.args.get('data', 'true').lower() != 'false'
+
+    key = (job_id, tuple(sorted(filters.items())), tuple(fields), include_data)
     try:
-        with open(Config.JSON_RESULTS, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return jsonify({'data': data})
-    except Exception as e:
+        current_generation = generation()
+        entry = _cached(key, current_generation)
+        if entry is None:
+            entry = _render(job_id, filters, fields, include_data)
+            if entry is None:
+                return jsonify({'error': 'Unknown or expired job'}), 404
+            _store(key, entry, current_generation)
+    except sqlite3.Error as e:
         logger.error(f"Error loading dashboard data: {e}")
         return jsonify({'error': 'Failed to load data'}), 500
+    return _respond(entry)
+
+@dashboard_blueprint.route('/history', methods=['GET'])
+def get_filing_history():
+    ein = request.args.get('ein')
+    if not ein:
+        return jsonify({'error': 'ein is required'}), 400
+    try:
+        history = filing_history(ein, request.args.get('year'))
+    except sqlite3.Error as e:
+        logger.error(f"Error loading filing history: {e}")
+        return jsonify({'error': 'Failed to load data'}), 500
+    return jsonify({'data': {'history': history}})
+
+@dashboard_blueprint.route('/graph/neighborhood', methods=['GET'])
+def get_graph_neighborhood():
+    entity = request.args.get('entity')
+    if not entity:
+        return jsonify({'error': 'entity is required'}), 400
+    try:
+        graph = neighborhood(entity, hops=min(_int_arg('hops', 2), Config.GRAPH_MAX_HOPS))
+    except ValueError:
+        return jsonify({'error': 'hops must be an integer'}), 400
+    except sqlite3.Error as e:
+        logger.error(f"Error loading entity graph: {e}")
+        return jsonify({'error': 'Failed to load data'}), 500
+    if graph is None:
+        return jsonify({'error': 'Unknown entity'}), 404
+    return jsonify({'data': graph})
+
+@dashboard_blueprint.route('/graph/path', methods=['GET'])
+def get_graph_path():
+    source, target = request.args.get('source'), request.args.get('target')
+    if not source or not target:
+        return jsonify({'error': 'source and target are required'}), 400
+    try:
+        path = shortest_path(source, target)
+    except sqlite3.Error as e:
+        logger.error(f"Error loading entity graph: {e}")
+        return jsonify({'error': 'Failed to load data'}), 500
+    if path is None:
+        return jsonify({'error': 'No path found'}), 404
+    return jsonify({'data': path})
+
+@dashboard_blueprint.route('/graph/flows', methods=['GET'])
+def get_graph_flows():
+    source, target = request.args.get('source'), request.args.get('target')
+    if not source or not target:
+        return jsonify({'error': 'source and target are required'}), 400
+    try:
+        flows = money_flows(source, target, max_hops=min(_int_arg('max_hops', Config.GRAPH_MAX_HOPS),
+                                                         Config.GRAPH_MAX_HOPS))
+    except ValueError:
+        return jsonify({'error': 'max_hops must be an integer'}), 400
+    except sqlite3.Error as e:
+        logger.error(f"Error loading entity graph: {e}")
+        return jsonify({'error': 'Failed to load data'}), 500
+    if flows is None:
+        return jsonify({'error': 'Unknown entity'}), 404
+    return jsonify({'data': flows})
@@ -1,13 +1,22 @@
 # blueprints/gpt_handler/gpt_handler.py
 
-from flask import Blueprint, jsonify, current_app
-from dotenv import load_dotenv 
-import yaml
+from flask import Blueprint, jsonify, current_app, request
 import json
 import os
-from openai import OpenAI
+import shutil
+import sqlite3
+import tempfile
 from config import Config
 from common import CustomLogger, log_function
+from utils.workspaces import get_workspace
+from utils.utils_functions import get_xml_results
+from utils.extraction_engine import complete, complete_many
+from utils import llm_cache
+from utils.results_store import save_results
+from utils.chunking import build_chunks, spill_chunks, read_head, completion_budget, merge_partials
+from utils.resource_governor import admit, extract_cost, memory_stats
+from utils.prompt_templates import get_template, build_prompt
+from utils.form990_rules import extract_fields, model_targets, apply_rules
 import glob
 
 # Initialize logger for GPT Handler Blueprint with its own log file
@@ -17,104 +26,241 @@ logger.propagate = False
 # Create blueprint
 gpt_handler_blueprint = Blueprint('gpt_handler', __name__)
 
-load_dotenv()  # Load environment variables from .env file
-
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
 @gpt_handler_blueprint.route('/', methods=['POST'])
 @log_function(logger)
 def gpt_main():
     try:
+        # Extract from the search's own workspace when the client passes its job_id
+        data = request.get_json(silent=True) or {}
+        job_id = data.get('job_id')
+        workspace = None
+        if job_id:
+            workspace = get_workspace(job_id)
+            if workspace is None:
+                return jsonify({'success': False, 'message': 'Unknown or expired job.'}), 404
+
         # Call your main GPT processing function
-        extracted_data = main()
+        # 'refresh': true skips cached GPT responses for this request
+        extracted_data, filings = main(workspace, use_cache=not data.get('refresh'))
         if extracted_data:
             # Return the extracted data as JSON
             return jsonify({
                 'success': True,
                 'message': 'Key information extracted successfully.',
                 'extracted_data': extracted_data,
-                'download_url': '/dashboard/data'  # Adjust this if needed
+                'filings': filings,
+                'llm_cache': llm_cache.cache_stats(),
+                'memory': memory_stats(),
+                'prompt_prefix_tokens': (get_template() or {}).get('prefix_tokens'),
+                'download_url': f"/dashboard/data?job_id={job_id}" if job_id else '/dashboard/data'
             })
         else:
-            return jsonify({'success': False, 'message': 'No data extracted.'}), 500
+            return jsonify({'success': False, 'message': 'No data extracted.', 'filings': filings}), 500
     except Exception as e:
         logger.error(f"Error in GPT handler: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
 @log_function(logger)
-def main():
-    # Load the schema, prompts, and output requirements schema
-    schema = load_yaml_file(Config.SCHEMA_PATH)
-    prompts = load_yaml_file(Config.PROMPTS_PATH)
-    output_requirements = load_yaml_file(Config.OUTPUT_REQUIREMENTS_SCHEMA)
-    if not schema or not prompts or not output_requirements:
+def main(workspace=None, use_cache=True):
+    """
+    Extracts every parsed filing of the workspace (or PARSED_TEXT_DIR)
+    concurrently and upserts all of them into the results store, keyed by
+    EIN and tax year and linked to the workspace's job. Filings too long
+    for one prompt are split into Part/Schedule chunks, each extracted
+    against its schema sections, and the partial results merged.
+    Filings whose text, prompt config files and model match a cached GPT
+    response skip the API call unless use_cache is False or LLM_CACHE_ENABLED
+    is off.
+    With RULE_EXTRACT_ENABLED, general_info, financial_data and board_members
+    are first read locally from the stable Form 990 lines; only the fields
+    the rules missed or scored below RULE_MIN_CONFIDENCE go to the model.
+    Returns parsed from e-file XML are already structured and are included
+    as they are.
+    The extraction waits until the resource governor admits its estimated
+    memory. Texts over ENTITY_SIZE_LIMIT are never read whole: they are
+    chunked to disk and their chunks read back and sent a group of
+    GPT_MAX_CONCURRENCY at a time.
+    Returns:
+        tuple: (rows for the results table, one per extracted filing, or None
+        if nothing was extracted; per-filing status, timing and error list).
+    """
+    # Compiled schema, prompts, and output requirements (reloaded only when changed)
+    template = get_template()
+    if template is None:
         logger.error("Schema, prompts, or output requirements could not be loaded. Exiting.")
-        return None
+        return None, []
 
     # Get list of text files in the directory
-    parsed_text_dir = Config.PARSED_TEXT_DIR  # Ensure this is correctly set in Config
-    text_files = get_text_files_in_directory(parsed_text_dir)
-    if not text_files:
+    parsed_text_dir = workspace['parsed_dir'] if workspace else Config.PARSED_TEXT_DIR
+    text_files = sorted(get_text_files_in_directory(parsed_text_dir))
+    xml_results = get_xml_results(parsed_text_dir)
+    if not text_files and not xml_results:
         logger.error("No text files found in the directory. Exiting.")
-        return None
+        return None, []
 
-    # Delete existing JSON file
-    clear_output_file(Config.JSON_RESULTS)
+    oversized = set()
+    for text_file in text_files:
+        try:
+            if os.path.getsize(text_file) > Config.ENTITY_SIZE_LIMIT:
+                oversized.add(text_file)
+        except OSError:
+            pass
+    spill_dir = tempfile.mkdtemp(prefix='.spill_', dir=parsed_text_dir) if oversized else None
+    try:
+        with admit('extract', extract_cost(text_files)):
+            return _extract(workspace, use_cache, template, text_files, xml_results, oversized, spill_dir)
+    finally:
+        if spill_dir:
+            shutil.rmtree(spill_dir, ignore_errors=True)
+
+def _extract(workspace, use_cache, template, text_files, xml_results, oversized, spill_dir):
+    # Split each filing into chunks and generate one prompt per chunk that
+    # has no cached response
+    config_paths = (Config.SCHEMA_PATH, Config.PROMPTS_PATH, Config.OUTPUT_REQUIREMENTS_SCHEMA)
+    schema_sections = template['schema']
+    filings = {}
+    file_chunks = {}
+    file_rules = {}
+    chunk_prompts = {}
+    completion_tokens = {}
+    cache_keys = {}
+    responses = {}
+    spilled = []
+
+    def prepare(request_key, chunk, chunk_text, chunk_fields, prompts, tokens):
+        # Answers the chunk from the LLM cache, or queues its prompt in prompts
+        text_file, index = request_key
+        if Config.LLM_CACHE_ENABLED:
+            cache_text = f"{','.join(chunk['schema_keys'])}\n{chunk_text}"
+            if chunk_fields:
+                cache_text = f"{','.join(chunk_fields)}\n{cache_text}"
+            cache_keys[request_key] = llm_cache.response_key(cache_text, config_paths)
+            cached = llm_cache.get(cache_keys[request_key]) if use_cache else None
+            if cached is not None:
+                logger.info(f"LLM cache hit for {text_file} chunk {index + 1}/{len(file_chunks[text_file])}")
+                responses[request_key] = {'text': cached, 'error': None, 'attempts': 0, 'seconds': 0.0,
+                                          'cached': True}
+                return
+        prompt = generate_prompt(chunk_text, chunk['schema_keys'], template, chunk_fields)
+        if not prompt:
+            logger.error("Prompt could not be generated. Skipping chunk.")
+            return
+        prompts[request_key] = prompt
+        tokens[request_key] = completion_budget(chunk['tokens'])
 
-    # Process each text file
     for text_file in text_files:
-        logger.info(f"Processing file: {text_file}")
-        text_content = read_text_file(text_file)
+        filings[text_file] = {'file': os.path.basename(text_file), 'status': 'failed', 'error': None}
+        if text_file in oversized:
+            # The rules only need the main form at the head of the text
+            try:
+                text_content = read_head(text_file, Config.ENTITY_SIZE_LIMIT)
+            except OSError as e:
+                logger.error(f"Error reading text file {text_file}: {e}")
+                text_content = ''
+        else:
+            text_content = read_text_file(text_file)
         if not text_content:
             logger.error(f"Text content could not be loaded from {text_file}. Skipping.")
+            filings[text_file]['error'] = 'Text content could not be loaded.'
             continue
+        rules = file_rules[text_file] = extract_fields(text_content) if Config.RULE_EXTRACT_ENABLED else None
+        schema_keys, fields = model_targets(rules, list(schema_sections))
+        if not schema_keys:
+            chunks = []
+        elif text_file in oversized:
+            logger.info(f"{text_file} exceeds ENTITY_SIZE_LIMIT; chunking it on disk")
+            chunks = spill_chunks(text_file, schema_keys, os.path.join(spill_dir, str(len(file_chunks))))
+        else:
+            chunks = build_chunks(text_content, schema_keys)
+        file_chunks[text_file] = chunks
+        filings[text_file]['model_sections'] = schema_keys
+        for index, chunk in enumerate(chunks):
+            request_key = (text_file, index)
+            chunk_fields = [path for path in fields if path.split('.')[0] in chunk['schema_keys']]
+            if 'path' in chunk:
+                spilled.append((request_key, chunk, chunk_fields))
+            else:
+                prepare(request_key, chunk, chunk['text'], chunk_fields, chunk_prompts, completion_tokens)
 
-        # Generate the prompt
-        prompt = generate_prompt(text_content, schema, prompts, output_requirements)
-        if not prompt:
-            logger.error("Prompt could not be generated. Skipping file.")
-            continue
+    # Call the GPT API for all remaining chunks of all filings at once
+    responses.update(complete_many(chunk_prompts, completion_tokens))
 
-        # Call the GPT API
-        response_text = call_gpt_api(prompt)
-        if not response_text:
-            logger.error("No response from GPT API. Skipping file.")
-            continue
+    # Chunks on disk are read back and sent one bounded group at a time
+    for start in range(0, len(spilled), Config.GPT_MAX_CONCURRENCY):
+        group_prompts, group_tokens = {}, {}
+        for request_key, chunk, chunk_fields in spilled[start:start + Config.GPT_MAX_CONCURRENCY]:
+            chunk_text = read_text_file(chunk['path'])
+            if chunk_text:
+                prepare(request_key, chunk, chunk_text, chunk_fields, group_prompts, group_tokens)
+        responses.update(complete_many(group_prompts, group_tokens))
 
-        # Parse the GPT response
-        json_data = parse_gpt_response(response_text)
-        if not json_data:
-            logger.error("Failed to parse JSON data. Skipping file.")
+    results = list(xml_results)
+    extracted_data = []
+    for xml_result in xml_results:
+        extracted_data.extend(prepare_extracted_data(xml_result['data']))
+    xml_filings = [{'file': xml_result['file'], 'status': 'extracted', 'error': None, 'source': 'efile_xml',
+                    'chunks': 0, 'seconds': 0.0, 'attempts': 0, 'cached': False} for xml_result in xml_results]
+    for text_file in text_files:
+        if text_file not in file_chunks:
             continue
+        chunks = file_chunks[text_file]
+        filing = filings[text_file]
+        partials = []
+        errors = []
+        chunk_responses = [responses.get((text_file, index)) for index in range(len(chunks))]
+        answered = [response for response in chunk_responses if response is not None]
+        filing.update(chunks=len(chunks),
+                      seconds=max((response['seconds'] for response in answered), default=0.0),
+                      attempts=sum(response['attempts'] for response in answered),
+                      cached=bool(answered) and all(response.get('cached') for response in answered))
+        for index, (chunk, response) in enumerate(zip(chunks, chunk_responses)):
+            label = f"{text_file} chunk {index + 1}/{len(chunks)} ({chunk['route']})"
+            if response is None:
+                errors.append(f"chunk {index + 1}: Prompt could not be generated.")
+                continue
+            if not response['text']:
+                logger.error(f"No response from GPT API for {label}. Skipping chunk.")
+                errors.append(f"chunk {index + 1}: {response['error'] or 'No response from GPT API.'}")
+                continue
 
-        # Save the JSON data directly to 'results.json'
-        output_file_path = Config.JSON_RESULTS
-        save_json_data(json_data, output_file_path)
-        logger.info(f"Saved results to {output_file_path}")
+            # Parse the GPT response
+            json_data = parse_gpt_response(response['text'])
+            if not json_data:
+                logger.error(f"Failed to parse JSON data for {label}. Skipping chunk.")
+                errors.append(f"chunk {index + 1}: Failed to parse JSON data.")
+                continue
+            partials.append((chunk['schema_keys'], json_data))
+            # Only responses that parsed are worth replaying
+            request_key = (text_file, index)
+            if request_key in cache_keys and not response.get('cached'):
+                try:
+                    llm_cache.put(cache_keys[request_key], response['text'])
+                except OSError as e:
+                    logger.error(f"Error caching GPT response for {label}: {e}")
 
+        filing['error'] = '; '.join(errors) or None
+        rules = file_rules[text_file]
+        # A filing the model failed on still keeps whatever the rules read confidently
+        confident = rules is not None and any(score >= Config.RULE_MIN_CONFIDENCE
+                                              for score in rules['confidence'].values())
+        if not partials and not confident:
+            continue
+        filing['status'] = 'partial' if errors else 'extracted'
+        json_data = apply_rules(merge_partials(partials), rules)
+        result = {'file': filing['file'], 'data': json_data}
+        if rules is not None:
+            result['confidence'] = rules['confidence']
+        results.append(result)
         # Prepare data for the response
-        extracted_data = prepare_extracted_data(json_data)
-        return extracted_data  # Return the data for use in the AJAX response
+        extracted_data.extend(prepare_extracted_data(json_data))
 
-    return None  # If no data was extracted
+    if results:
+        try:
+            save_results(results, job_id=workspace['job_id'] if workspace else None)
+        except sqlite3.Error as e:
+            logger.error(f"Error saving results: {e}")
 
-@log_function(logger)
-def load_yaml_file(file_path):
-    """
-    Loads a YAML file.
-    Args:
-        file_path (str): Path to the YAML file.
-    Returns:
-        dict: The YAML content as a dictionary.
-    """
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = yaml.safe_load(f)
-        logger.info(f"Loaded YAML file: {file_path}")
-        return content
-    except Exception as e:
-        logger.error(f"Error loading YAML file {file_path}: {e}")
-        return None
+    return extracted_data or None, xml_filings + list(filings.values())
 
 @log_function(logger)
 def prepare_extracted_data(json_data):
@@ -154,22 +300,6 @@ def prepare_extracted_data(json_data):
         logger.error(f"Error preparing extracted data: {e}")
         return []
 
-@log_function(logger)
-def clear_output_file(file_path):
-    """
-    Deletes the specified JSON file if it exists.
-    Args:
-        file_path (str): Path to the JSON file.
-    """
-    try:
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            logger.info(f"Deleted old JSON file: {file_path}")
-    except PermissionError as e:
-        logger.error(f"Permission error while clearing output file {file_path}: {e}")
-    except Exception as e:
-        logger.error(f"Error clearing output file {file_path}: {e}")
-        
 @log_function(logger)
 def get_text_files_in_directory(directory_path):
     """
@@ -198,7 +328,7 @@ def read_text_file(file_path):
         str: Content of the text file.
     """
     try:
-        logger.debug(f"Attempting to read file at: {file_path}")
+        logger.debug("Attempting to read file at: %s", file_path)
         with open(file_path, 'r', encoding='utf-8') as f:
             text = f.read()
         logger.info(f"Successfully loaded text file: {file_path}")
@@ -208,33 +338,20 @@ def read_text_file(file_path):
         return ""
 
 @log_function(logger)
-def generate_prompt(text, schema, prompts, output_requirements):
+def generate_prompt(text, schema_keys=None, template=None, fields=None):
     """
-    Generates a prompt for the GPT model using the provided text, schema, prompts, and output requirements.
+    Generates a prompt for the GPT model: the compiled static prefix (system
+    prompt, instructions, schema and output requirements) followed by the text.
     Args:
         text (str): The text to be structured.
-        schema (dict): The YAML schema defining JSON structure.
-        prompts (dict): The prompts loaded from the prompts YAML file.
-        output_requirements (dict): Additional output requirements loaded from the output requirements YAML file.
+        schema_keys (list): Top-level schema sections to extract; all when None.
+        template (dict): Compiled template from get_template(); loaded when None.
+        fields (list): Dotted paths of the only fields needed within those sections.
     Returns:
         str: The complete prompt.
     """
     try:
-        # Prepare the schema and prompt
-        schema_json = json.dumps(schema.get('schema', {}), indent=2)
-        output_requirements_text = output_requirements.get('output_requirements', '')
-        instructions_text = output_requirements.get('instructions', '')
-        batch_extraction_prompt = prompts.get('batch_extraction_prompt', '')  # Changed from data_extraction_prompt
-        system_prompt = prompts.get('system_prompt', '')
-        prompt = (
-            f"{system_prompt}\n\n"
-            f"{instructions_text}\n\n"
-            f"{batch_extraction_prompt}\n\n"  # Added this line to include the batch extraction prompt
-            f"JSON Schema:\n```json\n{schema_json}\n```\n\n"
-            f"Output Requirements:\n{output_requirements_text}\n\n"
-            f"IRS Form 990 Text:\n```text\n{text}\n```\n\n"
-            f"Please output only the JSON data as per the schema without any additional text or markdown."
-    )
+        prompt = build_prompt(text, schema_keys, template, fields)
         logger.info("Generated prompt for GPT model.")
         return prompt
     except Exception as e:
@@ -251,16 +368,7 @@ def call_gpt_api(prompt):
         str: The API response text.
     """
     try:
-        response = client.chat.completions.create(
-            model="o1-preview-2024-09-12",  
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            temperature=1,
-            max_completion_tokens=3000,
-            n=1,
-        )
-        gpt_response = response.choices[0].message.content.strip()
+        gpt_response = complete(prompt)
         logger.info("GPT API call successful.")
         return gpt_response
     except Exception as e:
@@ -293,20 +401,3 @@ def parse_gpt_response(response_text):
         except Exception as e:
             logger.error(f"Error extracting JSON from GPT response: {e}")
             return {}
-
-@log_function(logger)
-def save_json_data(json_data, output_path):
-    """
-    Saves the JSON data to a file.
-    Args:
-        json_data (dict): The JSON data to save.
-        output_path (str): The file path to save the JSON data.
-    """
-    try:
-        # Ensure the directory exists
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(json_data, f, indent=2)
-        logger.info(f"JSON data saved to {output_path}")
-    except Exception as e:
-        logger.error(f"Error saving JSON data: {e}")
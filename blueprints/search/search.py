@@ -1,11 +1,17 @@
 # blueprints/search.py
 
 import os
-from flask import Blueprint, render_template, request, jsonify
-from utils.utils_functions import search_csv_for_name, search_pdf_by_ein, process_pdfs, get_parsed_files
+import json
+import time
+from flask import Blueprint, Response, render_template, request, jsonify, url_for, stream_with_context
+from utils.sedb_index import search_entities
+from utils.workspaces import get_workspace
 from config import Config
 from common import CustomLogger, log_function
 
+# utils.job_queue (Celery and the parse pipeline) is imported by the job
+# routes on first use, so serving the search page and typeahead never loads it
+
 # Initialize logger for Search Blueprint with its own log file
 logger = CustomLogger.get_logger(__name__, log_file=Config.SEARCH_LOG_FILE)
 logger.propagate = False
@@ -34,44 +40,97 @@ def handle_search():
                 logger.warning("Entity name is empty or missing.")
                 return jsonify({'message': 'Entity name is required.'}), 400
 
-            logger.info(f"Searching for entity: {entity_name}")
-            
-            # Step 1: Search for EIN
-            ein_list = search_csv_for_name(entity_name)
-            if not ein_list:
-                logger.warning(f"No EIN found for entity: {entity_name}")
-                return jsonify({'message': 'Entity not found.'}), 404
+            # Lookup, staging, parsing (and optionally extraction) run as queued
+            # stage tasks; the client follows the job via status or events
+            from utils.job_queue import submit_search
+            job_id = submit_search(entity_name, extract=bool(data.get('extract')))
+            logger.info(f"Queued search job {job_id} for entity: {entity_name}")
+            return jsonify({
+                'message': 'Search queued.',
+                'job_id': job_id,
+                'status_url': url_for('search.job_status', job_id=job_id),
+                'events_url': url_for('search.job_events', job_id=job_id)
+            }), 202
 
-            logger.info(f"EINs found: {ein_list}")
+        except Exception as e:
+            logger.error(f"Error during search workflow: {e}")
+            return jsonify({'message': 'An error occurred during the search process.'}), 500
 
-            # Step 2: Search for PDFs using EINs
-            matched_pdfs = []
-            for ein in ein_list:
-                pdfs = search_pdf_by_ein(ein)
-                matched_pdfs.extend(pdfs)
-            
-            if not matched_pdfs:
-                logger.warning(f"No PDFs found for EINs: {ein_list}")
-                return jsonify({'message': 'No PDFs found.'}), 404
+@search_blueprint.route('/jobs/<job_id>', methods=['GET'])
+@log_function(logger)
+def job_status(job_id):
+    """
+    Current state of a search job: state, stage, progress, message, result.
+    """
+    from utils.job_queue import read_status
+    workspace = get_workspace(job_id)
+    status = read_status(workspace) if workspace else None
+    if status is None:
+        return jsonify({'message': 'Unknown or expired job.'}), 404
+    status.pop('events', None)
+    return jsonify(status), 200
 
-            logger.info(f"PDFs found: {matched_pdfs}")
+@search_blueprint.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """
+    Server-sent events stream of a search job's progress. Each event's data
+    is the job status; the stream ends once the job is done or failed, or
+    with a final failed event if the job expires while streaming.
+    Reconnecting clients resume after their Last-Event-ID.
+    """
+    from utils.job_queue import read_status
+    workspace = get_workspace(job_id)
+    if workspace is None or read_status(workspace) is None:
+        return jsonify({'message': 'Unknown or expired job.'}), 404
+    last_event_id = request.headers.get('Last-Event-ID', type=int) or 0
 
-            # Step 3: Parse and clean PDFs
-            process_pdfs()
-            parsed_files = get_parsed_files(Config.PARSED_TEXT_DIR)
-            if not parsed_files:
-                logger.warning("No parsed files created.")
-                return jsonify({'message': 'Parsing failed.'}), 500
+    def stream():
+        sent = last_event_id
+        last_write = time.monotonic()
+        while True:
+            status = read_status(workspace)
+            if status is None:
+                # Workspace purged mid-stream; end it rather than keep-alive forever
+                payload = {'id': sent + 1, 'time': time.time(), 'state': 'failed', 'stage': None, 'progress': None,
+                           'message': 'Job expired.', 'job_id': job_id, 'result': {}}
+                yield f"id: {payload['id']}\ndata: {json.dumps(payload)}\n\n"
+                return
+            for event in status.get('events', [])[sent:]:
+                payload = {**event, 'job_id': job_id}
+                if event['state'] in ('done', 'failed') and event is status['events'][-1]:
+                    payload['result'] = status.get('result', {})
+                yield f"id: {event['id']}\ndata: {json.dumps(payload)}\n\n"
+                sent = event['id']
+                last_write = time.monotonic()
+            if status.get('state') in ('done', 'failed'):
+                return
+            if time.monotonic() - last_write >= Config.JOB_EVENTS_HEARTBEAT_SECONDS:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                last_write = time.monotonic()
+            time.sleep(Config.JOB_EVENTS_POLL_SECONDS)
 
-            logger.info(f"Parsed files created: {parsed_files}")
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
-            # Step 4: Signal success
-            logger.info("Search and parsing workflow completed successfully.")
-            return jsonify({
-                'message': 'Search and parsing completed successfully.',
-                'parsed_files': parsed_files
-            }), 200
+@search_blueprint.route('/typeahead', methods=['GET'])
+@log_function(logger)
+def typeahead():
+    """
+    Ranked exact/prefix/fuzzy entity matches from the SEDB index for the
+    search box, e.g. GET /search/typeahead?q=pathstone+corp&limit=10
+    """
+    query = request.args.get('q', '').strip()
+    limit = min(request.args.get('limit', Config.TYPEAHEAD_LIMIT, type=int) or Config.TYPEAHEAD_LIMIT, 50)
+    if len(query) < Config.TYPEAHEAD_MIN_CHARS:
+        return jsonify({'query': query, 'results': []}), 200
 
-        except Exception as e:
-            logger.error(f"Error during search workflow: {e}")
-            return jsonify({'message': 'An error occurred during the search process.'}), 500
+    try:
+        start = time.perf_counter()
+        results = search_entities(query, limit=limit)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        logger.info(f"Typeahead '{query}' returned {len(results)} matches in {elapsed_ms:.1f} ms")
+        return jsonify({'query': query, 'results': results, 'elapsed_ms': round(elapsed_ms, 2)}), 200
+    except Exception as e:
+        logger.error(f"Error during typeahead search: {e}")
+        return jsonify({'message': 'An error occurred during the typeahead search.'}), 500
@@ -1,51 +1,243 @@
 # common.py
 
+import os
+import time
+import atexit
 import logging
+import threading
 from functools import wraps
-import os
+from queue import SimpleQueue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+try:
+    import fcntl
+except ImportError:  # Windows: no fork, so only one process rotates anyway
+    fcntl = None
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s'
+
+# Records are only put on a queue by the logging call; a single listener
+# thread formats them and writes the console and the rotating log files.
+_queue = SimpleQueue()
+_listener = None
+_lock = threading.Lock()
+
+
+class _SharedRotatingFileHandler(RotatingFileHandler):
+    """
+    RotatingFileHandler that a parent and its forked children (parse pool,
+    Celery prefork workers) can all write and rotate: the size is read from
+    the file on disk, rollovers are serialized by an flock on <file>.lock,
+    and a process whose file was rotated by another reopens it by path.
+    """
+
+    def _rotated(self):
+        # True when the path no longer names the file this process has open
+        try:
+            on_disk = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            return True
+        opened = os.fstat(self.stream.fileno())
+        return (on_disk.st_dev, on_disk.st_ino) != (opened.st_dev, opened.st_ino)
+
+    def _reopen_if_rotated(self):
+        if self.stream is not None and not self._rotated():
+            return
+        if self.stream is not None:
+            self.stream.close()
+        self.stream = self._open()
+
+    def shouldRollover(self, record):
+        if self.maxBytes <= 0:
+            return False
+        self._reopen_if_rotated()
+        size = os.fstat(self.stream.fileno()).st_size
+        return size + len(self.format(record)) + 1 >= self.maxBytes
+
+    def doRollover(self):
+        if fcntl is None:
+            super().doRollover()
+            return
+        with open(self.baseFilename + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                # Another process may have rotated the file while this one waited
+                if self.stream is None or self._rotated():
+                    self._reopen_if_rotated()
+                else:
+                    super().doRollover()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class _RouteHandler(logging.Handler):
+    """
+    Listener-side handler: writes every record to the console and to the
+    rotating file of the logger that emitted it.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.setFormatter(logging.Formatter(LOG_FORMAT))
+        self.console = logging.StreamHandler()
+        self.console.setFormatter(self.formatter)
+        self.files = {}
+
+    def add_file(self, log_file):
+        if log_file in self.files:
+            return
+        from config import Config
+        os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+        handler = _SharedRotatingFileHandler(log_file, maxBytes=Config.LOG_MAX_BYTES, backupCount=Config.LOG_BACKUP_COUNT,
+                                      encoding='utf-8', delay=True)
+        handler.setFormatter(self.formatter)
+        self.files[log_file] = handler
+
+    def emit(self, record):
+        self.console.handle(record)
+        handler = self.files.get(getattr(record, 'log_file', None))
+        if handler is not None:
+            handler.handle(record)
+
+    def close(self):
+        for handler in self.files.values():
+            handler.close()
+        super().close()
+
+
+_router = _RouteHandler()
+
+
+class _FileQueueHandler(QueueHandler):
+    """
+    Logger-side handler: tags each record with its log file and enqueues it.
+    Only the message itself is rendered here; the full line is formatted on
+    the listener thread.
+    """
+
+    def __init__(self, log_file):
+        super().__init__(_queue)
+        self.log_file = log_file
+
+    def prepare(self, record):
+        record = super().prepare(record)
+        record.log_file = self.log_file
+        return record
+
+
+class _Sampler(logging.Filter):
+    """
+    Keeps one in LOG_SAMPLE_EVERY records of each message at or below
+    LOG_SAMPLE_LEVEL, counted per logger and message template (so messages
+    worth sampling should use lazy '%s' arguments, not f-strings).
+    """
+
+    MAX_KEYS = 10000
+
+    def __init__(self):
+        super().__init__()
+        self.counts = {}
+
+    def filter(self, record):
+        from config import Config
+        if Config.LOG_SAMPLE_EVERY <= 1 or record.levelno > logging.getLevelName(Config.LOG_SAMPLE_LEVEL):
+            return True
+        key = (record.name, record.msg)
+        if len(self.counts) >= self.MAX_KEYS and key not in self.counts:
+            self.counts.clear()
+        count = self.counts.get(key, 0)
+        self.counts[key] = count + 1
+        return count % Config.LOG_SAMPLE_EVERY == 0
+
+
+_sampler = _Sampler()
+
+
+def _start_listener():
+    global _listener
+    _listener = QueueListener(_queue, _router, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    """
+    Writes out every queued record and stops the listener thread.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def _after_fork():
+    # A forked child (parse pool, Celery worker) has the queue but not the
+    # listener thread: give it a fresh queue and its own listener
+    global _queue, _listener, _lock
+    _lock = threading.Lock()
+    _queue = SimpleQueue()
+    for logger in list(logging.Logger.manager.loggerDict.values()):
+        for handler in getattr(logger, 'handlers', ()):
+            if isinstance(handler, _FileQueueHandler):
+                handler.queue = _queue
+    if _listener is not None:
+        _start_listener()
+        # multiprocessing children leave through os._exit, skipping atexit
+        from multiprocessing import util
+        util.Finalize(None, stop_logging, exitpriority=0)
+
+
+atexit.register(stop_logging)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
 
 class CustomLogger:
     @staticmethod
     def get_logger(name, log_file=None):
+        from config import Config
         logger = logging.getLogger(name)
-        logger.setLevel(logging.DEBUG)
+        logger.setLevel(Config.LOG_LEVEL)
 
         # If a log file is not provided, use the default from Config
         if not log_file:
-            from config import Config
             log_file = Config.LOG_FILE
 
         # Check if handlers already exist to prevent duplicate logs
         if not logger.handlers:
-            # Create handlers
-            c_handler = logging.StreamHandler()
-            f_handler = logging.FileHandler(log_file)
-            c_handler.setLevel(logging.DEBUG)
-            f_handler.setLevel(logging.DEBUG)
-
-            # Create formatters and add to handlers
-            c_format = logging.Formatter(
-                '%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s'
-            )
-            f_format = logging.Formatter(
-                '%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s'
-            )
-            c_handler.setFormatter(c_format)
-            f_handler.setFormatter(f_format)
-
-            # Add handlers to the logger
-            logger.addHandler(c_handler)
-            logger.addHandler(f_handler)
+            with _lock:
+                _router.add_file(log_file)
+                if _listener is None:
+                    _start_listener()
+            handler = _FileQueueHandler(log_file)
+            handler.addFilter(_sampler)
+            logger.addHandler(handler)
 
         return logger
 
 def log_function(logger):
+    """
+    Logs entry and exit of the decorated function at DEBUG and records its
+    duration in the function_seconds histogram of utils.metrics.
+    """
     def decorator(func):
+        from utils.metrics import observe
+        # Built once here so calls with DEBUG off format nothing
+        entering = f"Entering function: {func.__name__}"
+        exiting = f"Exiting function: {func.__name__}"
+        function = f"{func.__module__}.{func.__name__}"
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            logger.debug(f"Entering function: {func.__name__}")
-            result = func(*args, **kwargs)
-            logger.debug(f"Exiting function: {func.__name__}")
-            return result
+            start = time.perf_counter()
+            try:
+                if not logger.isEnabledFor(logging.DEBUG):
+                    return func(*args, **kwargs)
+                logger.debug(entering)
+                result = func(*args, **kwargs)
+                logger.debug(exiting)
+                return result
+            finally:
+                observe('function_seconds', time.perf_counter() - start, function=function)
         return wrapper
     return decorator
@@ -40,44 +40,102 @@ class Config:
     PROMPTS_PATH = os.getenv('PROMPTS_PATH', os.path.join(basedir, 'data', 'prompts.json'))
     OUTPUT_REQUIREMENTS_SCHEMA= os.getenv('OUTPUT_REQUIREMENTS_SCHEMA', os.path.join(basedir, 'schemas', 'output_requirements_schema.yaml')) # Added SEDB_FOLDER
     SEDB_FOLDER = os.getenv('SEDB_FOLDER', os.path.join(basedir, 'data', 'Shared_Entity_Name_Database_(SEDB)'))
+    SEDB_INDEX_DIR = os.getenv('SEDB_INDEX_DIR', os.path.join(basedir, 'data', 'index', 'sedb'))  # Persisted name->EIN index shards
     
     # log file paths
     LOG_FILE = os.getenv('LOG_FILE', os.path.join(basedir, 'logs', 'app.log'))
     UTILS_LOG_FILE = os.getenv('UTILS_LOG_FILE', os.path.join(basedir, 'logs', 'utils.log'))
     SEARCH_LOG_FILE = os.getenv('SEARCH_LOG_FILE', os.path.join(basedir, 'logs', 'search.log'))
     GPT_HANDLER_FILE = os.getenv('GPT_HANDLER_FILE', os.path.join(basedir, 'logs', 'gpt_handler.log'))
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()  # DEBUG adds per-call function entry/exit records
+    LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 5 * 1024 * 1024))  # Each log file is rotated above this size
+    LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+    LOG_SAMPLE_EVERY = int(os.getenv('LOG_SAMPLE_EVERY', 1))  # Keep 1 in N repeats of a message; 1 keeps all
+    LOG_SAMPLE_LEVEL = os.getenv('LOG_SAMPLE_LEVEL', 'DEBUG').upper()  # Only messages at or below this level are sampled
 
+    # Metrics (Prometheus text at /metrics, summed across worker processes)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(basedir, 'data', 'metrics'))  # One snapshot file per worker process
+    METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', 5))  # How often a process writes its snapshot
+    METRICS_RETENTION_SECONDS = float(os.getenv('METRICS_RETENTION_SECONDS', 7 * 24 * 3600))  # Snapshots not updated for this long are dropped
+
+
+    FILING_INDEX_PATH = os.getenv('FILING_INDEX_PATH', os.path.join(basedir, 'data', 'index', 'filings.pickle'))  # Persisted EIN->filing index of PDF_FOLDER
+    FILING_INDEX_REFRESH_SECONDS = float(os.getenv('FILING_INDEX_REFRESH_SECONDS', 30))  # Min seconds between directory mtime checks
+    EFILE_XML_ENABLED = os.getenv('EFILE_XML_ENABLED', 'true').lower() == 'true'  # Prefer IRS e-file XML returns over PDFs
+    EFILE_XML_FOLDER = os.getenv('EFILE_XML_FOLDER', os.path.join(basedir, 'data', 'efile_xml'))
+    EFILE_INDEX_PATH = os.getenv('EFILE_INDEX_PATH', os.path.join(basedir, 'data', 'index', 'efile.pickle'))  # Persisted EIN->return index of EFILE_XML_FOLDER
+
+    PARSE_CACHE_DIR = os.getenv('PARSE_CACHE_DIR', os.path.join(basedir, 'data', 'cache', 'parsed'))  # Cleaned text keyed by PDF hash + extractor version
+    PARSE_CACHE_MAX_BYTES = int(os.getenv('PARSE_CACHE_MAX_BYTES', 2 * 1024 ** 3))  # LRU-evicted above this size
+
+    # Job Workspace Configuration (one isolated directory per search)
+    JOBS_DIR = os.getenv('JOBS_DIR', os.path.join(basedir, 'data', 'jobs'))
+    JOB_RETENTION_SECONDS = float(os.getenv('JOB_RETENTION_SECONDS', 24 * 3600))  # Idle workspaces are deleted after this
+    JOB_MAX_WORKSPACES = int(os.getenv('JOB_MAX_WORKSPACES', 200))  # Least recently used beyond this are deleted
+    JOB_PURGE_INTERVAL_SECONDS = float(os.getenv('JOB_PURGE_INTERVAL_SECONDS', 300))
+    JOB_KEEP_FILINGS = os.getenv('JOB_KEEP_FILINGS', 'false').lower() == 'true'  # Keep staged PDFs after parsing
+    PARSE_WAIT_SECONDS = float(os.getenv('PARSE_WAIT_SECONDS', 600))  # Max wait on a concurrent search parsing the same filing
+
+    # Job Queue Configuration (Celery stage tasks for the search pipeline)
+    CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+    JOB_QUEUE_EAGER = os.getenv('JOB_QUEUE_EAGER', 'false').lower() == 'true'  # Run stages in-process (tests: with memory:// broker)
+    JOB_EVENTS_POLL_SECONDS = float(os.getenv('JOB_EVENTS_POLL_SECONDS', 0.5))  # Status check interval of the SSE stream
+    JOB_EVENTS_HEARTBEAT_SECONDS = float(os.getenv('JOB_EVENTS_HEARTBEAT_SECONDS', 15))
+
+    STAGING_MODE = os.getenv('STAGING_MODE', 'link')  # 'link' (hardlink, then symlink, then copy), 'symlink' or 'copy'
+
+    # Entity Search Configuration
+    TYPEAHEAD_LIMIT = int(os.getenv('TYPEAHEAD_LIMIT', 10))  # Max ranked matches per typeahead query
+    TYPEAHEAD_MIN_CHARS = int(os.getenv('TYPEAHEAD_MIN_CHARS', 3))  # Shortest query the typeahead answers
+
+    # GPT Extraction Configuration
+    GPT_MODEL = os.getenv('GPT_MODEL', 'o1-preview-2024-09-12')
+    GPT_MAX_COMPLETION_TOKENS = int(os.getenv('GPT_MAX_COMPLETION_TOKENS', 3000))  # Base completion budget per call
+    GPT_MAX_COMPLETION_TOKENS_CAP = int(os.getenv('GPT_MAX_COMPLETION_TOKENS_CAP', 16000))
+    CHUNK_MAX_TOKENS = int(os.getenv('CHUNK_MAX_TOKENS', 24000))  # Estimated filing tokens per extraction chunk
+    CHUNK_COMPLETION_RATIO = float(os.getenv('CHUNK_COMPLETION_RATIO', 0.25))  # Extra completion tokens per chunk input token
+    GPT_MAX_CONCURRENCY = int(os.getenv('GPT_MAX_CONCURRENCY', 8))  # In-flight GPT calls per worker process
+    GPT_MAX_ATTEMPTS = int(os.getenv('GPT_MAX_ATTEMPTS', 4))  # Attempts per call on rate limits, timeouts and 5xx
+    GPT_RETRY_MAX_WAIT_SECONDS = float(os.getenv('GPT_RETRY_MAX_WAIT_SECONDS', 30))
+    GPT_TIMEOUT_SECONDS = float(os.getenv('GPT_TIMEOUT_SECONDS', 300))
+    RULE_EXTRACT_ENABLED = os.getenv('RULE_EXTRACT_ENABLED', 'true').lower() == 'true'  # Read stable 990 lines locally first
+    RULE_MIN_CONFIDENCE = float(os.getenv('RULE_MIN_CONFIDENCE', 0.8))  # Rule fields below this are sent to the model
+    RESULTS_DB_PATH = os.getenv('RESULTS_DB_PATH', os.path.join(basedir, 'data', 'results.sqlite3'))  # Extractions keyed by EIN + tax year, with history
+    RESULTS_DB_TIMEOUT_SECONDS = float(os.getenv('RESULTS_DB_TIMEOUT_SECONDS', 30))  # Wait on a concurrent writer's lock
+    DASHBOARD_PAGE_SIZE = int(os.getenv('DASHBOARD_PAGE_SIZE', 50))  # Filings per /dashboard/data response by default
+    DASHBOARD_MAX_PAGE_SIZE = int(os.getenv('DASHBOARD_MAX_PAGE_SIZE', 500))
+    DASHBOARD_CACHE_ENTRIES = int(os.getenv('DASHBOARD_CACHE_ENTRIES', 256))  # Rendered /dashboard/data responses kept per worker
+    DASHBOARD_GZIP_MIN_BYTES = int(os.getenv('DASHBOARD_GZIP_MIN_BYTES', 1024))  # Smaller responses are sent uncompressed
+    DASHBOARD_GRAPH_MAX_NODES = int(os.getenv('DASHBOARD_GRAPH_MAX_NODES', 500))  # Network graph nodes sent to the browser
+    GRAPH_MAX_NODES = int(os.getenv('GRAPH_MAX_NODES', 2000))  # Nodes returned by an entity graph neighborhood query
+    GRAPH_MAX_HOPS = int(os.getenv('GRAPH_MAX_HOPS', 4))  # Longest path and money flow searched between two entities
+    GRAPH_MAX_PATHS = int(os.getenv('GRAPH_MAX_PATHS', 50))  # Money flow paths returned per direction
+    LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'  # Set false to bypass cached GPT responses
+    LLM_CACHE_DIR = os.getenv('LLM_CACHE_DIR', os.path.join(basedir, 'data', 'cache', 'llm'))  # Keyed by text, config file hashes and model
+    LLM_CACHE_TTL_SECONDS = float(os.getenv('LLM_CACHE_TTL_SECONDS', 30 * 24 * 3600))
+    LLM_CACHE_MAX_BYTES = int(os.getenv('LLM_CACHE_MAX_BYTES', 512 * 1024 ** 2))  # LRU-evicted above this size
 
     # Processing Configuration
-    MAX_ENTITIES = int(os.getenv('MAX_ENTITIES', 20))  # Max number of entities to process
-    BATCH_SIZE = int(os.getenv('BATCH_SIZE', 4))  # Number of entities per batch
-    ENTITY_SIZE_LIMIT = int(os.getenv('ENTITY_SIZE_LIMIT', 2000000))  # 2MB size limit for processing
+    MAX_ENTITIES = int(os.getenv('MAX_ENTITIES', 20))  # Max entities in flight (with a workspace) during a batch run
+    BATCH_SIZE = int(os.getenv('BATCH_SIZE', 4))  # Entities processed in parallel by each batch stage
+    BATCH_CHECKPOINT_DIR = os.getenv('BATCH_CHECKPOINT_DIR', os.path.join(basedir, 'data', 'batch'))  # Batch run checkpoints and summaries
+    ENTITY_SIZE_LIMIT = int(os.getenv('ENTITY_SIZE_LIMIT', 2000000))  # Parsed texts over 2MB are chunked and extracted from disk
     PARALLEL_PROCESSING = True  # Enable parallel processing
-    MEMORY_LIMIT = os.getenv('MEMORY_LIMIT', '8GB')  # Medium memory limit
+    PARSE_WORKERS = int(os.getenv('PARSE_WORKERS', os.cpu_count() or 1))  # Processes in the PDF parse pool
+    OCR_PAGE_WINDOW = int(os.getenv('OCR_PAGE_WINDOW', BATCH_SIZE))  # Pages OCR'd per pool task, rasterized one at a time
+    MIN_TEXT_LAYER_CHARS = int(os.getenv('MIN_TEXT_LAYER_CHARS', 25))  # Non-whitespace chars for a page to skip OCR
+    REPEATED_LINE_WINDOW = int(os.getenv('REPEATED_LINE_WINDOW', 3))  # Lines at each page edge checked for running headers/footers
+    REPEATED_LINE_MIN_PAGES = int(os.getenv('REPEATED_LINE_MIN_PAGES', 3))
+    REPEATED_LINE_RATIO = float(os.getenv('REPEATED_LINE_RATIO', 0.5))  # Share of pages a line must repeat on to be dropped
+    REPEATED_LINE_MAX_CHARS = int(os.getenv('REPEATED_LINE_MAX_CHARS', 120))
+    OCR_DPI = int(os.getenv('OCR_DPI', 300))
+    OCR_MAX_PAGE_PIXELS = int(os.getenv('OCR_MAX_PAGE_PIXELS', 40000000))  # Larger pages are rasterized at a lower DPI
+    MEMORY_LIMIT = os.getenv('MEMORY_LIMIT', '8GB')  # Estimated memory of the parse/extract jobs run at once per worker process
+    PREWARM = os.getenv('PREWARM', 'false').lower() == 'true'  # Load indexes, templates and lazy imports before workers fork (gunicorn --preload, Celery prefork)
 
-    # Logger Configuration (Assuming you have a method to initialize loggers)
+    # Logger Configuration (kept for callers of Config.get_logger; see common.CustomLogger)
     @staticmethod
     def get_logger(name):
-        import logging
-        logger = logging.getLogger(name)
-        logger.setLevel(logging.DEBUG)
-
-        # Prevent adding multiple handlers to the logger
-        if not logger.handlers:
-            # Create handlers
-            c_handler = logging.StreamHandler()
-            f_handler = logging.FileHandler(Config.LOG_FILE)
-            c_handler.setLevel(logging.DEBUG)
-            f_handler.setLevel(logging.DEBUG)
-
-            # Create formatters and add to handlers
-            c_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s')
-            f_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s')
-            c_handler.setFormatter(c_format)
-            f_handler.setFormatter(f_format)
-
-            # Add handlers to the logger
-            logger.addHandler(c_handler)
-            logger.addHandler(f_handler)
-
-        return logger
+        from common import CustomLogger
+        return CustomLogger.get_logger(name)
@@ -3,15 +3,20 @@
 $(document).ready(function () {
     // Load the extracted data
     $.ajax({
-        url: '/dashboard/data', // Endpoint to get the extracted data
+        url: '/dashboard/data', // Endpoint to get the precomputed dashboard payload
         type: 'GET',
+        data: {fields: 'visualization,analysis_summary'},
         success: function (response) {
-            // Parse the JSON data
+            // Graph and chart series are built server-side from the results store
             let jsonData = response.data;
+            if (!jsonData.page.count) {
+                $('#networkGraphContainer').html('<p>No extracted filings yet.</p>');
+                return;
+            }
             // Generate the network graph
-            generateNetworkGraph(jsonData.visualization_data.network_graph);
+            generateNetworkGraph(jsonData.visualization.network_graph);
             // Generate the financial charts
-            generateFinancialCharts(jsonData.visualization_data.bar_chart);
+            generateFinancialCharts(jsonData.visualization.bar_chart);
             // Display the analysis summary
             displayAnalysisSummary(jsonData.analysis_summary);
         },
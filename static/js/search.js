@@ -14,6 +14,40 @@ $(document).ready(function () {
     });
     console.log("DataTable initialized:", dataTable); // Debug: Verify initialization
 
+    // Workspace of the last successful search, passed on to extraction
+    let currentJobId = null;
+
+    // Typeahead: ranked SEDB matches while the user types (debounced)
+    let typeaheadTimer = null;
+    let typeaheadRequest = null;
+    $('#entity_name').on('input', function () {
+        let query = $(this).val().trim();
+        clearTimeout(typeaheadTimer);
+        if (query.length < 3) {
+            $('#entity-suggestions').empty();
+            return;
+        }
+        typeaheadTimer = setTimeout(function () {
+            if (typeaheadRequest) {
+                typeaheadRequest.abort(); // Only the latest keystroke matters
+            }
+            typeaheadRequest = $.getJSON('/search/typeahead', { q: query }, function (response) {
+                renderSuggestions(response.results || []);
+            });
+        }, 150);
+    });
+
+    function renderSuggestions(results) {
+        let datalist = $('#entity-suggestions').empty();
+        results.forEach(result => {
+            let location = [result.city, result.state].filter(Boolean).join(', ');
+            $('<option>')
+                .attr('value', result.name)
+                .attr('label', `EIN ${result.ein}${location ? ' · ' + location : ''}`)
+                .appendTo(datalist);
+        });
+    }
+
     // Handle Search Form Submission (First Button)
     $('#search-form').on('submit', function (e) {
         e.preventDefault();
@@ -32,34 +66,71 @@ $(document).ready(function () {
         $('#json-feedback').empty();
         $('#status-indicator').hide();
         $('#extract-info-btn').prop('disabled', true);
+        currentJobId = null;
 
-        // Make AJAX call to search endpoint
+        // Queue the search, then follow its progress over server-sent events
         $.ajax({
             url: '/search/', // Backend endpoint for searching
             type: 'POST',
             data: JSON.stringify({ 'entity_name': entityName }),
             contentType: 'application/json',
             success: function (response) {
-                searchButton.prop('disabled', false).html('Search');
                 console.log("Search response:", response); // Debug: Check backend response
-
-                if (response.message === 'Search and parsing completed successfully.') {
-                    $('#status-indicator').show(); // Show a success indicator
-                    $('#json-feedback').html('<div class="alert alert-success">Search completed successfully.</div>');
-                    $('#extract-info-btn').prop('disabled', false); // Enable the second button
-                } else {
-                    $('#json-feedback').html('<div class="alert alert-warning">' + response.message + '</div>');
-                }
+                followSearchJob(response, searchButton);
             },
             error: function (xhr, status, error) {
-                searchButton.prop('disabled', false).html('Search');
                 console.error("Search failed:", error); // Debug: Log the error
                 let errorMessage = xhr.responseJSON && xhr.responseJSON.message ? xhr.responseJSON.message : error;
-                $('#json-feedback').html(`<div class="alert alert-danger">Search failed: ${errorMessage}</div>`);
+                showSearchFailure(errorMessage, [], searchButton);
             }
         });
     });
 
+    let jobEvents = null;
+
+    function followSearchJob(job, searchButton) {
+        if (jobEvents) {
+            jobEvents.close(); // Only the latest search matters
+        }
+        jobEvents = new EventSource(job.events_url);
+        jobEvents.onmessage = function (e) {
+            let event = JSON.parse(e.data);
+            console.log("Search job event:", event); // Debug: Check job progress
+            if (event.state === 'done') {
+                jobEvents.close();
+                searchButton.prop('disabled', false).html('Search');
+                currentJobId = event.job_id;
+                $('#status-indicator').show(); // Show a success indicator
+                $('#json-feedback').html('<div class="alert alert-success">Search completed successfully.</div>');
+                $('#extract-info-btn').prop('disabled', false); // Enable the second button
+            } else if (event.state === 'failed') {
+                jobEvents.close();
+                showSearchFailure(event.message, (event.result && event.result.suggestions) || [], searchButton);
+            } else {
+                let message = $('<span>').text(event.message || 'Search queued.').html();
+                $('#json-feedback').html(`
+                    <div class="alert alert-info">
+                        <span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span>
+                        ${message} (${event.progress || 0}%)
+                    </div>
+                `);
+            }
+        };
+        jobEvents.onerror = function () {
+            // EventSource reconnects on its own and resumes after the last event id
+            console.warn("Search job event stream interrupted; reconnecting.");
+        };
+    }
+
+    function showSearchFailure(errorMessage, suggestions, searchButton) {
+        searchButton.prop('disabled', false).html('Search');
+        let didYouMean = suggestions.length
+            ? ' Did you mean: ' + suggestions.slice(0, 5).map(s => $('<span>').text(s.name).html()).join('; ') + '?'
+            : '';
+        renderSuggestions(suggestions);
+        $('#json-feedback').html(`<div class="alert alert-danger">Search failed: ${errorMessage}${didYouMean}</div>`);
+    }
+
     // Handle Extract Key Information Button Click (Second Button)
     $('#extract-info-btn').on('click', function () {
         console.log('Extract Key Information button clicked'); // Debug log
@@ -78,6 +149,7 @@ $(document).ready(function () {
         $.ajax({
             url: '/gpt_handler/', // Backend endpoint for extracting data
             type: 'POST',
+            data: JSON.stringify({ 'job_id': currentJobId }),
             contentType: 'application/json',
             success: function (response) {
                 console.log('Extraction response:', response); // Debug log
@@ -0,0 +1,8 @@
+# tests/conftest.py
+
+# Standard library imports
+import os
+import sys
+
+# Modules import each other as top-level packages (config, common, utils), as when run from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
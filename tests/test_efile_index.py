@@ -0,0 +1,78 @@
+# tests/test_efile_index.py
+
+# Standard library imports
+import os
+
+# Third-party library imports
+import pytest
+
+# Local imports
+from config import Config
+from utils import efile_index
+from utils.dir_index import DirectoryIndex
+
+RETURN_XML = """<?xml version="1.0" encoding="utf-8"?>
+<Return xmlns="http://www.irs.gov/efile" returnVersion="2021v4.2">
+  <ReturnHeader>
+    <ReturnTs>2022-05-10T10:00:00-05:00</ReturnTs>
+    <TaxPeriodEndDt>{year}-12-31</TaxPeriodEndDt>
+    <ReturnTypeCd>{return_type}</ReturnTypeCd>
+    <TaxPeriodBeginDt>{year}-01-01</TaxPeriodBeginDt>
+    <Filer>
+      <EIN>{ein}</EIN>
+      <BusinessName><BusinessNameLine1Txt>HOPE COMMUNITY FOOD BANK INC</BusinessNameLine1Txt></BusinessName>
+    </Filer>
+    <TaxYr>{year}</TaxYr>
+  </ReturnHeader>
+  <ReturnData>
+    <{body}><CYTotalRevenueAmt>1498250</CYTotalRevenueAmt></{body}>
+  </ReturnData>
+</Return>
+"""
+
+
+def _write_return(folder, name, ein='123456789', year=2021, return_type='990', body='IRS990'):
+    path = os.path.join(folder, name)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(RETURN_XML.format(ein=ein, year=year, return_type=return_type, body=body))
+    return path
+
+
+@pytest.fixture
+def efile_folder(tmp_path, monkeypatch):
+    folder = tmp_path / 'efile_xml'
+    os.makedirs(folder / '2021')
+    monkeypatch.setattr(Config, 'EFILE_XML_ENABLED', True)
+    monkeypatch.setattr(Config, 'EFILE_XML_FOLDER', str(folder))
+    monkeypatch.setattr(Config, 'EFILE_INDEX_PATH', str(tmp_path / 'index' / 'efile.pickle'))
+    return str(folder)
+
+
+def test_only_990_and_990ez_returns_are_indexed(efile_folder):
+    _write_return(efile_folder, '202101.xml', year=2020)
+    _write_return(os.path.join(efile_folder, '2021'), '202102.xml', return_type='990EZ', body='IRS990EZ')
+    _write_return(efile_folder, '202103.xml', year=2019, return_type='990PF', body='IRS990PF')
+    _write_return(efile_folder, '202104.xml', year=2018, return_type='990T', body='IRS990T')
+    efile_index.refresh_index(force=True)
+    returns = efile_index.find_returns('123456789')
+    assert [(filing['tax_period'], filing['return_type']) for filing in returns] == [
+        ('202012', '990'), ('202112', '990EZ')]
+
+
+def test_refresh_picks_up_changes_and_reloads_from_disk(efile_folder, monkeypatch):
+    first = _write_return(efile_folder, '202101.xml', year=2020)
+    efile_index.refresh_index(force=True)
+    assert len(efile_index.find_returns('123456789')) == 1
+
+    _write_return(os.path.join(efile_folder, '2021'), '202102.xml')
+    os.remove(first)
+    efile_index.refresh_index(force=True)
+    assert [filing['tax_period'] for filing in efile_index.find_returns('123456789')] == ['202112']
+
+    # A new worker loads the persisted index instead of re-reading every header
+    monkeypatch.setattr(efile_index, 'read_header', None)
+    monkeypatch.setattr(efile_index, '_index', DirectoryIndex(
+        'E-file', 'EFILE_XML_FOLDER', 'EFILE_INDEX_PATH', efile_index._index.version,
+        efile_index._scan_file, efile_index._add_file))
+    efile_index.refresh_index(force=True)
+    assert [filing['tax_period'] for filing in efile_index.find_returns('123456789')] == ['202112']
@@ -0,0 +1,153 @@
+# tests/test_form990_rules.py
+
+# Local imports
+from config import Config
+from utils.form990_rules import extract_fields, model_targets, apply_rules
+from utils.text_cleaner import clean_text
+
+HEADER = """Form 990
+Return of Organization Exempt From Income Tax
+OMB No. 1545-0047
+2019
+A For the 2019 calendar year, or tax year beginning 01/01/2019 , and ending 12/31/2019
+C Name of organization
+HOPE COMMUNITY FOOD BANK INC
+D Employer identification number
+12-3456789
+G Gross receipts $ 1,523,400"""
+
+PART_I = """Part I Summary
+1 Briefly describe the organization's mission or most significant activities:
+TO PROVIDE FOOD ASSISTANCE TO LOW-INCOME
+FAMILIES IN SPRINGFIELD.
+2 Check this box if the organization discontinued its operations
+Revenue 12 Total revenue - add lines 8 through 11 (must equal Part VIII, column (A), line 12) 1,402,118 1,498,250
+Expenses 18 Total expenses. Add lines 13-17 (must equal Part IX, column (A), line 25) 1,350,000 1,411,730
+Net Assets or Fund Balances 22 Net assets or fund balances. Subtract line 21 from line 20 845,000 931,520"""
+
+PART_VII = """Part VII Compensation of Officers, Directors, Trustees, Key Employees, Highest Compensated Employees
+Section A. Officers, Directors, Trustees, Key Employees, and Highest Compensated Employees
+(A) Name and title (B) Average hours per week (C) Position (D) Reportable compensation
+(1) JANE DOE 40.00 X X 85,000 0 12,500
+PRESIDENT
+(2) JOHN SMITH 2.00 X 0 0 0
+TREASURER
+1b Sub-total"""
+
+
+def _filing(*parts):
+    return '\n'.join(f"\n[Page {number}]\n{part}" for number, part in enumerate(parts, start=1))
+
+
+def test_header_fields():
+    result = extract_fields(_filing(HEADER + '\n' + PART_I))
+    general = result['data']['general_info']
+    assert general['ein'] == '123456789'
+    assert general['name'] == 'HOPE COMMUNITY FOOD BANK INC'
+    assert general['tax_year'] == '2019'
+    assert general['gross_receipts'] == 1523400
+    assert general['primary_purpose'] == 'TO PROVIDE FOOD ASSISTANCE TO LOW-INCOME FAMILIES IN SPRINGFIELD.'
+    confidence = result['confidence']
+    assert confidence['general_info.ein'] == 0.95
+    assert confidence['general_info.name'] == 0.85
+    assert confidence['general_info.tax_year'] == 0.95
+    assert confidence['general_info.gross_receipts'] == 0.95
+
+
+def test_part_i_totals_skip_line_references():
+    result = extract_fields(_filing(HEADER + '\n' + PART_I))
+    financial = result['data']['financial_data']
+    # Current year column, not the "lines 8 through 11" or "line 25" references
+    assert financial['total_revenue'] == 1498250
+    assert financial['total_expenses'] == 1411730
+    assert financial['net_assets'] == {'start_of_year': 845000, 'end_of_year': 931520}
+    for path in ('total_revenue', 'total_expenses', 'net_assets.start_of_year', 'net_assets.end_of_year'):
+        assert result['confidence'][f"financial_data.{path}"] == 0.95
+
+
+def test_wrapped_amount_lines():
+    part_i = PART_I.replace(' 1,402,118 1,498,250', '\n1,402,118 1,498,250')
+    part_i = part_i.replace(' 845,000 931,520', '\n(12,000) 931,520')
+    result = extract_fields(_filing(HEADER + '\n' + part_i))
+    financial = result['data']['financial_data']
+    assert financial['total_revenue'] == 1498250
+    assert financial['net_assets'] == {'start_of_year': -12000, 'end_of_year': 931520}
+    assert result['confidence']['financial_data.total_revenue'] == 0.85
+    assert result['confidence']['financial_data.net_assets.end_of_year'] == 0.85
+    # Unwrapped lines keep their full confidence
+    assert result['confidence']['financial_data.total_expenses'] == 0.95
+
+
+def test_single_wrapped_amount_is_low_confidence():
+    # A first-year filer prints only the current year column
+    part_i = PART_I.replace(' 1,402,118 1,498,250', '\n125')
+    result = extract_fields(_filing(HEADER + '\n' + part_i))
+    assert result['data']['financial_data']['total_revenue'] == 125
+    assert result['confidence']['financial_data.total_revenue'] == 0.75
+
+
+def test_part_x_net_assets_when_part_i_lacks_them():
+    part_i = PART_I.rsplit('\n', 1)[0]
+    part_x = """Part X Balance Sheet
+16 Total assets (add lines 1 through 15 (must equal line 34)) 1,210,000 1,305,400
+33 Total net assets or fund balances 845,000 931,520"""
+    result = extract_fields(_filing(HEADER + '\n' + part_i, part_x))
+    assert result['data']['financial_data']['net_assets'] == {'start_of_year': 845000, 'end_of_year': 931520}
+    assert result['confidence']['financial_data.net_assets.end_of_year'] == 0.9
+
+
+def test_missing_lines_have_zero_confidence():
+    result = extract_fields(_filing(HEADER))
+    assert result['data']['financial_data']['total_revenue'] == 0
+    assert result['confidence']['financial_data.total_revenue'] == 0.0
+    assert result['data']['board_members'] == []
+    assert result['confidence']['board_members'] == 0.0
+
+
+def test_part_vii_board_members():
+    result = extract_fields(_filing(HEADER + '\n' + PART_I, PART_VII))
+    assert result['data']['board_members'] == [
+        {'name': 'JANE DOE', 'title': 'PRESIDENT', 'compensation': 85000},
+        {'name': 'JOHN SMITH', 'title': 'TREASURER', 'compensation': 0},
+    ]
+    assert result['confidence']['board_members'] == 0.9
+
+
+def test_board_member_without_hours_lowers_section_confidence():
+    part_vii = PART_VII.replace('(2) JOHN SMITH 2.00 X 0 0 0', '(2) JOHN SMITH')
+    result = extract_fields(_filing(HEADER + '\n' + PART_I, part_vii))
+    assert result['data']['board_members'][1]['name'] == 'JOHN SMITH'
+    assert result['confidence']['board_members'] == 0.3
+
+
+def test_bare_amounts_at_page_edges_survive_cleaning():
+    # Every page ends in a different small amount on its own line, as wrapped
+    # values do; the cleaner must drop the running header but none of them
+    amounts = ['125', '0', '(12)', '77', '3', '19', '250', '42']
+    pages = [f"Form 990 (2019) Page 1\n{HEADER}\nPart I Summary\n"
+             "Revenue 12 Total revenue - add lines 8 through 11 (must equal Part VIII, column (A), line 12)\n125"]
+    pages += [f"Form 990 (2019) Page {number}\nSchedule line text {number}\n{amount}"
+              for number, amount in enumerate(amounts[1:], start=2)]
+    cleaned, stats = clean_text(_filing(*pages))
+    lines = cleaned.split('\n')
+    assert all(amount in lines for amount in amounts)
+    assert not any(line.startswith('Form 990 (2019) Page') for line in lines)
+    assert stats['repeated_lines_removed'] == len(pages)
+    result = extract_fields(cleaned)
+    assert result['data']['financial_data']['total_revenue'] == 125
+
+
+def test_model_targets_and_apply_rules():
+    rules = extract_fields(_filing(HEADER + '\n' + PART_I.replace(' 1,402,118 1,498,250', '\n125'), PART_VII))
+    keys, fields = model_targets(rules, ['general_info', 'financial_data', 'board_members', 'grants'])
+    # Only the weak total revenue goes back to the model, with the sections the rules cannot fill
+    assert keys == ['financial_data', 'grants']
+    assert fields == ['financial_data.total_revenue']
+
+    model = {'financial_data': {'total_revenue': 1498250, 'total_expenses': 1}, 'general_info': {'ein': ''}}
+    merged = apply_rules(model, rules)
+    # Confident rule values win; the weak one only fills what the model left empty
+    assert merged['financial_data']['total_expenses'] == 1411730
+    assert merged['financial_data']['total_revenue'] == 1498250
+    assert merged['general_info']['ein'] == '123456789'
+    assert rules['confidence']['financial_data.total_revenue'] < Config.RULE_MIN_CONFIDENCE
@@ -0,0 +1,123 @@
+# tests/test_job_queue.py
+
+# Standard library imports
+import os
+
+# Third-party library imports
+import pytest
+
+# Local imports
+from config import Config
+from benchmarks import synthetic_sedb, synthetic_990
+from utils import parse_cache, parse_engine, sedb_index, filing_index
+from utils.job_queue import celery_app, submit_search, read_status
+from utils.utils_functions import process_pdfs
+from utils.workspaces import get_workspace
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    """
+    Synthetic SEDB and filings, with every path the stages write to under
+    tmp_path and the stage tasks run eagerly in this process.
+    """
+    _, entities = synthetic_sedb.generate(str(tmp_path / 'sedb'), rows=260, sample=2)
+    filings = synthetic_990.generate(str(tmp_path / 'pdfs'), entities, years=(2021,), pages=3, image_ratio=0)
+    os.makedirs(tmp_path / 'efile_xml')
+    settings = {
+        'SEDB_FOLDER': str(tmp_path / 'sedb'),
+        'SEDB_INDEX_DIR': str(tmp_path / 'index' / 'sedb'),
+        'PDF_FOLDER': str(tmp_path / 'pdfs'),
+        'FILING_INDEX_PATH': str(tmp_path / 'index' / 'filings.pickle'),
+        'EFILE_XML_FOLDER': str(tmp_path / 'efile_xml'),
+        'EFILE_INDEX_PATH': str(tmp_path / 'index' / 'efile.pickle'),
+        'JOBS_DIR': str(tmp_path / 'jobs'),
+        'PARSE_CACHE_DIR': str(tmp_path / 'cache' / 'parsed'),
+        'RESULTS_DB_PATH': str(tmp_path / 'results.sqlite3'),
+        'METRICS_DIR': str(tmp_path / 'metrics'),
+        'JOB_QUEUE_EAGER': True,
+        'PARALLEL_PROCESSING': True,
+        'PARSE_WORKERS': 2,
+    }
+    for name, value in settings.items():
+        monkeypatch.setattr(Config, name, value)
+    monkeypatch.setattr(celery_app.conf, 'task_always_eager', True)
+    sedb_index.refresh_index()
+    filing_index.refresh_index(force=True)
+    yield {'entities': entities, 'filings': filings}
+    parse_engine.shutdown_pool()
+
+
+def _finished(job_id):
+    status = read_status(get_workspace(job_id))
+    assert status['state'] in ('done', 'failed')
+    return status
+
+
+def test_search_runs_every_stage(pipeline):
+    entity = pipeline['entities'][0]
+    status = _finished(submit_search(entity['NAME']))
+    assert status['state'] == 'done', status['message']
+    assert entity['EIN'] in status['result']['ein_list']
+    stages = [event['stage'] for event in status['events'] if event['state'] == 'running']
+    assert list(dict.fromkeys(stages)) == ['lookup', 'stage', 'parse']
+    reports = status['result']['parse_reports']
+    assert reports and all(report['error'] is None for report in reports)
+    assert any(filing.endswith('.txt') for filing in status['result']['parsed_files'])
+
+
+def test_unknown_entity_fails_at_lookup(pipeline):
+    status = _finished(submit_search('NO SUCH ORGANIZATION ANYWHERE'))
+    assert status['state'] == 'failed'
+    assert status['message'] == 'Entity not found.'
+    assert status['stage'] == 'lookup'
+
+
+def test_parse_stage_in_daemonic_worker_parses_inline(pipeline, monkeypatch):
+    # Celery prefork children are daemonic and may not start a parse pool
+    monkeypatch.setattr(parse_engine, 'pool_available', lambda: False)
+    status = _finished(submit_search(pipeline['entities'][0]['NAME']))
+    assert status['state'] == 'done', status['message']
+    assert parse_engine.pool_pids() == []
+
+
+def _parse_in_child(paths):
+    return [report['error'] for _, _, report in parse_engine.parse_documents(paths)]
+
+
+def test_parse_documents_in_prefork_child(pipeline):
+    billiard = pytest.importorskip('billiard')
+    paths = [filing['path'] for filing in pipeline['filings']]
+    with billiard.Pool(1) as pool:
+        errors = pool.apply(_parse_in_child, (paths,))
+    assert errors == [None] * len(paths)
+
+
+def test_parse_falls_back_inline_when_the_pool_cannot_start(pipeline, monkeypatch):
+    class FailingPool:
+        def submit(self, *args):
+            raise AssertionError('daemonic processes are not allowed to have children')
+
+        def shutdown(self, **kwargs):
+            pass
+
+    monkeypatch.setattr(parse_engine, '_get_pool', lambda: (FailingPool(), 1))
+    paths = [filing['path'] for filing in pipeline['filings']]
+    reports = [report for _, _, report in parse_engine.parse_documents(paths)]
+    assert len(reports) == len(paths)
+    assert all(report['error'] is None and report['pages'] for report in reports)
+
+
+def test_process_pdfs_releases_each_claim_once(pipeline, tmp_path, monkeypatch):
+    released = []
+    release = parse_cache.release
+
+    def counting_release(key):
+        released.append(key)
+        release(key)
+
+    monkeypatch.setattr(parse_cache, 'release', counting_release)
+    source_dir = os.path.dirname(pipeline['filings'][0]['path'])
+    reports = process_pdfs(source_dir, str(tmp_path / 'parsed'))
+    assert [report['status'] for report in reports] == ['parsed'] * len(reports)
+    assert len(released) == len(reports) == len(set(released))
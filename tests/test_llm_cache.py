@@ -0,0 +1,62 @@
+# tests/test_llm_cache.py
+
+# Standard library imports
+import os
+import json
+import time
+
+# Third-party library imports
+import pytest
+
+# Local imports
+from config import Config
+from utils import llm_cache
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'LLM_CACHE_DIR', str(tmp_path / 'llm'))
+    monkeypatch.setattr(Config, 'LLM_CACHE_TTL_SECONDS', 3600)
+    monkeypatch.setattr(llm_cache, '_total_bytes', None)
+    return str(tmp_path / 'llm')
+
+
+def _age(key, created_ago, used_ago):
+    """
+    Backdates an entry's creation time and its last use (mtime).
+    """
+    path = llm_cache._entry_path(key)
+    with open(path, 'r', encoding='utf-8') as f:
+        entry = json.load(f)
+    entry['created'] -= created_ago
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(entry, f)
+    used = time.time() - used_ago
+    os.utime(path, (used, used))
+
+
+def test_hits_do_not_extend_the_ttl(cache_dir):
+    llm_cache.put('aa' * 32, 'response')
+    _age('aa' * 32, created_ago=7200, used_ago=0)
+    assert llm_cache.get('aa' * 32) is None
+    assert not os.path.exists(llm_cache._entry_path('aa' * 32))
+
+
+def test_eviction_expires_by_creation_and_orders_by_use(cache_dir, monkeypatch):
+    for key in ('aa', 'bb', 'cc'):
+        llm_cache.put(key * 32, 'response')
+    size = os.path.getsize(llm_cache._entry_path('aa' * 32))
+    # Expired, but used a moment ago
+    _age('aa' * 32, created_ago=7200, used_ago=0)
+    # Fresh, least and most recently used
+    _age('bb' * 32, created_ago=0, used_ago=600)
+    _age('cc' * 32, created_ago=0, used_ago=60)
+    monkeypatch.setattr(Config, 'LLM_CACHE_MAX_BYTES', 3 * size)
+    llm_cache.put('dd' * 32, 'response')
+    assert [key for key in ('aa', 'bb', 'cc', 'dd') if os.path.exists(llm_cache._entry_path(key * 32))] == [
+        'bb', 'cc', 'dd']
+
+    monkeypatch.setattr(Config, 'LLM_CACHE_MAX_BYTES', 2 * size)
+    llm_cache.put('ee' * 32, 'response')
+    assert [key for key in ('bb', 'cc', 'dd', 'ee') if os.path.exists(llm_cache._entry_path(key * 32))] == [
+        'dd', 'ee']
@@ -0,0 +1,18 @@
+# tests/test_text_cleaner.py
+
+# Local imports
+from utils.text_cleaner import clean_text
+
+
+def test_non_printables_are_removed_in_and_beyond_the_bmp():
+    text = ('Total\u200b revenue\x00 1,498,250\n'
+            'HOPE FOOD\U000f0001 BANK\U000e0001\n'
+            'Grant \U0001d400 \U0001f600 \u00e9')
+    cleaned, _ = clean_text(text)
+    # Format, control and private use characters go, printable ones of any plane stay
+    assert cleaned.split('\n') == ['Total revenue 1,498,250', 'HOPE FOOD BANK', 'Grant \U0001d400 \U0001f600 \u00e9']
+
+
+def test_layout_whitespace_is_normalized():
+    cleaned, _ = clean_text('Part I\tSummary\x0cPart II\r\nSignature\u2028Block')
+    assert cleaned.split('\n') == ['Part I Summary', 'Part II', 'Signature', 'Block']
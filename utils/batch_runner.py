@@ -0,0 +1,263 @@
+# utils/batch_runner.py
+
+# Standard library imports
+import os
+import json
+import time
+import queue
+import argparse
+import threading
+
+# Local imports
+from common import CustomLogger
+from config import Config
+from utils.sedb_index import normalize_name
+from utils.job_queue import (celery_app, create_job, read_status, lookup_stage, stage_stage, parse_stage,
+                             extract_stage)
+from utils.workspaces import remove_workspace
+from utils.parse_engine import shutdown_pool, pool_pids
+from utils.resource_governor import memory_stats
+
+logger = CustomLogger.get_logger(__name__, log_file=Config.UTILS_LOG_FILE)
+logger.propagate = False
+
+# Run a batch with: python -m utils.batch_runner names.txt
+# Each entity goes through the same stage tasks as a /search/ job, called
+# in-process. Every stage has its own BATCH_SIZE worker threads, so one
+# entity can be extracted while the next ones are staged and parsed, and at
+# most MAX_ENTITIES entities hold a workspace at once.
+STAGES = (
+    ('lookup', lookup_stage),
+    ('stage', stage_stage),
+    ('parse', parse_stage),
+    ('extract', extract_stage),
+)
+
+
+def read_names(path):
+    """
+    Streams entity names from a file, one per line; blank lines and lines
+    starting with '#' are skipped.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            name = line.strip()
+            if name and not name.startswith('#'):
+                yield name
+
+
+def default_checkpoint_path(names_path):
+    stem = os.path.splitext(os.path.basename(names_path))[0]
+    return os.path.join(Config.BATCH_CHECKPOINT_DIR, f"{stem}.checkpoint.jsonl")
+
+
+def load_checkpoint(path):
+    """
+    Returns {normalized name: record} of the entities finished by earlier
+    runs; a later record for the same name replaces an earlier one. A torn
+    last line left by an interrupted run is ignored.
+    """
+    finished = {}
+    if not os.path.exists(path):
+        return finished
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Ignoring unreadable checkpoint line in {path}")
+                continue
+            finished[normalize_name(record['name'])] = record
+    return finished
+
+
+def _filing_count(result):
+    if 'filings' in result:
+        return len(result['filings'])
+    return len(result.get('parsed_files') or []) + len(result.get('xml_reports') or [])
+
+
+def _record(entity):
+    status = entity['status']
+    result = status.get('result', {})
+    return {
+        'name': entity['name'],
+        'job_id': entity['workspace']['job_id'],
+        'state': status.get('state'),
+        'message': status.get('message'),
+        'ein_list': result.get('ein_list', []),
+        'filings': _filing_count(result),
+        'stage_seconds': entity['stage_seconds'],
+        'seconds': round(time.perf_counter() - entity['start'], 3),
+        'finished': time.time(),
+    }
+
+
+def run_batch(names_path, checkpoint_path=None, extract=True, workers=None, max_in_flight=None, limit=None,
+              retry_failed=False, keep_workspaces=False):
+    """
+    Runs every entity named in names_path through lookup, staging, parsing
+    and (unless extract is False) extraction, with `workers` (BATCH_SIZE)
+    threads per stage and at most max_in_flight (MAX_ENTITIES) entities in
+    the pipeline. Extractions land in the results store under each
+    entity's job_id.
+    Each finished entity is appended to the checkpoint file, and entities
+    already in it are skipped, so an interrupted run picks up where it
+    stopped; failed ones are retried only with retry_failed. Entities that
+    were in flight when a run stopped are redone, mostly from the parse and
+    LLM caches.
+    Returns:
+        dict: Throughput summary, also written next to the checkpoint.
+    """
+    workers = workers or Config.BATCH_SIZE
+    max_in_flight = max_in_flight or Config.MAX_ENTITIES
+    checkpoint_path = checkpoint_path or default_checkpoint_path(names_path)
+    os.makedirs(os.path.dirname(os.path.abspath(checkpoint_path)), exist_ok=True)
+    finished = load_checkpoint(checkpoint_path)
+    stages = [stage for stage in STAGES if extract or stage[0] != 'extract']
+    stage_queues = [queue.Queue() for _ in stages]
+    done_queue = queue.Queue()
+    slots = threading.BoundedSemaphore(max_in_flight)
+    stop = threading.Event()
+    counts = {'entities': 0, 'done': 0, 'failed': 0, 'skipped': 0, 'filings': 0}
+    stage_totals = {name: {'entities': 0, 'seconds': 0.0} for name, _ in stages}
+
+    def stage_worker(index):
+        name, task = stages[index]
+        while True:
+            entity = stage_queues[index].get()
+            start = time.perf_counter()
+            try:
+                # The task records its outcome (or its failure) in the workspace status
+                task(entity['workspace']['job_id'])
+                status = read_status(entity['workspace']) or {}
+            except Exception as e:
+                logger.error(f"Batch entity '{entity['name']}' failed in {name} stage: {e}")
+                status = {'state': 'failed', 'message': f"An error occurred during the {name} stage."}
+            entity['stage_seconds'][name] = round(time.perf_counter() - start, 3)
+            if status.get('state') in ('done', 'failed') or index == len(stages) - 1:
+                entity['status'] = status
+                done_queue.put(entity)
+            else:
+                stage_queues[index + 1].put(entity)
+
+    def feed():
+        admitted = 0
+        seen = set()
+        try:
+            for name in read_names(names_path):
+                if stop.is_set() or (limit is not None and admitted >= limit):
+                    break
+                key = normalize_name(name)
+                previous = finished.get(key)
+                if key in seen or (previous is not None and (previous['state'] == 'done' or not retry_failed)):
+                    counts['skipped'] += 1
+                    continue
+                seen.add(key)
+                # Backpressure: wait for a finished entity to free its slot
+                while not slots.acquire(timeout=0.5):
+                    if stop.is_set():
+                        return
+                try:
+                    workspace = create_job(name, extract)
+                except OSError as e:
+                    logger.error(f"Could not create a workspace for '{name}': {e}")
+                    slots.release()
+                    continue
+                admitted += 1
+                stage_queues[0].put({'name': name, 'workspace': workspace, 'stage_seconds': {},
+                                     'start': time.perf_counter()})
+        finally:
+            done_queue.put(('fed', admitted))
+
+    # Bind the lazily created stage tasks once: worker threads calling them
+    # for the first time at once would race and find no request stack
+    celery_app.finalize(auto=True)
+    for index, (name, _) in enumerate(stages):
+        for worker in range(workers):
+            threading.Thread(target=stage_worker, args=(index,), name=f"batch-{name}-{worker}", daemon=True).start()
+    feeder = threading.Thread(target=feed, name='batch-feeder', daemon=True)
+
+    start = time.perf_counter()
+    logger.info(f"Batch run of {names_path}: {workers} workers per stage, {max_in_flight} entities in flight, "
+                f"{len(finished)} already checkpointed in {checkpoint_path}")
+    fed = None
+    interrupted = False
+    feeder.start()
+    try:
+        with open(checkpoint_path, 'a', encoding='utf-8') as checkpoint:
+            while fed is None or counts['entities'] < fed:
+                entity = done_queue.get()
+                if isinstance(entity, tuple):
+                    fed = entity[1]
+                    continue
+                record = _record(entity)
+                checkpoint.write(json.dumps(record) + '\n')
+                checkpoint.flush()
+                os.fsync(checkpoint.fileno())
+                if not keep_workspaces:
+                    remove_workspace(entity['workspace'])
+                slots.release()
+
+                counts['entities'] += 1
+                counts['done' if record['state'] == 'done' else 'failed'] += 1
+                counts['filings'] += record['filings']
+                for name, seconds in record['stage_seconds'].items():
+                    stage_totals[name]['entities'] += 1
+                    stage_totals[name]['seconds'] += seconds
+                logger.info(f"[{counts['entities']}{'' if fed is None else '/' + str(fed)}] '{record['name']}': "
+                            f"{record['state']} ({record['message']}) in {record['seconds']:.2f}s")
+    except KeyboardInterrupt:
+        interrupted = True
+        stop.set()
+        logger.warning("Batch run interrupted; in-flight entities will be redone on resume")
+    finally:
+        memory = memory_stats(pool_pids())
+        shutdown_pool()
+
+    seconds = time.perf_counter() - start
+    minutes = seconds / 60 or 1
+    summary = {
+        'names': names_path,
+        'checkpoint': checkpoint_path,
+        'interrupted': interrupted,
+        **counts,
+        'seconds': round(seconds, 3),
+        'entities_per_minute': round(counts['entities'] / minutes, 2),
+        'filings_per_minute': round(counts['filings'] / minutes, 2),
+        'stages': {name: {**totals, 'seconds': round(totals['seconds'], 3),
+                          'mean_seconds': round(totals['seconds'] / totals['entities'], 3) if totals['entities'] else 0.0}
+                   for name, totals in stage_totals.items()},
+        'memory': memory,
+    }
+    summary_path = f"{os.path.splitext(checkpoint_path)[0]}.summary.json"
+    try:
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+    except OSError as e:
+        logger.error(f"Error writing batch summary {summary_path}: {e}")
+    logger.info(f"Batch run finished: {counts['done']} done, {counts['failed']} failed, {counts['skipped']} skipped "
+                f"in {seconds:.2f}s ({summary['entities_per_minute']} entities/min)")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run a file of entity names through the search and extraction pipeline.')
+    parser.add_argument('names', help='File with one entity name per line')
+    parser.add_argument('--checkpoint', help='Checkpoint file (default: BATCH_CHECKPOINT_DIR/<names>.checkpoint.jsonl)')
+    parser.add_argument('--no-extract', action='store_true', help='Stop after parsing')
+    parser.add_argument('--workers', type=int, help='Workers per stage (default: BATCH_SIZE)')
+    parser.add_argument('--max-in-flight', type=int, help='Entities in the pipeline at once (default: MAX_ENTITIES)')
+    parser.add_argument('--limit', type=int, help='Process at most this many new entities')
+    parser.add_argument('--retry-failed', action='store_true', help='Redo entities that failed in an earlier run')
+    parser.add_argument('--keep-workspaces', action='store_true', help='Keep job workspaces after checkpointing')
+    args = parser.parse_args(argv)
+    summary = run_batch(args.names, checkpoint_path=args.checkpoint, extract=not args.no_extract,
+                        workers=args.workers, max_in_flight=args.max_in_flight, limit=args.limit,
+                        retry_failed=args.retry_failed, keep_workspaces=args.keep_workspaces)
+    print(json.dumps(summary, indent=2))
+    return 1 if summary['interrupted'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
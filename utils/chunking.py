@@ -0,0 +1,297 @@
+# utils/chunking.py
+
+# Standard library imports
+import os
+import re
+import json
+import math
+
+# Local imports
+from common import CustomLogger
+from config import Config
+
+logger = CustomLogger.get_logger(__name__, log_file=Config.GPT_HANDLER_FILE)
+logger.propagate = False
+
+_PAGE_RE = re.compile(r'\[Page (\d+)\]')
+_PAGE_LINE_RE = re.compile(r'^\[Page (\d+)\](?=\s*$)')
+_TOKEN_RE = re.compile(r'\w+|[^\w\s]')
+_SCHEDULE_RE = re.compile(r'\bSchedule\s+([A-R])\s*\(Form\s*990', re.IGNORECASE)
+_PART_RE = re.compile(r'\bPart\s+([IVX]{1,4})\b')
+
+# How far into a page (or line) a heading may start and still name the page.
+# Form 990 pages open with the running header, e.g. "Form 990 (2019) Page 7 Part VII".
+HEADING_WINDOW = 300
+
+# Schema sections extracted from their own chunks, and the Parts/Schedules that
+# hold them. Every other schema section is extracted from the 'core' chunks.
+SECTION_ROUTES = {
+    'board_members': {'parts': {'VII'}, 'schedules': {'J'}},
+    'grants': {'parts': set(), 'schedules': {'I', 'F', 'B'}},
+    'related_entities': {'parts': set(), 'schedules': {'R', 'L'}},
+}
+CORE_ROUTE = 'core'
+
+
+def estimate_tokens(text):
+    """
+    Estimates the model token count of text without a tokenizer: the larger
+    of its word/punctuation count and one token per four characters.
+    """
+    return max(len(_TOKEN_RE.findall(text)), math.ceil(len(text) / 4))
+
+
+def split_pages(text):
+    """
+    Splits parsed text on its '[Page N]' markers.
+    Returns:
+        list: (page_number, text) pairs; text before the first marker, or a
+        document without markers, is page 0.
+    """
+    pages = []
+    last_end = 0
+    last_number = 0
+    for match in _PAGE_RE.finditer(text):
+        if match.start() > last_end and text[last_end:match.start()].strip():
+            pages.append((last_number, text[last_end:match.start()]))
+        last_number = int(match.group(1))
+        last_end = match.end()
+    if text[last_end:].strip() or not pages:
+        pages.append((last_number, text[last_end:]))
+    return pages
+
+
+def iter_file_pages(path):
+    """
+    Streams a parsed text file as (page_number, text) pairs like
+    split_pages, holding one page in memory at a time. join_pages writes
+    each '[Page N]' marker on its own line.
+    """
+    number, lines = 0, []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            match = _PAGE_LINE_RE.match(line)
+            if match:
+                if ''.join(lines).strip():
+                    yield number, ''.join(lines)
+                number, lines = int(match.group(1)), [line[match.end():]]
+            else:
+                lines.append(line)
+    yield number, ''.join(lines)
+
+
+def read_head(path, max_chars):
+    """
+    The first max_chars characters of a text file, cut back to a line end.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        head = f.read(max_chars)
+    cut = head.rfind('\n')
+    return head[:cut + 1] if cut > 0 and len(head) == max_chars else head
+
+
+def _heading_route(text, anchored=False):
+    """
+    Returns the route named by a Part/Schedule heading within the first
+    HEADING_WINDOW characters of text (or at its very start when anchored),
+    CORE_ROUTE for any other heading, or None when there is none.
+    """
+    if anchored:
+        schedule, part = _SCHEDULE_RE.match(text), _PART_RE.match(text)
+    else:
+        head = text[:HEADING_WINDOW]
+        schedule, part = _SCHEDULE_RE.search(head), _PART_RE.search(head)
+    if schedule and (not part or schedule.start() <= part.start()):
+        key, value = 'schedules', schedule.group(1).upper()
+    elif part:
+        key, value = 'parts', part.group(1)
+    else:
+        return None
+    for route, headings in SECTION_ROUTES.items():
+        if value in headings[key]:
+            return route
+    return CORE_ROUTE
+
+
+def _page_sections(pages):
+    """
+    Yields the non-blank (route, page_number, text) sections of
+    (page_number, text) pages, one page at a time.
+    """
+    route = CORE_ROUTE
+    for page_number, page_text in pages:
+        route = _heading_route(page_text.lstrip()) or route
+        current = []
+        for line in page_text.splitlines(keepends=True):
+            # Within a page only a heading that opens a line starts a section
+            line_route = _heading_route(line.lstrip(), anchored=True) if current else None
+            if line_route and line_route != route:
+                if ''.join(current).strip():
+                    yield route, page_number, ''.join(current)
+                route, current = line_route, []
+            current.append(line)
+        if ''.join(current).strip():
+            yield route, page_number, ''.join(current)
+
+
+def split_sections(text):
+    """
+    Splits parsed text into routed sections on page markers and on
+    Part/Schedule headings at the start of a line. Pages without a heading
+    continue the previous section's route.
+    Returns:
+        list: (route, page_number, text) tuples in document order.
+    """
+    return list(_page_sections(split_pages(text)))
+
+
+def _split_oversized(text, max_tokens):
+    """
+    Cuts a section that alone exceeds max_tokens at whitespace.
+    """
+    pieces = []
+    max_chars = max(1, max_tokens * 4)
+    while estimate_tokens(text) > max_tokens and len(text) > max_chars:
+        cut = text.rfind(' ', 0, max_chars)
+        cut = cut if cut > 0 else max_chars
+        pieces.append(text[:cut])
+        text = text[cut:]
+    pieces.append(text)
+    return pieces
+
+
+def build_chunks(text, schema_keys, max_tokens=None):
+    """
+    Splits a parsed filing into extraction chunks of at most max_tokens
+    (CHUNK_MAX_TOKENS) estimated tokens. A filing that fits is one chunk
+    against schema_keys; otherwise sections are grouped by route and each
+    chunk is extracted against only its route's schema keys. Sections whose
+    route is not among schema_keys (already filled some other way), and core
+    sections when no core keys remain, are left out.
+    Returns:
+        list: dicts with route, schema_keys, text, tokens, first_page and
+        last_page, core chunks first, then in document order.
+    """
+    max_tokens = max_tokens or Config.CHUNK_MAX_TOKENS
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        pages = [number for number, _ in split_pages(text)]
+        return [{'route': CORE_ROUTE, 'schema_keys': list(schema_keys), 'text': text, 'tokens': tokens,
+                 'first_page': pages[0], 'last_page': pages[-1]}]
+
+    return _group_sections(split_sections(text), schema_keys, max_tokens)
+
+
+def spill_chunks(path, schema_keys, spill_dir, max_tokens=None):
+    """
+    build_chunks for a parsed text file too large to hold in memory: the
+    file is streamed page by page and each chunk is written to its own file
+    in spill_dir instead of kept as a string.
+    Returns:
+        list: Chunk dicts as from build_chunks, with path instead of text.
+    """
+    max_tokens = max_tokens or Config.CHUNK_MAX_TOKENS
+    os.makedirs(spill_dir, exist_ok=True)
+    return _group_sections(_page_sections(iter_file_pages(path)), schema_keys, max_tokens, spill_dir=spill_dir)
+
+
+def _group_sections(sections, schema_keys, max_tokens, spill_dir=None):
+    """
+    Groups routed sections into chunks of at most max_tokens per route,
+    kept as text or, with spill_dir, appended to one file per chunk.
+    """
+    core_keys = [key for key in schema_keys if key not in SECTION_ROUTES]
+    route_keys = {route: [route] for route in SECTION_ROUTES if route in schema_keys}
+    if core_keys:
+        route_keys[CORE_ROUTE] = core_keys
+
+    chunks = []
+    open_chunks = {}
+    try:
+        for route, page_number, section_text in sections:
+            if route not in route_keys:
+                continue
+            for piece in _split_oversized(section_text, max_tokens):
+                piece_tokens = estimate_tokens(piece)
+                chunk = open_chunks.get(route)
+                if chunk is None or chunk['tokens'] + piece_tokens > max_tokens:
+                    if chunk is not None and spill_dir:
+                        chunk.pop('file').close()
+                    chunk = open_chunks[route] = {'route': route, 'schema_keys': route_keys[route], 'parts': [],
+                                                  'tokens': 0, 'first_page': page_number, 'last_page': page_number}
+                    if spill_dir:
+                        chunk['path'] = os.path.join(spill_dir, f"chunk_{len(chunks):05d}.txt")
+                        chunk['file'] = open(chunk['path'], 'w', encoding='utf-8')
+                    chunks.append(chunk)
+                if spill_dir:
+                    chunk['file'].write(piece)
+                else:
+                    chunk['parts'].append(piece)
+                chunk['tokens'] += piece_tokens
+                chunk['last_page'] = page_number
+    finally:
+        for chunk in open_chunks.values():
+            if 'file' in chunk:
+                chunk.pop('file').close()
+
+    for chunk in chunks:
+        parts = chunk.pop('parts')
+        if not spill_dir:
+            chunk['text'] = ''.join(parts)
+    chunks.sort(key=lambda chunk: chunk['route'] != CORE_ROUTE)
+    tokens = sum(chunk['tokens'] for chunk in chunks)
+    summary = ', '.join(f"{chunk['route']} p{chunk['first_page']}-{chunk['last_page']} ({chunk['tokens']})"
+                        for chunk in chunks)
+    logger.info(f"Split {tokens} tokens into {len(chunks)} chunks{' on disk' if spill_dir else ''}: {summary}")
+    return chunks
+
+
+def completion_budget(chunk_tokens):
+    """
+    max_completion_tokens for a chunk: GPT_MAX_COMPLETION_TOKENS plus
+    CHUNK_COMPLETION_RATIO of its input, capped at GPT_MAX_COMPLETION_TOKENS_CAP.
+    """
+    budget = Config.GPT_MAX_COMPLETION_TOKENS + int(chunk_tokens * Config.CHUNK_COMPLETION_RATIO)
+    return min(budget, Config.GPT_MAX_COMPLETION_TOKENS_CAP)
+
+
+def _is_empty(value):
+    return value in (None, '', 0, [], {})
+
+
+def _merge_value(merged, value):
+    if isinstance(merged, dict) and isinstance(value, dict):
+        for key, item in value.items():
+            merged[key] = _merge_value(merged[key], item) if key in merged else item
+        return merged
+    if isinstance(merged, list) and isinstance(value, list):
+        # Concatenate in chunk order, dropping exact duplicates
+        seen = {json.dumps(item, sort_keys=True) for item in merged}
+        for item in value:
+            fingerprint = json.dumps(item, sort_keys=True)
+            if fingerprint not in seen:
+                seen.add(fingerprint)
+                merged.append(item)
+        return merged
+    # Scalars: the first chunk with a real value wins
+    return value if _is_empty(merged) else merged
+
+
+def merge_partials(partials):
+    """
+    Merges per-chunk JSON results deterministically. Each partial only
+    contributes its chunk's schema keys; dicts merge recursively, lists are
+    concatenated without duplicates and the first non-empty scalar wins.
+    Args:
+        partials (list): (schema_keys, json_data) pairs in chunk order.
+    Returns:
+        dict: The merged extraction.
+    """
+    merged = {}
+    for schema_keys, json_data in partials:
+        if not isinstance(json_data, dict):
+            continue
+        for key in schema_keys:
+            if key in json_data:
+                merged[key] = _merge_value(merged[key], json_data[key]) if key in merged else json_data[key]
+    return merged
@@ -0,0 +1,188 @@
+# utils/dir_index.py
+
+# Standard library imports
+import os
+import time
+import pickle
+import threading
+
+# Local imports
+from common import CustomLogger
+from config import Config
+
+logger = CustomLogger.get_logger(__name__, log_file=Config.UTILS_LOG_FILE)
+logger.propagate = False
+
+
+class DirectoryIndex:
+    """
+    Incremental EIN index of the files under one folder, persisted so a new
+    worker loads it instead of walking the whole tree. Refreshes re-list only
+    directories whose mtime changed (adding, removing or renaming a file bumps
+    its directory's mtime).
+
+    The owning module supplies two per-file callbacks:
+        scan_file(entry, previous): the os.DirEntry's info to keep (a picklable
+            tuple starting with size and mtime_ns), or None to skip the entry.
+            previous is the info kept by the last listing of the directory.
+        add_file(path, name, info): (ein, record) to index the file under, or None.
+
+    Persisted state:
+    {'version': version, 'root': folder,
+     'dirs': {relative_dir: {'mtime_ns': int, 'subdirs': [name, ...], 'files': {name: info}}}}
+    """
+
+    def __init__(self, label, root_setting, path_setting, version, scan_file, add_file):
+        self.label = label
+        # Config attribute names, read on every refresh
+        self.root_setting = root_setting
+        self.path_setting = path_setting
+        self.version = version
+        self.scan_file = scan_file
+        self.add_file = add_file
+        self._state = None
+        # Derived lookup table: {ein: {path: record}}
+        self._by_ein = {}
+        self._last_refresh = None
+        self._lock = threading.Lock()
+
+    def _index_dir(self, root, rel_dir, files, add):
+        """
+        Adds (add=True) or removes the files of one directory from the EIN table.
+        """
+        for name, info in files.items():
+            path = os.path.join(root, rel_dir, name) if rel_dir else os.path.join(root, name)
+            indexed = self.add_file(path, name, info)
+            if indexed is None:
+                continue
+            ein, record = indexed
+            if add:
+                self._by_ein.setdefault(ein, {})[path] = record
+            else:
+                records = self._by_ein.get(ein)
+                if records is not None:
+                    records.pop(path, None)
+                    if not records:
+                        del self._by_ein[ein]
+
+    def _scan_dir(self, path, previous_files):
+        """
+        Lists one directory, returning its subdirectory names and the info
+        scan_file keeps for each of its files, keyed by name.
+        """
+        subdirs = []
+        files = {}
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                    continue
+                info = self.scan_file(entry, previous_files.get(entry.name))
+                if info is not None:
+                    files[entry.name] = info
+        return sorted(subdirs), files
+
+    def _refresh(self, full=False):
+        """
+        Walks the folder and re-lists only directories whose mtime changed since
+        the last scan. With full=True every directory is re-listed and every
+        file re-scanned, which also picks up in-place rewrites. Returns True
+        when the index changed.
+        """
+        root = getattr(Config, self.root_setting)
+        old_dirs = self._state['dirs'] if self._state and self._state.get('root') == root else {}
+        if not old_dirs:
+            self._by_ein.clear()
+        new_dirs = {}
+        changed = False
+
+        pending = ['']
+        while pending:
+            rel_dir = pending.pop()
+            path = os.path.join(root, rel_dir) if rel_dir else root
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                continue
+            previous = old_dirs.get(rel_dir)
+            if previous is not None and previous['mtime_ns'] == mtime_ns and not full:
+                entry = previous
+            else:
+                subdirs, files = self._scan_dir(path, previous['files'] if previous else {})
+                entry = {'mtime_ns': mtime_ns, 'subdirs': subdirs, 'files': files}
+                if previous is None or previous['files'] != files:
+                    if previous is not None:
+                        self._index_dir(root, rel_dir, previous['files'], add=False)
+                    self._index_dir(root, rel_dir, files, add=True)
+                    changed = True
+                if previous is None or previous['subdirs'] != subdirs:
+                    changed = True
+            new_dirs[rel_dir] = entry
+            pending.extend(os.path.join(rel_dir, name) if rel_dir else name for name in entry['subdirs'])
+
+        # Directories that disappeared take their files with them
+        for rel_dir in old_dirs.keys() - new_dirs.keys():
+            self._index_dir(root, rel_dir, old_dirs[rel_dir]['files'], add=False)
+            changed = True
+
+        self._state = {'version': self.version, 'root': root, 'dirs': new_dirs}
+        return changed
+
+    def _load(self):
+        """
+        Loads the persisted index into this worker, if one exists for the current folder.
+        """
+        path = getattr(Config, self.path_setting)
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Discarding unreadable {self.label.lower()} index {path}: {e}")
+            return
+        if state.get('version') != self.version or state.get('root') != getattr(Config, self.root_setting):
+            return
+        self._state = state
+        self._by_ein.clear()
+        for rel_dir, entry in state['dirs'].items():
+            self._index_dir(state['root'], rel_dir, entry['files'], add=True)
+
+    def _save(self):
+        path = getattr(Config, self.path_setting)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self._state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def refresh(self, force=False, full=False):
+        """
+        Brings the index up to date with the folder. Unless force is set,
+        directory mtimes are re-checked at most every FILING_INDEX_REFRESH_SECONDS.
+        """
+        with self._lock:
+            if self._state is None:
+                self._load()
+            now = time.monotonic()
+            fresh = self._last_refresh is not None and now - self._last_refresh < Config.FILING_INDEX_REFRESH_SECONDS
+            if fresh and not force and not full:
+                return
+            start = time.perf_counter()
+            changed = self._refresh(full=full)
+            self._last_refresh = now
+            if changed:
+                logger.info(f"{self.label} index refreshed in {time.perf_counter() - start:.3f}s "
+                            f"({len(self._by_ein)} EINs, {len(self._state['dirs'])} directories)")
+                try:
+                    self._save()
+                except OSError as e:
+                    logger.error(f"Error saving {self.label.lower()} index: {e}")
+
+    def find(self, ein):
+        """
+        Returns:
+            list: The records indexed for an EIN, in no particular order.
+        """
+        with self._lock:
+            return list(self._by_ein.get(ein, {}).values())
@@ -0,0 +1,71 @@
+# utils/efile_index.py
+
+# Local imports
+from common import CustomLogger
+from config import Config
+from utils.dir_index import DirectoryIndex
+from utils.efile_xml import read_header, EFILE_PARSER_VERSION, SUPPORTED_RETURN_TYPES
+
+logger = CustomLogger.get_logger(__name__, log_file=Config.UTILS_LOG_FILE)
+logger.propagate = False
+
+# Bump whenever the persisted layout changes
+INDEX_VERSION = 1
+
+
+def _scan_file(entry, previous):
+    """
+    Keeps (size, mtime_ns, header or None) for XML returns. e-file XML names
+    are IRS object IDs, not EINs, so each file's header is read once and
+    reused from the previous listing until the file changes.
+    """
+    if not entry.name.endswith('.xml'):
+        return None
+    st = entry.stat()
+    if previous is not None and previous[:2] == (st.st_size, st.st_mtime_ns):
+        return previous
+    try:
+        header = read_header(entry.path)
+    except Exception as e:
+        logger.warning(f"Skipping unreadable e-file XML {entry.path}: {e}")
+        header = None
+    return st.st_size, st.st_mtime_ns, header
+
+
+def _add_file(path, name, info):
+    """
+    Indexes 990 and 990-EZ returns under their filer's EIN.
+    """
+    size, mtime_ns, header = info
+    if header is None or header['return_type'] not in SUPPORTED_RETURN_TYPES:
+        return None
+    return header['ein'], {**header, 'path': path, 'name': name, 'size': size, 'mtime': mtime_ns / 1e9}
+
+
+# Headers are cached in the persisted index, so a parser change invalidates it too
+_index = DirectoryIndex('E-file', 'EFILE_XML_FOLDER', 'EFILE_INDEX_PATH', (INDEX_VERSION, EFILE_PARSER_VERSION),
+                        _scan_file, _add_file)
+
+
+def refresh_index(force=False, full=False):
+    """
+    Brings the e-file index up to date with EFILE_XML_FOLDER. Unless force is
+    set, directory mtimes are re-checked at most every FILING_INDEX_REFRESH_SECONDS.
+    """
+    _index.refresh(force=force, full=full)
+
+
+def find_returns(ein):
+    """
+    Returns the e-file XML returns indexed for an EIN, oldest tax period first.
+    Args:
+        ein (str): 9-digit EIN.
+    Returns:
+        list: Dicts with path, name, size, mtime, ein, tax_period ('YYYYMM'),
+        tax_year and return_type.
+    """
+    if not Config.EFILE_XML_ENABLED:
+        return []
+    refresh_index()
+    filings = _index.find(ein)
+    return sorted(filings, key=lambda f: (f['tax_period'] or '', f['name']))
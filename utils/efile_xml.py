@@ -0,0 +1,287 @@
+# utils/efile_xml.py
+
+# Standard library imports
+import time
+import xml.etree.ElementTree as ET
+
+# Local imports
+from common import CustomLogger
+from config import Config
+
+logger = CustomLogger.get_logger(__name__, log_file=Config.UTILS_LOG_FILE)
+logger.propagate = False
+
+# Bump whenever the XML -> schema mapping changes
+EFILE_PARSER_VERSION = 1
+
+# Return types the body mapping covers; 990-PF and 990-T returns are not
+# indexed, so their PDFs stay in use
+SUPPORTED_RETURN_TYPES = ('990', '990EZ')
+
+# Header fields: leaf tag -> [(ancestor path suffix, field)], first match wins.
+# Tag names cover the 2013+ e-file schemas and their 2009-2012 predecessors.
+_HEADER_FIELDS = {
+    'EIN': [(('Filer', 'EIN'), 'ein')],
+    'BusinessNameLine1Txt': [(('Filer', 'BusinessName', 'BusinessNameLine1Txt'), 'name')],
+    'BusinessNameLine1': [(('Filer', 'Name', 'BusinessNameLine1'), 'name')],
+    'TaxPeriodEndDt': [(('ReturnHeader', 'TaxPeriodEndDt'), 'tax_period_end')],
+    'TaxPeriodEndDate': [(('ReturnHeader', 'TaxPeriodEndDate'), 'tax_period_end')],
+    'TaxPeriodBeginDt': [(('ReturnHeader', 'TaxPeriodBeginDt'), 'tax_period_begin')],
+    'TaxPeriodBeginDate': [(('ReturnHeader', 'TaxPeriodBeginDate'), 'tax_period_begin')],
+    'TaxYr': [(('ReturnHeader', 'TaxYr'), 'tax_year')],
+    'TaxYear': [(('ReturnHeader', 'TaxYear'), 'tax_year')],
+    'ReturnTypeCd': [(('ReturnHeader', 'ReturnTypeCd'), 'return_type')],
+    'ReturnType': [(('ReturnHeader', 'ReturnType'), 'return_type')],
+}
+
+# Return body fields: leaf tag -> [(ancestor path suffix, dotted schema path)]
+_BODY_FIELDS = {
+    'GrossReceiptsAmt': [(('IRS990', 'GrossReceiptsAmt'), 'general_info.gross_receipts'),
+                         (('IRS990EZ', 'GrossReceiptsAmt'), 'general_info.gross_receipts')],
+    'GrossReceipts': [(('IRS990', 'GrossReceipts'), 'general_info.gross_receipts')],
+    'ActivityOrMissionDesc': [(('IRS990', 'ActivityOrMissionDesc'), 'general_info.primary_purpose')],
+    'ActivityOrMissionDescription': [(('IRS990', 'ActivityOrMissionDescription'), 'general_info.primary_purpose')],
+    'MissionDesc': [(('IRS990', 'MissionDesc'), 'general_info.primary_purpose')],
+    'PrimaryExemptPurposeTxt': [(('IRS990EZ', 'PrimaryExemptPurposeTxt'), 'general_info.primary_purpose')],
+    'CYTotalRevenueAmt': [(('IRS990', 'CYTotalRevenueAmt'), 'financial_data.total_revenue')],
+    'TotalRevenueCurrentYear': [(('IRS990', 'TotalRevenueCurrentYear'), 'financial_data.total_revenue')],
+    'TotalRevenueAmt': [(('IRS990EZ', 'TotalRevenueAmt'), 'financial_data.total_revenue')],
+    'CYTotalExpensesAmt': [(('IRS990', 'CYTotalExpensesAmt'), 'financial_data.total_expenses')],
+    'TotalExpensesCurrentYear': [(('IRS990', 'TotalExpensesCurrentYear'), 'financial_data.total_expenses')],
+    'TotalExpensesAmt': [(('IRS990EZ', 'TotalExpensesAmt'), 'financial_data.total_expenses')],
+    'NetAssetsOrFundBalancesBOYAmt': [(('IRS990', 'NetAssetsOrFundBalancesBOYAmt'),
+                                       'financial_data.net_assets.start_of_year'),
+                                      (('IRS990EZ', 'NetAssetsOrFundBalancesBOYAmt'),
+                                       'financial_data.net_assets.start_of_year')],
+    'NetAssetsOrFundBalancesBOY': [(('IRS990', 'NetAssetsOrFundBalancesBOY'),
+                                    'financial_data.net_assets.start_of_year')],
+    'NetAssetsOrFundBalancesEOYAmt': [(('IRS990', 'NetAssetsOrFundBalancesEOYAmt'),
+                                       'financial_data.net_assets.end_of_year'),
+                                      (('IRS990EZ', 'NetAssetsOrFundBalancesEOYAmt'),
+                                       'financial_data.net_assets.end_of_year')],
+    'NetAssetsOrFundBalancesEOY': [(('IRS990', 'NetAssetsOrFundBalancesEOY'),
+                                    'financial_data.net_assets.end_of_year')],
+    # Schedule C Part II-A (501(h) electing organizations), filing organization column
+    'FilingOrganizationsTotalAmt': [
+        (('TotalGrassrootsLobbyingGrp', 'FilingOrganizationsTotalAmt'), 'lobbying_data.grassroots_lobbying.amount'),
+        (('GrassrootsNontaxableAmtGrp', 'FilingOrganizationsTotalAmt'),
+         'lobbying_data.grassroots_lobbying.nontaxable_amount'),
+        (('TotalDirectLobbyingGrp', 'FilingOrganizationsTotalAmt'), 'lobbying_data.direct_lobbying.amount'),
+        (('LobbyingNontaxableAmountGrp', 'FilingOrganizationsTotalAmt'),
+         'lobbying_data.direct_lobbying.nontaxable_amount'),
+        (('TotalLobbyingExpendGrp', 'FilingOrganizationsTotalAmt'), 'lobbying_data.total_lobbying.amount'),
+        (('SubtractLine1fFromLine1cGrp', 'FilingOrganizationsTotalAmt'),
+         'lobbying_data.total_lobbying.excess_lobbying'),
+    ],
+}
+
+# Repeating groups collected whole: group tag -> kind
+_GROUPS = {
+    'Form990PartVIISectionAGrp': 'board_member',
+    'Form990PartVIISectionA': 'board_member',
+    'OfficerDirectorTrusteeEmplGrp': 'board_member',
+    'RecipientTable': 'grant_paid',
+    'IdDisregardedEntitiesGrp': 'disregarded entity',
+    'IdRelatedTaxExemptOrgGrp': 'related tax-exempt organization',
+    'IdRelatedOrgTxblPartnershipGrp': 'related partnership',
+    'IdRelatedOrgTxblCorpTrGrp': 'related corporation or trust',
+    'TransactionsRelatedOrgGrp': 'transaction',
+}
+
+_AMOUNT_FIELDS = ('gross_receipts', 'total_revenue', 'total_expenses', 'start_of_year', 'end_of_year',
+                  'amount', 'nontaxable_amount', 'excess_lobbying')
+
+
+def _local(tag):
+    # '{http://www.irs.gov/efile}EIN' -> 'EIN'
+    return tag.rsplit('}', 1)[-1]
+
+
+def _amount(text):
+    try:
+        return int(float(text))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _first(values, *tags):
+    for tag in tags:
+        if values.get(tag):
+            return values[tag]
+    return ''
+
+
+def _match(rules, stack):
+    for suffix, field in rules:
+        if tuple(stack[-len(suffix):]) == suffix:
+            return field
+    return None
+
+
+def _tax_period(header):
+    """
+    'YYYYMM' of the tax period end, the form used by the PDF filing index.
+    """
+    end = header.get('tax_period_end', '')
+    return end[:4] + end[5:7] if len(end) >= 7 else None
+
+
+def read_header(xml_path):
+    """
+    Reads only the ReturnHeader of an e-file XML document, stopping at its
+    closing tag, so indexing a large return costs a few KB of parsing.
+    Returns:
+        dict: ein, name, tax_period ('YYYYMM'), tax_year and return_type, or
+        None when the document has no filer EIN.
+    """
+    header = {}
+    stack = []
+    for event, elem in ET.iterparse(xml_path, events=('start', 'end')):
+        tag = _local(elem.tag)
+        if event == 'start':
+            stack.append(tag)
+            continue
+        field = _match(_HEADER_FIELDS.get(tag, ()), stack)
+        if field and field not in header and elem.text and elem.text.strip():
+            header[field] = elem.text.strip()
+        stack.pop()
+        if tag == 'ReturnHeader':
+            break
+    if not header.get('ein'):
+        return None
+    return {
+        'ein': header['ein'],
+        'name': header.get('name', ''),
+        'tax_period': _tax_period(header),
+        'tax_year': header.get('tax_year') or header.get('tax_period_begin', '')[:4],
+        'return_type': header.get('return_type', ''),
+    }
+
+
+def _board_member(values):
+    return {
+        'name': _first(values, 'PersonNm', 'NamePerson', 'BusinessNameLine1Txt', 'BusinessNameLine1'),
+        'title': _first(values, 'TitleTxt', 'Title'),
+        'compensation': _amount(_first(values, 'ReportableCompFromOrgAmt', 'ReportableCompFromOrganization',
+                                       'CompensationAmt')),
+    }
+
+
+def _grant_paid(values):
+    return {
+        'recipient': _first(values, 'BusinessNameLine1Txt', 'BusinessNameLine1', 'RecipientPersonNm'),
+        'amount': _amount(_first(values, 'CashGrantAmt', 'AmountOfCashGrant'))
+                  + _amount(_first(values, 'NonCashAssistanceAmt', 'AmountOfNonCashAssistance')),
+        'purpose': _first(values, 'PurposeOfGrantTxt', 'PurposeOfGrant'),
+    }
+
+
+def _related_entities(groups):
+    """
+    Schedule R related organizations, with the Part V transactions attached
+    by counterparty name.
+    """
+    entities = []
+    by_name = {}
+    for kind, values in groups:
+        if kind in ('board_member', 'grant_paid', 'transaction'):
+            continue
+        entity = {'name': _first(values, 'BusinessNameLine1Txt', 'BusinessNameLine1'),
+                  'ein': _first(values, 'EIN'), 'relationship': kind, 'transactions': []}
+        entities.append(entity)
+        by_name.setdefault(entity['name'].lower(), entity)
+    for kind, values in groups:
+        if kind != 'transaction':
+            continue
+        name = _first(values, 'BusinessNameLine1Txt', 'BusinessNameLine1')
+        entity = by_name.get(name.lower())
+        if entity is None:
+            entity = by_name[name.lower()] = {'name': name, 'ein': '', 'relationship': 'transaction counterparty',
+                                              'transactions': []}
+            entities.append(entity)
+        entity['transactions'].append({'type': _first(values, 'TransactionTypeTxt', 'TransactionTypeCd'),
+                                       'amount': _amount(_first(values, 'InvolvedAmt', 'AmountInvolved'))})
+    return entities
+
+
+def _empty_result():
+    return {
+        'general_info': {'ein': '', 'name': '', 'tax_year': '', 'gross_receipts': 0, 'primary_purpose': ''},
+        'financial_data': {'total_revenue': 0, 'total_expenses': 0,
+                           'net_assets': {'start_of_year': 0, 'end_of_year': 0}},
+        'board_members': [],
+        'grants': {'paid': [], 'received': []},
+        'related_entities': [],
+        'lobbying_data': {
+            'grassroots_lobbying': {'amount': 0, 'nontaxable_amount': 0},
+            'direct_lobbying': {'amount': 0, 'nontaxable_amount': 0},
+            'total_lobbying': {'amount': 0, 'excess_lobbying': 0},
+        },
+        'visualization_data': {'network_graph': {'nodes': [], 'edges': []},
+                               'bar_chart': {'revenue_vs_expenses': [], 'assets_over_time': []}},
+        'analysis_summary': {
+            'red_flags': {'high_compensation': [], 'grant_concentration': [], 'large_transactions': [],
+                          'excessive_lobbying': []},
+            'financial_health': {'assets_liabilities_discrepancy': False, 'net_assets_trend': ''},
+            'potential_conflicts': [],
+        },
+    }
+
+
+def parse_return(xml_path):
+    """
+    Stream-parses an IRS e-file 990/990-EZ XML return with iterparse into
+    the schema.yaml JSON shape, clearing each element once it is read so
+    memory stays flat for large returns. Visualization and analysis
+    sections are left empty; they are derived data, not filed data.
+    Returns:
+        dict: The extracted data.
+    """
+    start = time.perf_counter()
+    header = {}
+    fields = {}
+    groups = []
+    group = None
+    stack = []
+    for event, elem in ET.iterparse(xml_path, events=('start', 'end')):
+        tag = _local(elem.tag)
+        if event == 'start':
+            stack.append(tag)
+            if group is None and tag in _GROUPS:
+                group = (_GROUPS[tag], {}, len(stack))
+            continue
+
+        text = elem.text.strip() if elem.text else ''
+        if text:
+            if group is not None:
+                group[1].setdefault(tag, text)
+            elif 'ReturnHeader' in stack:
+                field = _match(_HEADER_FIELDS.get(tag, ()), stack)
+                if field:
+                    header.setdefault(field, text)
+            else:
+                field = _match(_BODY_FIELDS.get(tag, ()), stack)
+                if field:
+                    fields.setdefault(field, text)
+        if group is not None and len(stack) == group[2]:
+            groups.append(group[:2])
+            group = None
+        stack.pop()
+        elem.clear()
+
+    result = _empty_result()
+    general_info = result['general_info']
+    general_info['ein'] = header.get('ein', '')
+    general_info['name'] = header.get('name', '')
+    general_info['tax_year'] = header.get('tax_year') or header.get('tax_period_begin', '')[:4]
+    for path, text in fields.items():
+        target = result
+        *parents, leaf = path.split('.')
+        for parent in parents:
+            target = target[parent]
+        target[leaf] = _amount(text) if leaf in _AMOUNT_FIELDS else text
+    result['board_members'] = [_board_member(values) for kind, values in groups if kind == 'board_member']
+    result['grants']['paid'] = [_grant_paid(values) for kind, values in groups if kind == 'grant_paid']
+    result['related_entities'] = _related_entities(groups)
+    logger.info(f"Parsed e-file XML {xml_path} in {time.perf_counter() - start:.3f}s")
+    return result
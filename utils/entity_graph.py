@@ -0,0 +1,412 @@
+# utils/entity_graph.py
+
+# Standard library imports
+import re
+import time
+import threading
+from array import array
+from collections import deque
+
+# Local imports
+from common import CustomLogger
+from config import Config
+from utils import results_store
+from utils.sedb_index import normalize_name
+
+logger = CustomLogger.get_logger(__name__, log_file=Config.UTILS_LOG_FILE)
+logger.propagate = False
+
+# Edge kinds, stored as one byte per edge
+GRANT, TRANSACTION, RELATED = 0, 1, 2
+EDGE_KINDS = ('grant', 'transaction', 'related')
+# Kinds that move money: grants follow their direction, transactions either way
+_MONEY_KINDS = (GRANT, TRANSACTION)
+
+_EIN_RE = re.compile(r'^\d{9}$')
+
+# In-memory graph for this worker. Nodes are dense integers; each node has an
+# array of outgoing and of incoming edge ids, and edge attributes live in
+# parallel arrays indexed by edge id. Edges of a filing that is re-saved are
+# marked dead and dropped from the adjacency arrays on the next compaction.
+_node_ids = {}        # node key ('ein:123456789' or 'name:foodbank') -> node id
+_node_keys = []       # node id -> key
+_node_labels = []     # node id -> display name
+_name_nodes = {}      # normalized name -> node id of the EIN node carrying it
+_out = []             # node id -> array('I') of edge ids
+_in = []              # node id -> array('I') of edge ids
+_edge_src = array('I')
+_edge_dst = array('I')
+_edge_kind = array('B')
+_edge_amount = array('q')
+_edge_alive = bytearray()
+_edge_labels = {}     # edge id -> relationship / transaction type, when there is one
+_filing_edges = {}    # results store filing id -> list of edge ids
+_filing_hashes = {}   # results store filing id -> data_hash the edges were built from
+_live_edges = 0
+_dead_edges = 0       # dead edge ids still listed in the adjacency arrays
+_generation = None
+_lock = threading.Lock()
+
+
+def _node(ein=None, name=None):
+    """
+    Returns the node id for an organization, creating it if needed.
+    Organizations with an EIN are keyed by it; name-only organizations
+    resolve to the EIN node that carries the same name when one exists.
+    """
+    name = (name or '').strip()
+    name_key = normalize_name(name) if name else ''
+    ein = re.sub(r'\D', '', ein or '')
+    if _EIN_RE.match(ein):
+        key = f"ein:{ein}"
+    elif name_key in _name_nodes:
+        return _name_nodes[name_key]
+    elif name_key:
+        key = f"name:{name_key}"
+    else:
+        return None
+    node_id = _node_ids.get(key)
+    if node_id is None:
+        node_id = _node_ids[key] = len(_node_keys)
+        _node_keys.append(key)
+        _node_labels.append(name or ein)
+        _out.append(array('I'))
+        _in.append(array('I'))
+    elif name and _node_labels[node_id] == ein:
+        _node_labels[node_id] = name
+    if key.startswith('ein:') and name_key:
+        _name_nodes.setdefault(name_key, node_id)
+    return node_id
+
+
+def _add_edge(src, dst, kind, amount=0, label=None):
+    global _live_edges
+    if src is None or dst is None or src == dst:
+        return None
+    edge_id = len(_edge_src)
+    _edge_src.append(src)
+    _edge_dst.append(dst)
+    _edge_kind.append(kind)
+    _edge_amount.append(int(amount or 0))
+    _edge_alive.append(1)
+    _live_edges += 1
+    if label:
+        _edge_labels[edge_id] = label
+    _out[src].append(edge_id)
+    _in[dst].append(edge_id)
+    return edge_id
+
+
+def _amount(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _add_filing(filing_id, ein, name, data):
+    """
+    Adds the grant, related entity and transaction edges of one stored extraction.
+    """
+    org = _node(ein, name)
+    edges = []
+    grants = data.get('grants') or {}
+    for grant in grants.get('paid') or []:
+        edges.append(_add_edge(org, _node(grant.get('ein'), grant.get('recipient')), GRANT,
+                               _amount(grant.get('amount')), grant.get('purpose')))
+    for grant in grants.get('received') or []:
+        edges.append(_add_edge(_node(grant.get('ein'), grant.get('source')), org, GRANT,
+                               _amount(grant.get('amount')), grant.get('purpose')))
+    for entity in data.get('related_entities') or []:
+        related = _node(entity.get('ein'), entity.get('name'))
+        edges.append(_add_edge(org, related, RELATED, 0, entity.get('relationship')))
+        for transaction in entity.get('transactions') or []:
+            edges.append(_add_edge(org, related, TRANSACTION, _amount(transaction.get('amount')),
+                                   transaction.get('type')))
+    _filing_edges[filing_id] = [edge_id for edge_id in edges if edge_id is not None]
+
+
+def _remove_filing(filing_id):
+    global _dead_edges, _live_edges
+    for edge_id in _filing_edges.pop(filing_id, ()):
+        _edge_alive[edge_id] = 0
+        _edge_labels.pop(edge_id, None)
+        _dead_edges += 1
+        _live_edges -= 1
+    _filing_hashes.pop(filing_id, None)
+
+
+def _compact():
+    """
+    Drops dead edge ids from the adjacency arrays once they make up a
+    quarter of the listed edges. Edge ids stay stable; only the lists shrink.
+    """
+    global _dead_edges
+    if _dead_edges * 3 < _live_edges:
+        return
+    for lists in (_out, _in):
+        for node_id, edge_ids in enumerate(lists):
+            lists[node_id] = array('I', (edge_id for edge_id in edge_ids if _edge_alive[edge_id]))
+    _dead_edges = 0
+
+
+def _sync():
+    """
+    Brings the graph up to date with the results store. Only filings whose
+    data hash changed since the last sync are re-read, and only when the
+    store's generation moved. Caller holds _lock.
+    """
+    global _generation
+    current = results_store.generation()
+    if current == _generation:
+        return
+    start = time.perf_counter()
+    hashes = results_store.filing_hashes()
+    changed = [filing_id for filing_id, data_hash in hashes.items() if _filing_hashes.get(filing_id) != data_hash]
+    for filing_id in _filing_hashes.keys() - hashes.keys():
+        _remove_filing(filing_id)
+    for filing_id in changed:
+        filing = results_store.get_filing(filing_id)
+        if filing is None:
+            continue
+        _remove_filing(filing_id)
+        _add_filing(filing_id, filing['ein'], filing['name'], filing['data'])
+        _filing_hashes[filing_id] = filing['data_hash']
+    _compact()
+    _generation = current
+    if changed:
+        logger.info(f"Entity graph synced {len(changed)} filings in {time.perf_counter() - start:.3f}s "
+                    f"({len(_node_keys)} nodes, {_live_edges} edges)")
+
+
+def _resolve(entity):
+    """
+    Node id for an EIN or organization name, or None when the graph has no such node.
+    """
+    ein = re.sub(r'\D', '', entity or '')
+    if _EIN_RE.match(ein) and f"ein:{ein}" in _node_ids:
+        return _node_ids[f"ein:{ein}"]
+    name_key = normalize_name(entity or '')
+    if name_key in _name_nodes:
+        return _name_nodes[name_key]
+    return _node_ids.get(f"name:{name_key}")
+
+
+def _edges_of(node_id):
+    """
+    Yields (edge id, neighbor) for the live edges of a node in either direction.
+    """
+    for edge_id in _out[node_id]:
+        if _edge_alive[edge_id]:
+            yield edge_id, _edge_dst[edge_id]
+    for edge_id in _in[node_id]:
+        if _edge_alive[edge_id]:
+            yield edge_id, _edge_src[edge_id]
+
+
+def _node_json(node_id):
+    key = _node_keys[node_id]
+    return {'id': key, 'label': _node_labels[node_id], 'ein': key[4:] if key.startswith('ein:') else None}
+
+
+def _edge_json(edge_id):
+    kind = EDGE_KINDS[_edge_kind[edge_id]]
+    return {'from': _node_keys[_edge_src[edge_id]], 'to': _node_keys[_edge_dst[edge_id]], 'kind': kind,
+            'amount': _edge_amount[edge_id], 'relationship': _edge_labels.get(edge_id) or kind}
+
+
+def neighborhood(entity, hops=2, max_nodes=None):
+    """
+    Returns the organizations within hops edges of entity (EIN or name),
+    following edges in both directions, breadth first until max_nodes
+    (GRAPH_MAX_NODES) are reached.
+    Returns:
+        dict: nodes, edges (among the returned nodes) and truncated, or None
+        when the entity is not in the graph.
+    """
+    max_nodes = max_nodes or Config.GRAPH_MAX_NODES
+    with _lock:
+        _sync()
+        start_id = _resolve(entity)
+        if start_id is None:
+            return None
+        depth = {start_id: 0}
+        queue = deque([start_id])
+        truncated = False
+        while queue:
+            node_id = queue.popleft()
+            if depth[node_id] == hops:
+                continue
+            for _, neighbor in _edges_of(node_id):
+                if neighbor in depth:
+                    continue
+                if len(depth) >= max_nodes:
+                    truncated = True
+                    break
+                depth[neighbor] = depth[node_id] + 1
+                queue.append(neighbor)
+        edge_ids = {edge_id for node_id in depth for edge_id in _out[node_id]
+                    if _edge_alive[edge_id] and _edge_dst[edge_id] in depth}
+        return {'nodes': [{**_node_json(node_id), 'hops': hops_away} for node_id, hops_away in depth.items()],
+                'edges': [_edge_json(edge_id) for edge_id in sorted(edge_ids)], 'truncated': truncated}
+
+
+def shortest_path(source, target, max_hops=None):
+    """
+    Returns the fewest-hop chain of relationships between two organizations
+    (EINs or names), ignoring edge direction; a bidirectional breadth-first
+    search so hubs are expanded from the smaller side.
+    Returns:
+        dict: nodes and edges along the path, or None when either is
+        unknown or no path of at most max_hops (GRAPH_MAX_HOPS) exists.
+    """
+    max_hops = max_hops or Config.GRAPH_MAX_HOPS
+    with _lock:
+        _sync()
+        source_id, target_id = _resolve(source), _resolve(target)
+        if source_id is None or target_id is None:
+            return None
+        if source_id == target_id:
+            return {'nodes': [_node_json(source_id)], 'edges': []}
+        # node -> (previous node, edge id) on each side
+        parents = ({source_id: None}, {target_id: None})
+        frontiers = ([source_id], [target_id])
+        meeting = None
+        hops = 0
+        while frontiers[0] and frontiers[1] and hops < max_hops and meeting is None:
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            next_frontier = []
+            for node_id in frontiers[side]:
+                for edge_id, neighbor in _edges_of(node_id):
+                    if neighbor in parents[side]:
+                        continue
+                    parents[side][neighbor] = (node_id, edge_id)
+                    if neighbor in parents[1 - side]:
+                        meeting = neighbor
+                        break
+                    next_frontier.append(neighbor)
+                if meeting is not None:
+                    break
+            frontiers = (next_frontier, frontiers[1]) if side == 0 else (frontiers[0], next_frontier)
+            hops += 1
+        if meeting is None:
+            return None
+
+        node_ids, edge_ids = [meeting], []
+        step = parents[0][meeting]
+        while step is not None:
+            node_ids.insert(0, step[0])
+            edge_ids.insert(0, step[1])
+            step = parents[0][step[0]]
+        step = parents[1][meeting]
+        while step is not None:
+            node_ids.append(step[0])
+            edge_ids.append(step[1])
+            step = parents[1][step[0]]
+        return {'nodes': [_node_json(node_id) for node_id in node_ids],
+                'edges': [_edge_json(edge_id) for edge_id in edge_ids]}
+
+
+def _money_edges(node_id, reverse=False):
+    """
+    Yields (edge id, neighbor) for the money edges leaving a node (or, with
+    reverse, arriving at it): grants in their direction, transactions either way.
+    """
+    forward, backward = (_in, _out) if reverse else (_out, _in)
+    ends = (_edge_src, _edge_dst) if reverse else (_edge_dst, _edge_src)
+    for edge_id in forward[node_id]:
+        if _edge_alive[edge_id] and _edge_kind[edge_id] in _MONEY_KINDS:
+            yield edge_id, ends[0][edge_id]
+    for edge_id in backward[node_id]:
+        if _edge_alive[edge_id] and _edge_kind[edge_id] == TRANSACTION:
+            yield edge_id, ends[1][edge_id]
+
+
+def _distances_to(target_id, max_hops):
+    """
+    Money-edge hop counts from every node that can reach target within max_hops.
+    """
+    distance = {target_id: 0}
+    queue = deque([target_id])
+    while queue:
+        node_id = queue.popleft()
+        if distance[node_id] == max_hops:
+            continue
+        for _, previous in _money_edges(node_id, reverse=True):
+            if previous not in distance:
+                distance[previous] = distance[node_id] + 1
+                queue.append(previous)
+    return distance
+
+
+def _flow_paths(source_id, target_id, max_hops, limit):
+    """
+    Depth-first enumeration of simple money paths from source to target,
+    only stepping to nodes that can still reach the target in the hops
+    left, so hubs off the way to the target are never expanded.
+    """
+    distance = _distances_to(target_id, max_hops)
+    if source_id not in distance:
+        return []
+    paths = []
+    node_path = [source_id]
+    edge_path = []
+
+    def visit(node_id):
+        if len(paths) >= limit:
+            return
+        if node_id == target_id:
+            paths.append(list(edge_path))
+            return
+        if len(edge_path) >= max_hops:
+            return
+        hops_left = max_hops - len(edge_path) - 1
+        for edge_id, neighbor in list(_money_edges(node_id)):
+            if distance.get(neighbor, max_hops + 1) > hops_left or neighbor in node_path:
+                continue
+            node_path.append(neighbor)
+            edge_path.append(edge_id)
+            visit(neighbor)
+            node_path.pop()
+            edge_path.pop()
+
+    visit(source_id)
+    return paths
+
+
+def money_flows(source, target, max_hops=None, limit=None):
+    """
+    Finds how money moves between two organizations: every simple path of
+    grants and transactions of at most max_hops (GRAPH_MAX_HOPS) edges from
+    source to target and from target to source, up to limit
+    (GRAPH_MAX_PATHS) per direction. Each path reports its bottleneck, the
+    smallest amount along it, and paths are ordered by it.
+    Returns:
+        dict: 'outgoing' and 'incoming' path lists, or None when either
+        organization is unknown.
+    """
+    max_hops = max_hops or Config.GRAPH_MAX_HOPS
+    limit = limit or Config.GRAPH_MAX_PATHS
+    with _lock:
+        _sync()
+        source_id, target_id = _resolve(source), _resolve(target)
+        if source_id is None or target_id is None:
+            return None
+        flows = {}
+        for direction, (start_id, end_id) in (('outgoing', (source_id, target_id)),
+                                              ('incoming', (target_id, source_id))):
+            paths = []
+            for edge_ids in _flow_paths(start_id, end_id, max_hops, limit):
+                paths.append({'edges': [_edge_json(edge_id) for edge_id in edge_ids],
+                              'bottleneck': min(_edge_amount[edge_id] for edge_id in edge_ids)})
+            flows[direction] = sorted(paths, key=lambda path: (-path['bottleneck'], len(path['edges'])))
+        return flows
+
+
+def graph_stats():
+    """
+    Returns the node and live edge counts of this worker's graph.
+    """
+    with _lock:
+        _sync()
+        return {'nodes': len(_node_keys), 'edges': _live_edges, 'generation': _generation}
@@ -0,0 +1,138 @@
+# utils/extraction_engine.py
+
+# Standard library imports
+import time
+import asyncio
+import threading
+
+# Local imports
+from common import CustomLogger
+from config import Config
+from utils import metrics
+
+logger = CustomLogger.get_logger(__name__, log_file=Config.GPT_HANDLER_FILE)
+logger.propagate = False
+
+# openai (most of a web worker's import time), httpx and tenacity are only
+# imported once the first GPT call starts the extraction loop.
+
+# One event loop thread per worker process owns the async client, so every
+# request shares its connection pool and the GPT_MAX_CONCURRENCY bound.
+_loop = None
+_client = None
+_semaphore = None
+_lock = threading.Lock()
+
+
+def retryable_errors():
+    """
+    Transient API failures worth another attempt; anything else fails the file at once.
+    """
+    from openai import APIConnectionError, APITimeoutError, RateLimitError, InternalServerError
+    return (APIConnectionError, APITimeoutError, RateLimitError, InternalServerError)
+
+
+def _start_loop():
+    global _loop, _client, _semaphore
+    with _lock:
+        if _loop is None:
+            import httpx
+            from openai import AsyncOpenAI
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='gpt-extraction-loop', daemon=True).start()
+            limits = httpx.Limits(max_connections=Config.GPT_MAX_CONCURRENCY,
+                                  max_keepalive_connections=Config.GPT_MAX_CONCURRENCY)
+
+            async def init():
+                # Created on the loop they are used from
+                client = AsyncOpenAI(api_key=Config.OPENAI_API_KEY, base_url=Config.GPT_API_ENDPOINT or None,
+                                     max_retries=0, timeout=Config.GPT_TIMEOUT_SECONDS,
+                                     http_client=httpx.AsyncClient(limits=limits, timeout=Config.GPT_TIMEOUT_SECONDS))
+                return client, asyncio.Semaphore(Config.GPT_MAX_CONCURRENCY)
+
+            _client, _semaphore = asyncio.run_coroutine_threadsafe(init(), loop).result()
+            _loop = loop
+            logger.info(f"Started GPT extraction loop with {Config.GPT_MAX_CONCURRENCY} concurrent calls")
+        return _loop
+
+
+async def _complete(prompt, max_completion_tokens=None):
+    """
+    Sends one prompt, retrying transient failures with jittered exponential
+    backoff. Returns (response_text, attempts).
+    """
+    from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+    attempts = 0
+    async for attempt in AsyncRetrying(
+        retry=retry_if_exception_type(retryable_errors()),
+        stop=stop_after_attempt(Config.GPT_MAX_ATTEMPTS),
+        wait=wait_random_exponential(multiplier=1, max=Config.GPT_RETRY_MAX_WAIT_SECONDS),
+        reraise=True,
+    ):
+        with attempt:
+            attempts += 1
+            async with _semaphore:
+                response = await _client.chat.completions.create(
+                    model=Config.GPT_MODEL,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=1,
+                    max_completion_tokens=max_completion_tokens or Config.GPT_MAX_COMPLETION_TOKENS,
+                    n=1,
+                )
+    usage = getattr(response, 'usage', None)
+    if usage is not None:
+        metrics.inc('gpt_tokens_total', usage.prompt_tokens or 0, kind='prompt')
+        metrics.inc('gpt_tokens_total', usage.completion_tokens or 0, kind='completion')
+    return response.choices[0].message.content.strip(), attempts
+
+
+async def _complete_one(key, prompt, max_completion_tokens):
+    start = time.perf_counter()
+    result = {'key': key, 'text': '', 'error': None, 'attempts': 0}
+    try:
+        result['text'], result['attempts'] = await _complete(prompt, max_completion_tokens)
+    except Exception as e:
+        logger.error(f"GPT call for {key} failed: {e}")
+        result['error'] = str(e)
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    metrics.observe('gpt_call_seconds', result['seconds'], outcome='failed' if result['error'] else 'ok')
+    return result
+
+
+async def _complete_all(prompts, completion_tokens):
+    results = await asyncio.gather(*(_complete_one(key, prompt, completion_tokens.get(key))
+                                     for key, prompt in prompts.items()))
+    return {result['key']: result for result in results}
+
+
+def complete_many(prompts, completion_tokens=None):
+    """
+    Sends every prompt concurrently (at most GPT_MAX_CONCURRENCY in flight
+    per worker) and waits for all of them.
+    Args:
+        prompts (dict): {key: prompt}, e.g. keyed by parsed text file.
+        completion_tokens (dict): Optional {key: max_completion_tokens};
+            other keys use GPT_MAX_COMPLETION_TOKENS.
+    Returns:
+        dict: {key: {'text', 'error', 'attempts', 'seconds'}}; text is empty
+        and error set when the call failed after its retries.
+    """
+    if not prompts:
+        return {}
+    loop = _start_loop()
+    start = time.perf_counter()
+    results = asyncio.run_coroutine_threadsafe(_complete_all(prompts, completion_tokens or {}), loop).result()
+    failed = sum(1 for result in results.values() if result['error'])
+    logger.info(f"Completed {len(results)} GPT calls ({failed} failed) in {time.perf_counter() - start:.2f}s")
+    return results
+
+
+def complete(prompt):
+    """
+    Sends a single prompt. Returns the response text, or raises the last
+    error once retries are exhausted.
+    """
+    result = complete_many({'prompt': prompt})['prompt']
+    if result['error']:
+        raise RuntimeError(result['error'])
+    return result['text']
@@ -0,0 +1,75 @@
+# utils/filing_index.py
+
+# Standard library imports
+import re
+
+# Local imports
+from utils.dir_index import DirectoryIndex
+
+# Bump whenever the persisted layout or the filename parsing changes
+INDEX_VERSION = 1
+
+# Filing names start with the 9-digit EIN; the tax period (YYYYMM or YYYY)
+# is the first plausible date group after it, e.g. 020533102_201912_990.pdf
+_EIN_RE = re.compile(r'^(\d{9})')
+_TAX_PERIOD_RE = re.compile(r'(?<!\d)((?:19|20)\d{2})(0[1-9]|1[0-2])?(?!\d)')
+
+
+def parse_tax_period(filename):
+    """
+    Extracts the tax period from a filing name as 'YYYYMM' (or 'YYYY' when
+    only the year is present). Returns None when no period is found.
+    """
+    match = _TAX_PERIOD_RE.search(filename[9:])
+    if not match:
+        return None
+    return match.group(1) + (match.group(2) or '')
+
+
+def _filing_record(path, name, size, mtime_ns):
+    return {
+        'path': path,
+        'name': name,
+        'size': size,
+        'mtime': mtime_ns / 1e9,
+        'tax_period': parse_tax_period(name),
+    }
+
+
+def _scan_file(entry, previous):
+    """
+    Keeps (size, mtime_ns) for PDF filings whose name starts with an EIN.
+    """
+    if not entry.name.endswith('.pdf') or not _EIN_RE.match(entry.name):
+        return None
+    st = entry.stat()
+    return st.st_size, st.st_mtime_ns
+
+
+def _add_file(path, name, info):
+    size, mtime_ns = info
+    return _EIN_RE.match(name).group(1), _filing_record(path, name, size, mtime_ns)
+
+
+_index = DirectoryIndex('Filing', 'PDF_FOLDER', 'FILING_INDEX_PATH', INDEX_VERSION, _scan_file, _add_file)
+
+
+def refresh_index(force=False, full=False):
+    """
+    Brings the filing index up to date with PDF_FOLDER. Unless force is set,
+    directory mtimes are re-checked at most every FILING_INDEX_REFRESH_SECONDS.
+    """
+    _index.refresh(force=force, full=full)
+
+
+def find_filings(ein):
+    """
+    Returns the filings indexed for an EIN, oldest tax period first.
+    Args:
+        ein (str): 9-digit EIN.
+    Returns:
+        list: Dicts with path, name, size, mtime and tax_period.
+    """
+    refresh_index()
+    filings = _index.find(ein)
+    return sorted(filings, key=lambda f: (f['tax_period'] or '', f['name']))
@@ -0,0 +1,337 @@
+# utils/form990_rules.py
+
+# Standard library imports
+import re
+import copy
+
+# Local imports
+from common import CustomLogger
+from config import Config
+
+logger = CustomLogger.get_logger(__name__, log_file=Config.GPT_HANDLER_FILE)
+logger.propagate = False
+
+# Schema sections the rules can fill; every other section always goes to the model
+RULE_SECTIONS = ('general_info', 'financial_data', 'board_members')
+
+_AMOUNT = r'\(\d{1,3}(?:,\d{3})*\)|-?\d{1,3}(?:,\d{3})+|-?\d+'
+_AMOUNT_RE = re.compile(_AMOUNT)
+_TRAILING_AMOUNTS_RE = re.compile(rf'(?:\s+\$?(?:{_AMOUNT}))+\s*$')
+_AMOUNTS_ONLY_RE = re.compile(rf'^\$?(?:{_AMOUNT})(?:\s+\$?(?:{_AMOUNT}))*$')
+# "line 20", "lines 8 through 11", "lines 13-17": references whose numbers are not values
+_LINE_REF_RE = re.compile(r'\blines?\s+\d+[a-z]?(?:\s*(?:through|to|and|-|–|—)\s*\d+[a-z]?)?', re.IGNORECASE)
+_PART_HEADING_RE = re.compile(r'^Part\s+([IVX]{1,4})\b')
+_SCHEDULE_HEADING_RE = re.compile(r'^Schedule\s+[A-R]\s*\(Form\s*990', re.IGNORECASE)
+_PAGE_MARKER_RE = re.compile(r'^\[Page \d+\]$')
+
+_EIN_RE = re.compile(r'\b(\d{2})-?(\d{7})\b')
+_EIN_LABEL_RE = re.compile(r'Employer identification number', re.IGNORECASE)
+_NAME_LABEL_RE = re.compile(r'\bC?\s*Name of organization\b', re.IGNORECASE)
+_CALENDAR_YEAR_RE = re.compile(r'For the (\d{4}) calendar year', re.IGNORECASE)
+_TAX_YEAR_BEGIN_RE = re.compile(r'tax year beginning\s+\d{1,2}[-/]\d{1,2}[-/](\d{4})', re.IGNORECASE)
+_FORM_YEAR_RE = re.compile(r'\bForm 990\s*\((\d{4})\)')
+_GROSS_RECEIPTS_RE = re.compile(rf'\bG\s*Gross receipts\s*\$?\s*({_AMOUNT})', re.IGNORECASE)
+_MISSION_RE = re.compile(r'Briefly describe the organization.s mission or most significant activities:?\s*(.*)',
+                         re.IGNORECASE)
+_MISSION_END_RE = re.compile(r'^(?:2\s*Check this box|Activities\s*&\s*Governance|3\s*Number of voting)', re.IGNORECASE)
+
+# Part I lines 12, 18 and 22 (prior and current year columns); Part X line 33 (line 32 from 2020)
+_TOTAL_REVENUE_RE = re.compile(r'^(?:Revenue\s+)?12\s*Total revenue\b', re.IGNORECASE)
+_TOTAL_EXPENSES_RE = re.compile(r'^(?:Expenses\s+)?18\s*Total expenses\b', re.IGNORECASE)
+_NET_ASSETS_RE = re.compile(r'^(?:Net Assets or Fund Balances\s+)?22\s*Net assets or fund balances\b', re.IGNORECASE)
+_PART_X_NET_ASSETS_RE = re.compile(r'^3[23]\s*Total net assets or fund balances\b', re.IGNORECASE)
+
+_MEMBER_START_RE = re.compile(r'^\((\d{1,3})\)\s*(\S.*)$')
+_MEMBER_END_RE = re.compile(r'^(?:1b\b|Sub-total|Section B\b|c\s*Total from continuation|d\s*Total \(add lines)',
+                            re.IGNORECASE)
+_HOURS_RE = re.compile(r'\b\d{1,3}\.\d{2}\b')
+_CHECK_MARK_RE = re.compile(r'(?<!\w)X(?!\w)')
+
+
+def _to_amount(token):
+    token = token.replace('$', '').replace(',', '').strip()
+    if token.startswith('(') and token.endswith(')'):
+        return -int(token[1:-1])
+    return int(token)
+
+
+def _trailing_amounts(line):
+    """
+    Amounts printed at the end of a form line, after line references
+    ("add lines 8 through 11") are blanked out.
+    """
+    match = _TRAILING_AMOUNTS_RE.search(_LINE_REF_RE.sub(' ', line))
+    if not match:
+        return []
+    return [_to_amount(token) for token in _AMOUNT_RE.findall(match.group(0))]
+
+
+def _regions(text):
+    """
+    Splits parsed text into lines by form region: 'header' (everything before
+    the first Part heading) and one entry per Part number. A Schedule heading
+    ends the current Part.
+    """
+    regions = {'header': []}
+    current = regions['header']
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or _PAGE_MARKER_RE.match(line):
+            continue
+        heading = _PART_HEADING_RE.match(line)
+        if heading:
+            current = regions.setdefault(heading.group(1), [])
+        elif _SCHEDULE_HEADING_RE.match(line):
+            current = regions.setdefault('schedules', [])
+        current.append(line)
+    return regions
+
+
+def _line_amounts(lines, label_re, columns):
+    """
+    Finds the first line matching label_re and reads its trailing amounts,
+    or the amounts on the next line when the values wrapped onto it.
+    Returns:
+        tuple: (amounts, confidence); ([], 0.0) when the line is missing.
+    """
+    for index, line in enumerate(lines):
+        if not label_re.search(line):
+            continue
+        amounts = _trailing_amounts(line)
+        confidence = 0.95
+        if not amounts and index + 1 < len(lines) and _AMOUNTS_ONLY_RE.match(lines[index + 1]):
+            amounts = [_to_amount(token) for token in _AMOUNT_RE.findall(lines[index + 1])]
+            confidence = 0.85
+        if len(amounts) > columns:
+            # A line reference that was not recognized; values are the last columns
+            amounts, confidence = amounts[-columns:], confidence - 0.1
+        elif len(amounts) < columns:
+            confidence -= 0.1
+        return amounts, confidence if amounts else 0.0
+    return [], 0.0
+
+
+def _general_info(lines):
+    fields = {}
+    header = '\n'.join(lines)
+
+    ein = None
+    for index, line in enumerate(lines):
+        if _EIN_LABEL_RE.search(line):
+            match = _EIN_RE.search(' '.join(lines[index:index + 4]))
+            if match:
+                ein = (match.group(1) + match.group(2), 0.95)
+            break
+    if ein is None:
+        match = _EIN_RE.search(header)
+        ein = (match.group(1) + match.group(2), 0.7) if match else ('', 0.0)
+    fields['ein'] = ein
+
+    name = ('', 0.0)
+    for index, line in enumerate(lines):
+        match = _NAME_LABEL_RE.search(line)
+        if not match:
+            continue
+        candidates = [line[match.end():]] + lines[index + 1:index + 3]
+        for candidate in candidates:
+            candidate = _EIN_LABEL_RE.sub('', _EIN_RE.sub('', candidate))
+            candidate = re.sub(r'^D\s+|\s+D$', '', candidate.strip()).strip(' ,.')
+            if re.search(r'[A-Za-z]{2}', candidate) and not re.search(r'Doing business as', candidate, re.IGNORECASE):
+                letters = [char for char in candidate if char.isalpha()]
+                upper = sum(char.isupper() for char in letters) / len(letters)
+                name = (candidate, 0.85 if upper > 0.8 else 0.6)
+                break
+        break
+    fields['name'] = name
+
+    match = _CALENDAR_YEAR_RE.search(header)
+    if match:
+        fields['tax_year'] = (match.group(1), 0.95)
+    elif _TAX_YEAR_BEGIN_RE.search(header):
+        fields['tax_year'] = (_TAX_YEAR_BEGIN_RE.search(header).group(1), 0.85)
+    elif _FORM_YEAR_RE.search(header):
+        fields['tax_year'] = (_FORM_YEAR_RE.search(header).group(1), 0.8)
+    else:
+        fields['tax_year'] = ('', 0.0)
+
+    match = _GROSS_RECEIPTS_RE.search(header)
+    fields['gross_receipts'] = (_to_amount(match.group(1)), 0.95) if match else (0, 0.0)
+    return fields
+
+
+def _primary_purpose(lines):
+    for index, line in enumerate(lines):
+        match = _MISSION_RE.search(line)
+        if not match:
+            continue
+        purpose = [match.group(1)]
+        for following in lines[index + 1:index + 6]:
+            if _MISSION_END_RE.match(following):
+                break
+            purpose.append(following)
+        purpose = ' '.join(part for part in purpose if part).strip()
+        return (purpose, 0.85) if len(purpose) >= 10 else (purpose, 0.4)
+    return ('', 0.0)
+
+
+def _financial_data(regions):
+    part_i = regions.get('I', [])
+    fields = {}
+
+    amounts, confidence = _line_amounts(part_i, _TOTAL_REVENUE_RE, 2)
+    fields['total_revenue'] = (amounts[-1], confidence) if amounts else (0, 0.0)
+    amounts, confidence = _line_amounts(part_i, _TOTAL_EXPENSES_RE, 2)
+    fields['total_expenses'] = (amounts[-1], confidence) if amounts else (0, 0.0)
+
+    amounts, confidence = _line_amounts(part_i, _NET_ASSETS_RE, 2)
+    if len(amounts) < 2:
+        # Part X prints beginning and end of year net assets as well
+        part_x_amounts, part_x_confidence = _line_amounts(regions.get('X', []), _PART_X_NET_ASSETS_RE, 2)
+        if len(part_x_amounts) > len(amounts):
+            amounts, confidence = part_x_amounts, part_x_confidence - 0.05
+    if len(amounts) >= 2:
+        fields['net_assets.start_of_year'] = (amounts[-2], confidence)
+        fields['net_assets.end_of_year'] = (amounts[-1], confidence)
+    else:
+        fields['net_assets.start_of_year'] = (0, 0.0)
+        fields['net_assets.end_of_year'] = (amounts[-1], confidence) if amounts else (0, 0.0)
+    return fields
+
+
+def _member_blocks(lines):
+    """
+    Groups Part VII Section A lines into one block per numbered "(n)" row.
+    """
+    blocks = []
+    for line in lines:
+        if _MEMBER_END_RE.match(line):
+            break
+        start = _MEMBER_START_RE.match(line)
+        if start:
+            blocks.append([start.group(2)])
+        elif blocks:
+            blocks[-1].append(line)
+    return blocks
+
+
+def _board_member(block):
+    """
+    Reads name, title and reportable compensation (column D) from one
+    Part VII row: the name opens the row, the title is the first line of
+    words after it, and column D is the first amount after the hours.
+    Returns:
+        tuple: (member dict, confidence).
+    """
+    joined = ' '.join(block)
+    hours = _HOURS_RE.search(joined)
+    name = _HOURS_RE.split(block[0])[0]
+    name = _AMOUNT_RE.split(name)[0].strip(' ,.')
+    title = ''
+    for line in block[1:]:
+        words = _CHECK_MARK_RE.sub('', _HOURS_RE.sub('', line))
+        words = _AMOUNT_RE.sub('', words).strip(' ,.')
+        if re.search(r'[A-Za-z]{2}', words):
+            title = words
+            break
+    rest = joined[hours.end():] if hours else ''
+    amounts = [_to_amount(token) for token in _AMOUNT_RE.findall(_CHECK_MARK_RE.sub('', _HOURS_RE.sub('', rest)))]
+
+    member = {'name': name, 'title': title, 'compensation': amounts[0] if amounts else 0}
+    if not name or not hours or not amounts:
+        return member, 0.3
+    confidence = 0.9 if len(amounts) >= 3 else 0.75
+    return member, confidence if title else confidence - 0.15
+
+
+def _board_members(regions):
+    members = []
+    confidence = 0.0
+    for block in _member_blocks(regions.get('VII', [])):
+        member, member_confidence = _board_member(block)
+        members.append(member)
+        confidence = member_confidence if len(members) == 1 else min(confidence, member_confidence)
+    return members, confidence
+
+
+def extract_fields(text):
+    """
+    Reads general_info, financial_data and board_members from parsed Form
+    990 text with layout and regex rules: the header block and Part I lines
+    1, 12, 18 and 22, Part X for net assets when Part I lacks them, and the
+    Part VII Section A rows.
+    Returns:
+        dict: 'data' shaped like those schema sections, and 'confidence'
+        from 0 to 1 per field, keyed by dotted path ('financial_data.total_revenue');
+        board_members is scored as a whole.
+    """
+    regions = _regions(text)
+    fields = {}
+    page_one = regions['header'] + regions.get('I', [])
+    for key, value in _general_info(regions['header'] or page_one).items():
+        fields[f"general_info.{key}"] = value
+    fields['general_info.primary_purpose'] = _primary_purpose(page_one)
+    for key, value in _financial_data(regions).items():
+        fields[f"financial_data.{key}"] = value
+    fields['board_members'] = _board_members(regions)
+
+    data = {}
+    for path, (value, _) in fields.items():
+        target = data
+        *parents, leaf = path.split('.')
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[leaf] = value
+    confidence = {path: round(max(score, 0.0), 2) for path, (_, score) in fields.items()}
+    confident = sum(score >= Config.RULE_MIN_CONFIDENCE for score in confidence.values())
+    logger.info(f"Rule extraction filled {confident}/{len(confidence)} fields at confidence >= "
+                f"{Config.RULE_MIN_CONFIDENCE}")
+    return {'data': data, 'confidence': confidence}
+
+
+def model_targets(rules, schema_keys):
+    """
+    Decides what still goes to the model for one filing.
+    Returns:
+        tuple: (schema sections to extract, dotted paths of the missing or
+        low-confidence fields inside sections the rules partly filled).
+    """
+    if rules is None:
+        return list(schema_keys), []
+    keys, fields = [], []
+    for key in schema_keys:
+        if key not in RULE_SECTIONS:
+            keys.append(key)
+            continue
+        weak = [path for path, score in rules['confidence'].items()
+                if path.split('.')[0] == key and score < Config.RULE_MIN_CONFIDENCE]
+        if weak:
+            keys.append(key)
+            fields.extend(path for path in weak if '.' in path)
+    return keys, fields
+
+
+def _is_empty(value):
+    return value in (None, '', 0, [], {})
+
+
+def apply_rules(json_data, rules):
+    """
+    Overlays rule values on the model's result: confident rule fields
+    always win, weaker ones only fill what the model left empty.
+    """
+    merged = copy.deepcopy(json_data) if isinstance(json_data, dict) else {}
+    if rules is None:
+        return merged
+    for path, score in rules['confidence'].items():
+        source = rules['data']
+        target = merged
+        *parents, leaf = path.split('.')
+        for parent in parents:
+            source = source[parent]
+            if not isinstance(target.get(parent), dict):
+                target[parent] = {}
+            target = target[parent]
+        value = source[leaf]
+        if score >= Config.RULE_MIN_CONFIDENCE or (_is_empty(target.get(leaf)) and not _is_empty(value)):
+            target[leaf] = value
+    return merged
@@ -0,0 +1,80 @@
+# utils/import_profile.py
+
+# Standard library imports
+import os
+import re
+import sys
+import argparse
+import subprocess
+
+# One line of `python -X importtime` output: self and cumulative microseconds, then the
+# module name indented by two spaces per nesting level
+_LINE_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)$')
+
+
+def profile_import(module='app', cwd=None, env=None):
+    """
+    Imports module in a fresh interpreter under -X importtime, so nothing the
+    caller has already imported hides its cost.
+    Returns:
+        list: {'module', 'self_ms', 'cumulative_ms', 'depth'} per imported module, in import order.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                            cwd=cwd or os.getcwd(), env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed: {result.stderr.strip().splitlines()[-1:]}")
+    entries = []
+    for line in result.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            entries.append({
+                'module': match.group(4),
+                'self_ms': int(match.group(1)) / 1000,
+                'cumulative_ms': int(match.group(2)) / 1000,
+                'depth': (len(match.group(3)) - 1) // 2,
+            })
+    return entries
+
+
+def summarize(entries, module='app', top=20):
+    """
+    Returns:
+        dict: The module's total import time, the number of modules imported
+        and its direct imports by cumulative time (each includes its own imports).
+    """
+    # -X importtime prints a module after everything it imported, so the
+    # profiled module's direct imports are the depth 1 lines just above it
+    index = next((i for i, entry in enumerate(entries) if entry['module'] == module and entry['depth'] == 0), None)
+    if index is None:
+        return {'total_ms': 0.0, 'modules': len(entries), 'top': []}
+    start = index
+    while start > 0 and entries[start - 1]['depth'] > 0:
+        start -= 1
+    children = [entry for entry in entries[start:index] if entry['depth'] == 1]
+    return {
+        'total_ms': entries[index]['cumulative_ms'],
+        'modules': len(entries),
+        'top': sorted(children, key=lambda entry: entry['cumulative_ms'], reverse=True)[:top],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Profile the import time of a module in a fresh interpreter.')
+    parser.add_argument('module', nargs='?', default='app', help='Module to import (default: app)')
+    parser.add_argument('--top', type=int, default=20, help='Number of top-level imports to list')
+    parser.add_argument('--loaded', action='append', default=[],
+                        help='Also report whether this module ends up imported (repeatable)')
+    args = parser.parse_args(argv)
+    entries = profile_import(args.module)
+    summary = summarize(entries, args.module, args.top)
+    print(f"import {args.module}: {summary['total_ms']:.1f} ms, {summary['modules']} modules")
+    for entry in summary['top']:
+        print(f"  {entry['cumulative_ms']:9.1f} ms  {entry['module']}")
+    imported = {entry['module'] for entry in entries}
+    for module in args.loaded:
+        print(f"  {module}: {'imported' if module in imported else 'not imported'}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,251 @@
+# utils/job_queue.py
+
+# Standard library imports
+import os
+import json
+import time
+from functools import wraps
+
+# Third-party library imports
+from celery import Celery, chain
+from celery.signals import worker_init
+
+# Local imports
+from common import CustomLogger
+from config import Config
+from utils.utils_functions import (search_csv_for_name, search_xml_by_ein, search_pdf_by_ein, process_pdfs,
+                                   process_xml_filings, get_parsed_files, get_xml_results)
+from utils.sedb_index import search_entities
+from utils.staging import new_stage_stats
+from utils.parse_cache import cache_stats
+from utils.parse_engine import pool_pids
+from utils.resource_governor import memory_stats
+from utils import metrics
+from utils.workspaces import create_workspace, get_workspace, release_filings
+from utils.results_store import save_results
+
+logger = CustomLogger.get_logger(__name__, log_file=Config.UTILS_LOG_FILE)
+logger.propagate = False
+
+# Start a worker with: celery -A utils.job_queue worker --loglevel=info
+# For tests, JOB_QUEUE_EAGER=true with CELERY_BROKER_URL=memory:// runs every
+# stage in-process without Redis.
+celery_app = Celery('storyweapon', broker=Config.CELERY_BROKER_URL)
+celery_app.conf.update(
+    task_always_eager=Config.JOB_QUEUE_EAGER,
+    task_ignore_result=True,
+    task_serializer='json',
+    accept_content=['json'],
+    task_acks_late=True,
+    worker_prefetch_multiplier=1,
+)
+
+
+@worker_init.connect
+def _prewarm_worker(**kwargs):
+    # Runs in the main worker process before the prefork pool starts its children
+    if Config.PREWARM:
+        from utils.warmup import warmup
+        warmup()
+
+
+_STATUS_FILE = 'status.json'
+
+# Overall progress (percent) reported when each stage starts
+STAGE_PROGRESS = {
+    'lookup': 5,
+    'stage': 20,
+    'parse': 40,
+    'extract': 80,
+}
+
+
+def _status_path(workspace):
+    return os.path.join(workspace['root'], _STATUS_FILE)
+
+
+def read_status(workspace):
+    """
+    Returns the job status stored in the workspace, or None if there is none.
+    """
+    try:
+        with open(_status_path(workspace), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_status(workspace, status):
+    path = _status_path(workspace)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(status, f)
+    # Atomic swap so the status endpoints never read a half-written file
+    os.replace(tmp_path, path)
+
+
+def update_status(workspace, state=None, stage=None, progress=None, message=None, **result):
+    """
+    Records a job state change as a new event and merges result fields.
+    Each event gets the next sequence number, which the SSE stream uses as
+    its event id.
+    """
+    status = read_status(workspace) or {'job_id': workspace['job_id'], 'events': [], 'result': {}}
+    if state is not None:
+        status['state'] = state
+    if stage is not None:
+        status['stage'] = stage
+    if progress is not None:
+        status['progress'] = progress
+    if message is not None:
+        status['message'] = message
+    status['result'].update(result)
+    status['updated'] = time.time()
+    status['events'].append({
+        'id': len(status['events']) + 1,
+        'time': status['updated'],
+        'state': status.get('state'),
+        'stage': status.get('stage'),
+        'progress': status.get('progress'),
+        'message': status.get('message'),
+    })
+    _write_status(workspace, status)
+    return status
+
+
+def _stage_task(stage):
+    """
+    Wraps a pipeline stage as a Celery task taking and returning job_id.
+    The stage is skipped when an earlier one already ended the job, and any
+    unexpected error fails the job instead of the worker.
+    """
+    def decorator(func):
+        @celery_app.task(name=f"search.{stage}")
+        @wraps(func)
+        def task(job_id):
+            workspace = get_workspace(job_id)
+            if workspace is None:
+                logger.warning(f"Job {job_id} has no workspace; skipping {stage} stage")
+                return job_id
+            status = read_status(workspace) or {}
+            if status.get('state') in ('done', 'failed'):
+                return job_id
+            update_status(workspace, state='running', stage=stage, progress=STAGE_PROGRESS[stage],
+                          message=f"Running {stage} stage.")
+            start = time.perf_counter()
+            try:
+                func(workspace, status.get('result', {}))
+            except Exception as e:
+                logger.error(f"Job {job_id} failed in {stage} stage: {e}")
+                update_status(workspace, state='failed', message=f"An error occurred during the {stage} stage.")
+            elapsed = time.perf_counter() - start
+            metrics.observe('job_stage_seconds', elapsed, stage=stage)
+            logger.info(f"Job {job_id} {stage} stage took {elapsed:.2f}s")
+            return job_id
+        return task
+    return decorator
+
+
+@_stage_task('lookup')
+def lookup_stage(workspace, result):
+    entity_name = result['entity_name']
+    ein_list = search_csv_for_name(entity_name)
+    if not ein_list:
+        logger.warning(f"No EIN found for entity: {entity_name}")
+        update_status(workspace, state='failed', message='Entity not found.',
+                      suggestions=search_entities(entity_name, limit=Config.TYPEAHEAD_LIMIT))
+        return
+    update_status(workspace, message=f"Found {len(ein_list)} EINs.", ein_list=ein_list)
+
+
+@_stage_task('stage')
+def stage_stage(workspace, result):
+    matched_pdfs = []
+    xml_filings = []
+    stage_stats = new_stage_stats()
+    for ein in result['ein_list']:
+        # An e-file XML return replaces the PDF of the same tax period
+        ein_xml = search_xml_by_ein(ein)
+        xml_filings.extend(ein_xml)
+        xml_periods = [filing['tax_period'] for filing in ein_xml if filing['tax_period']]
+        matched_pdfs.extend(search_pdf_by_ein(ein, stage_stats, dest_dir=workspace['filings_dir'],
+                                              xml_periods=xml_periods))
+    logger.info(f"Staging metrics: {stage_stats}")
+    if not matched_pdfs and not xml_filings:
+        logger.warning(f"No PDFs found for EINs: {result['ein_list']}")
+        update_status(workspace, state='failed', message='No PDFs found.', staging=stage_stats)
+        return
+    update_status(workspace, message=f"Staged {len(matched_pdfs)} PDF filings and {len(xml_filings)} XML returns.",
+                  staging=stage_stats, xml_filings=xml_filings)
+
+
+@_stage_task('parse')
+def parse_stage(workspace, result):
+    xml_reports = process_xml_filings(result.get('xml_filings', []), workspace['parsed_dir'])
+    parse_reports = process_pdfs(workspace['filings_dir'], workspace['parsed_dir'])
+    release_filings(workspace)
+    parsed_files = get_parsed_files(workspace['parsed_dir'])
+    xml_results = get_xml_results(workspace['parsed_dir'])
+    if not parsed_files and not xml_results:
+        logger.warning("No parsed files created.")
+        update_status(workspace, state='failed', message='Parsing failed.', parse_reports=parse_reports,
+                      xml_reports=xml_reports)
+        return
+    if xml_results:
+        # XML returns are already structured: store them before any GPT extraction
+        save_results(xml_results, job_id=workspace['job_id'])
+    fields = {'parsed_files': parsed_files, 'parse_reports': parse_reports, 'xml_reports': xml_reports,
+              'parse_cache': cache_stats(), 'memory': memory_stats(pool_pids())}
+    if result.get('extract'):
+        update_status(workspace, message=f"Parsed {len(parsed_files) + len(xml_results)} filings.", **fields)
+    else:
+        update_status(workspace, state='done', progress=100,
+                      message='Search and parsing completed successfully.', **fields)
+
+
+@_stage_task('extract')
+def extract_stage(workspace, result):
+    # Imported here so search-only workers never load the OpenAI client
+    from blueprints.gpt_handler.gpt_handler import main as extract_main
+    extracted_data, filings = extract_main(workspace)
+    if not extracted_data:
+        update_status(workspace, state='failed', message='No data extracted.', filings=filings)
+        return
+    update_status(workspace, state='done', progress=100,
+                  message='Key information extracted successfully.', extracted_data=extracted_data, filings=filings,
+                  memory=memory_stats(pool_pids()))
+
+
+def create_job(entity_name, extract=False):
+    """
+    Creates the workspace of a search with its initial 'queued' status.
+    The stage tasks can then be queued (submit_search) or called in-process
+    in order (the batch runner).
+    Returns:
+        dict: The workspace.
+    """
+    workspace = create_workspace(entity_name)
+    update_status(workspace, state='queued', stage=None, progress=0, message='Search queued.',
+                  entity_name=entity_name, extract=bool(extract))
+    return workspace
+
+
+def submit_search(entity_name, extract=False):
+    """
+    Creates a workspace for the search and queues its stage tasks
+    (lookup -> stage -> parse, then extract if requested).
+    Returns:
+        str: The job ID to poll or stream progress for.
+    """
+    workspace = create_job(entity_name, extract)
+    stages = [lookup_stage.si(workspace['job_id']), stage_stage.s(), parse_stage.s()]
+    if extract:
+        stages.append(extract_stage.s())
+    try:
+        chain(*stages).apply_async()
+    except Exception as e:
+        logger.error(f"Could not queue job {workspace['job_id']}: {e}")
+        update_status(workspace, state='failed', message='Could not queue the search.')
+        raise
+    logger.info(f"Queued job {workspace['job_id']} for '{entity_name}'")
+    return workspace['job_id']
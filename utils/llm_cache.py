@@ -0,0 +1,197 @@
+# utils/llm_cache.py
+
+# Standard library imports
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+
+# Local imports
+from common import CustomLogger
+from config import Config
+from utils.parse_cache import file_hash
+from utils import metrics
+
+logger = CustomLogger.get_logger(__name__, log_file=Config.GPT_HANDLER_FILE)
+logger.propagate = False
+
+# Bytes held in LLM_CACHE_DIR, counted on first use and kept up to date on put
+_total_bytes = None
+_stats = {'hits': 0, 'misses': 0, 'expired': 0, 'stores': 0, 'evictions': 0}
+_lock = threading.Lock()
+
+# put() writes 'created' first, so eviction can read it from the head of an entry
+_CREATED_RE = re.compile(rb'\{"created": ([0-9.eE+-]+)[,}]')
+
+
+def response_key(text, config_paths, model=None):
+    """
+    Key for a GPT response: the SHA-256 of the filing text, the hashes of
+    the prompt config files (schema, prompts, output requirements) and the
+    model name. Editing any of them, or switching models, misses the cache.
+    """
+    digest = hashlib.sha256()
+    digest.update(hashlib.sha256(text.encode('utf-8')).digest())
+    for path in config_paths:
+        digest.update(file_hash(path).encode())
+    digest.update((model or Config.GPT_MODEL).encode())
+    return digest.hexdigest()
+
+
+def _entry_path(key):
+    # Two-level fan-out keeps directories small for large caches
+    return os.path.join(Config.LLM_CACHE_DIR, key[:2], key + '.json')
+
+
+def _created(path):
+    """
+    Returns an entry's creation time, reading only the head of the file when
+    it starts with 'created' as put() writes it. Raises OSError or ValueError
+    when the entry cannot be read.
+    """
+    with open(path, 'rb') as f:
+        match = _CREATED_RE.match(f.read(64))
+        if match:
+            return float(match.group(1))
+        f.seek(0)
+        return json.load(f)['created']
+
+
+def _entries():
+    """
+    Yields (path, size, mtime) for every cached response.
+    """
+    if not os.path.isdir(Config.LLM_CACHE_DIR):
+        return
+    for fan_out in os.scandir(Config.LLM_CACHE_DIR):
+        if not fan_out.is_dir():
+            continue
+        for entry in os.scandir(fan_out.path):
+            if entry.name.endswith('.json'):
+                st = entry.stat()
+                yield entry.path, st.st_size, st.st_mtime
+
+
+# Exported cache_requests_total result label of each lookup outcome
+_RESULTS = {'hits': 'hit', 'misses': 'miss'}
+
+
+def _count(stat):
+    with _lock:
+        _stats[stat] += 1
+    if stat in _RESULTS:
+        metrics.inc('cache_requests_total', cache='llm', result=_RESULTS[stat])
+
+
+def get(key):
+    """
+    Returns the cached response text for key, or None on a miss or when the
+    entry was created more than LLM_CACHE_TTL_SECONDS ago. A hit bumps the
+    entry's mtime, which only orders LRU eviction; it never extends the TTL.
+    """
+    path = _entry_path(key)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+    except FileNotFoundError:
+        _count('misses')
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Discarding unreadable LLM cache entry {path}: {e}")
+        _count('misses')
+        return None
+    if time.time() - entry['created'] > Config.LLM_CACHE_TTL_SECONDS:
+        _count('expired')
+        _count('misses')
+        _remove(path)
+        return None
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    _count('hits')
+    return entry['response']
+
+
+def put(key, response, model=None):
+    """
+    Stores a response under key, then evicts expired and least recently
+    used entries while the cache is over LLM_CACHE_MAX_BYTES.
+    """
+    global _total_bytes
+    path = _entry_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'created': time.time(), 'model': model or Config.GPT_MODEL, 'response': response}, f)
+    size = os.path.getsize(tmp_path)
+    try:
+        previous = os.path.getsize(path)
+    except OSError:
+        previous = 0
+    # Atomic swap so concurrent readers never see a half-written entry
+    os.replace(tmp_path, path)
+
+    with _lock:
+        _stats['stores'] += 1
+        if _total_bytes is None:
+            _total_bytes = sum(entry_size for _, entry_size, _ in _entries())
+        else:
+            _total_bytes += size - previous
+        if _total_bytes > Config.LLM_CACHE_MAX_BYTES:
+            _evict(keep=path)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Could not remove LLM cache entry {path}: {e}")
+        return False
+    return True
+
+
+def _expired(path, expire_before):
+    try:
+        return _created(path) < expire_before
+    except (OSError, ValueError, KeyError, TypeError):
+        # Unreadable entries would only ever miss; vanished ones are already gone
+        return True
+
+
+def _evict(keep=None):
+    """
+    Removes entries past their TTL (by creation time, as get() expires them),
+    then the least recently used ones (by mtime) until the cache fits its cap.
+    Rescans the directory, since other workers share it. Caller holds _lock.
+    """
+    global _total_bytes
+    entries = sorted(_entries(), key=lambda entry: entry[2])
+    _total_bytes = sum(size for _, size, _ in entries)
+    expire_before = time.time() - Config.LLM_CACHE_TTL_SECONDS
+    live = []
+    for path, size, mtime in entries:
+        if path != keep and _expired(path, expire_before) and _remove(path):
+            _total_bytes -= size
+            _stats['evictions'] += 1
+        else:
+            live.append((path, size, mtime))
+    for path, size, _ in live:
+        if _total_bytes <= Config.LLM_CACHE_MAX_BYTES:
+            break
+        if path == keep or not _remove(path):
+            continue
+        _total_bytes -= size
+        _stats['evictions'] += 1
+
+
+def cache_stats():
+    """
+    Returns this worker's hit/miss/expiry/store/eviction counters and the cache size.
+    """
+    with _lock:
+        return {**_stats, 'bytes': _total_bytes}
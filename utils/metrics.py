@@ -0,0 +1,236 @@
+# utils/metrics.py
+
+# Standard library imports
+import os
+import json
+import time
+import atexit
+import bisect
+import threading
+from contextlib import contextmanager
+
+# Local imports
+from config import Config
+
+PREFIX = 'storyweapon_'
+
+# Upper bounds (seconds) of the latency histogram buckets: from a cache hit to a long OCR or GPT call
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# Every exported metric: name (without PREFIX) -> (type, help)
+METRICS = {
+    'function_seconds': ('histogram', 'Duration of calls to functions decorated with log_function.'),
+    'job_stage_seconds': ('histogram', 'Duration of search job stages (lookup, stage, parse, extract).'),
+    'staging_seconds': ('histogram', 'Time to stage one filing into a job workspace, by method.'),
+    'staged_bytes_total': ('counter', 'Bytes of filings made available to job workspaces, by method.'),
+    'parse_seconds': ('histogram', 'PDF text extraction time: per document for direct, per page for OCR.'),
+    'ocr_pages_total': ('counter', 'Pages rasterized and OCR\'d.'),
+    'gpt_call_seconds': ('histogram', 'GPT call latency including retries, by outcome.'),
+    'gpt_tokens_total': ('counter', 'GPT tokens reported by the API, by kind (prompt, completion).'),
+    'cache_requests_total': ('counter', 'Parse and LLM cache lookups, by cache and result (hit, miss).'),
+}
+
+# Metrics of this process: {(name, ((label, value), ...)): value} for
+# counters and [bucket counts (+Inf last), sum, count] for histograms.
+# A flusher thread writes them to METRICS_DIR every METRICS_FLUSH_SECONDS
+# so /metrics can add up every worker process (web, Celery, batch runner).
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_dirty = False
+_flusher = None
+_snapshot_path = None
+
+
+def _key(name, labels):
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _changed():
+    # Called with _lock held
+    global _dirty, _flusher
+    _dirty = True
+    if _flusher is None:
+        _flusher = threading.Thread(target=_flush_loop, name='metrics-flusher', daemon=True)
+        _flusher.start()
+
+
+def inc(name, value=1, **labels):
+    """
+    Adds value to a counter.
+    """
+    if not Config.METRICS_ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+        _changed()
+
+
+def observe(name, seconds, **labels):
+    """
+    Records one latency sample in a histogram.
+    """
+    if not Config.METRICS_ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [[0] * (len(LATENCY_BUCKETS) + 1), 0.0, 0]
+        histogram[0][bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        histogram[1] += seconds
+        histogram[2] += 1
+        _changed()
+
+
+@contextmanager
+def timed(name, **labels):
+    """
+    Observes the duration of the with block in a histogram.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def _snapshot():
+    with _lock:
+        return {
+            'counters': [[name, list(labels), value] for (name, labels), value in _counters.items()],
+            'histograms': [[name, list(labels), buckets[:], total, count]
+                           for (name, labels), (buckets, total, count) in _histograms.items()],
+        }
+
+
+def flush():
+    """
+    Writes this process's metrics to its snapshot file in METRICS_DIR.
+    """
+    global _dirty, _snapshot_path
+    if _snapshot_path is None:
+        _snapshot_path = os.path.join(Config.METRICS_DIR, f"{os.getpid()}-{time.time_ns()}.json")
+    with _lock:
+        _dirty = False
+    snapshot = _snapshot()
+    try:
+        os.makedirs(Config.METRICS_DIR, exist_ok=True)
+        tmp_path = f"{_snapshot_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, _snapshot_path)
+    except OSError:
+        pass
+
+
+def _flush_loop():
+    while True:
+        time.sleep(Config.METRICS_FLUSH_SECONDS)
+        if _dirty:
+            flush()
+
+
+def _exit_flush():
+    if _dirty:
+        flush()
+
+
+def _after_fork():
+    # A forked worker starts from zero under its own snapshot file
+    global _lock, _counters, _histograms, _dirty, _flusher, _snapshot_path
+    _lock = threading.Lock()
+    _counters, _histograms = {}, {}
+    _dirty, _flusher, _snapshot_path = False, None, None
+    # multiprocessing children leave through os._exit, skipping atexit
+    from multiprocessing import util
+    util.Finalize(None, _exit_flush, exitpriority=0)
+
+
+atexit.register(_exit_flush)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def _merged():
+    """
+    This process's live metrics plus the snapshots of every other process
+    in METRICS_DIR; snapshots older than METRICS_RETENTION_SECONDS are removed.
+    """
+    snapshots = [_snapshot()]
+    now = time.time()
+    own = os.path.basename(_snapshot_path) if _snapshot_path else None
+    try:
+        entries = list(os.scandir(Config.METRICS_DIR))
+    except FileNotFoundError:
+        entries = []
+    for entry in entries:
+        if not entry.name.endswith('.json') or entry.name == own:
+            continue
+        try:
+            if now - entry.stat().st_mtime > Config.METRICS_RETENTION_SECONDS:
+                os.remove(entry.path)
+                continue
+            with open(entry.path, 'r', encoding='utf-8') as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+
+    counters, histograms = {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(tuple(label) for label in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, buckets, total, count in snapshot['histograms']:
+            key = (name, tuple(tuple(label) for label in labels))
+            merged = histograms.setdefault(key, [[0] * (len(LATENCY_BUCKETS) + 1), 0.0, 0])
+            if len(buckets) != len(merged[0]):
+                continue
+            merged[0] = [a + b for a, b in zip(merged[0], buckets)]
+            merged[1] += total
+            merged[2] += count
+    return counters, histograms
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """
+    Renders every metric, summed across worker processes, in the Prometheus
+    text exposition format.
+    """
+    counters, histograms = _merged()
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        full_name = PREFIX + name
+        lines.append(f"# HELP {full_name} {help_text}")
+        lines.append(f"# TYPE {full_name} {kind}")
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{full_name}{_labels(labels)} {_number(value)}")
+            continue
+        for (metric, labels), (buckets, total, count) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, bucket in zip(LATENCY_BUCKETS + ('+Inf',), buckets):
+                cumulative += bucket
+                lines.append(f"{full_name}_bucket{_labels(labels, [('le', str(bound))])} {cumulative}")
+            lines.append(f"{full_name}_sum{_labels(labels)} {_number(total)}")
+            lines.append(f"{full_name}_count{_labels(labels)} {count}")
+    return '\n'.join(lines) + '\n'
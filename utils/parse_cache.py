@@ -0,0 +1,210 @@
+# utils/parse_cache.py
+
+# Standard library imports
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Local imports
+from common import CustomLogger
+from config import Config
+from utils.parse_engine import PARSER_VERSION
+from utils import metrics
+
+logger = CustomLogger.get_logger(__name__, log_file=Config.UTILS_LOG_FILE)
+logger.propagate = False
+
+_HASH_CHUNK = 1024 * 1024
+_MAX_HASHES = 4096
+
+# Content hashes for this worker, most recently used last, keyed by file
+# identity rather than path: every job stages into a new workspace, but its
+# hardlinks and symlinks resolve to the same inode.
+# {(st_dev, st_ino, mtime_ns, size): sha256}
+_hashes = OrderedDict()
+# Bytes held in PARSE_CACHE_DIR, counted on first use and kept up to date on put
+_total_bytes = None
+_stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+# Keys being parsed right now in this worker: {key: threading.Event}
+_inflight = {}
+_lock = threading.Lock()
+
+
+def file_hash(pdf_path):
+    """
+    Returns the SHA-256 of the PDF's bytes. Re-hashes only when this worker
+    has not yet hashed the same file (device, inode, mtime and size), under
+    any staged path.
+    """
+    st = os.stat(pdf_path)
+    signature = (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+    with _lock:
+        cached = _hashes.get(signature)
+        if cached is not None:
+            _hashes.move_to_end(signature)
+            return cached
+    digest = hashlib.sha256()
+    with open(pdf_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b''):
+            digest.update(chunk)
+    with _lock:
+        _hashes[signature] = digest.hexdigest()
+        while len(_hashes) > _MAX_HASHES:
+            _hashes.popitem(last=False)
+    return digest.hexdigest()
+
+
+def cache_key(pdf_path):
+    """
+    Content-addressed key for a PDF: its hash plus everything that changes the
+    cached text (PARSER_VERSION, OCR_DPI, MIN_TEXT_LAYER_CHARS and, since
+    entries hold cleaned text, the REPEATED_LINE_* cleaning settings).
+    """
+    extractor = (f"{PARSER_VERSION}:{Config.OCR_DPI}:{Config.MIN_TEXT_LAYER_CHARS}:"
+                 f"{Config.REPEATED_LINE_WINDOW}:{Config.REPEATED_LINE_MIN_PAGES}:"
+                 f"{Config.REPEATED_LINE_RATIO}:{Config.REPEATED_LINE_MAX_CHARS}")
+    return f"{file_hash(pdf_path)}-{hashlib.sha256(extractor.encode()).hexdigest()[:12]}"
+
+
+def _entry_path(key):
+    # Two-level fan-out keeps directories small for large caches
+    return os.path.join(Config.PARSE_CACHE_DIR, key[:2], key + '.txt')
+
+
+def _entries():
+    """
+    Yields (path, size, mtime_ns) for every cached text file.
+    """
+    if not os.path.isdir(Config.PARSE_CACHE_DIR):
+        return
+    for fan_out in os.scandir(Config.PARSE_CACHE_DIR):
+        if not fan_out.is_dir():
+            continue
+        for entry in os.scandir(fan_out.path):
+            if entry.name.endswith('.txt'):
+                st = entry.stat()
+                yield entry.path, st.st_size, st.st_mtime_ns
+
+
+def get(key):
+    """
+    Returns the cached cleaned text for key, or None on a miss. A hit bumps
+    the entry's mtime, which is what LRU eviction orders by.
+    """
+    path = _entry_path(key)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        os.utime(path)
+    except FileNotFoundError:
+        with _lock:
+            _stats['misses'] += 1
+        metrics.inc('cache_requests_total', cache='parse', result='miss')
+        return None
+    except OSError as e:
+        logger.warning(f"Discarding unreadable parse cache entry {path}: {e}")
+        with _lock:
+            _stats['misses'] += 1
+        metrics.inc('cache_requests_total', cache='parse', result='miss')
+        return None
+    with _lock:
+        _stats['hits'] += 1
+    metrics.inc('cache_requests_total', cache='parse', result='hit')
+    return text
+
+
+def put(key, text):
+    """
+    Stores cleaned text under key, then evicts least recently used entries
+    while the cache is over PARSE_CACHE_MAX_BYTES.
+    """
+    global _total_bytes
+    path = _entry_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    size = os.path.getsize(tmp_path)
+    try:
+        previous = os.path.getsize(path)
+    except OSError:
+        previous = 0
+    # Atomic swap so concurrent readers never see a half-written entry
+    os.replace(tmp_path, path)
+
+    with _lock:
+        _stats['stores'] += 1
+        if _total_bytes is None:
+            _total_bytes = sum(entry_size for _, entry_size, _ in _entries())
+        else:
+            _total_bytes += size - previous
+        if _total_bytes > Config.PARSE_CACHE_MAX_BYTES:
+            _evict(keep=path)
+
+
+def _evict(keep=None):
+    """
+    Removes the least recently used entries until the cache fits its cap.
+    Rescans the directory, since other workers share it. Caller holds _lock.
+    """
+    global _total_bytes
+    entries = sorted(_entries(), key=lambda entry: entry[2])
+    _total_bytes = sum(size for _, size, _ in entries)
+    for path, size, _ in entries:
+        if _total_bytes <= Config.PARSE_CACHE_MAX_BYTES:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not evict parse cache entry {path}: {e}")
+            continue
+        _total_bytes -= size
+        _stats['evictions'] += 1
+
+
+def claim(key):
+    """
+    Marks key as being parsed by the caller. Returns False when another
+    thread in this worker already holds it, in which case the caller should
+    wait_for(key) instead of parsing the same filing again.
+    """
+    with _lock:
+        if key in _inflight:
+            return False
+        _inflight[key] = threading.Event()
+        return True
+
+
+def release(key):
+    """
+    Releases a claim, waking any thread waiting for key. Safe to call twice.
+    """
+    with _lock:
+        event = _inflight.pop(key, None)
+    if event is not None:
+        event.set()
+
+
+def wait_for(key, timeout=None):
+    """
+    Waits for a concurrent parse of key to finish, then returns the cached
+    text, or None if that parse did not produce a cache entry in time.
+    """
+    with _lock:
+        event = _inflight.get(key)
+    if event is not None and not event.wait(timeout):
+        return None
+    return get(key)
+
+
+def cache_stats():
+    """
+    Returns this worker's hit/miss/store/eviction counters and the cache size.
+    """
+    with _lock:
+        return {**_stats, 'bytes': _total_bytes}
@@ -0,0 +1,371 @@
+# utils/parse_engine.py
+
+# Standard library imports
+import os
+import re
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+# pdf2image, pytesseract and PyPDF2 are imported by the worker jobs that use
+# them, so importing this module (web workers, the job queue) stays cheap.
+
+# Local imports
+from common import CustomLogger
+from config import Config
+from utils import metrics
+
+logger = CustomLogger.get_logger(__name__, log_file=Config.UTILS_LOG_FILE)
+logger.propagate = False
+
+# Bump whenever extraction or text cleaning changes its output, so parse cache
+# entries written by the old extractor stop matching.
+PARSER_VERSION = 5
+
+# Shared worker pool, created on first use and recreated if a worker dies
+_pool = None
+_pool_generation = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """
+    Returns:
+        tuple: (pool, generation), the generation numbering the pools started
+        so far, so a job can tell whether the pool it ran on was replaced.
+    """
+    global _pool, _pool_generation
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=Config.PARSE_WORKERS)
+            _pool_generation += 1
+            logger.info(f"Started PDF parse pool with {Config.PARSE_WORKERS} workers")
+        return _pool, _pool_generation
+
+
+def _reset_pool(generation=None):
+    """
+    Shuts the pool down so the next _get_pool() starts a fresh one. Given the
+    generation of the broken pool a job ran on, only resets if that is still
+    the current pool: every job of a dead pool fails at once, and the pool
+    another caller (or batch thread) already replaced it with must not be
+    cancelled again.
+    """
+    global _pool
+    with _pool_lock:
+        if generation is not None and generation != _pool_generation:
+            return
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def shutdown_pool():
+    """
+    Stops the parse worker pool, e.g. at process exit.
+    """
+    _reset_pool()
+
+
+def pool_available():
+    """
+    Whether this process may start parse workers. Daemonic processes, such as
+    the children of Celery's prefork pool, are not allowed to have children.
+    """
+    return not multiprocessing.current_process().daemon
+
+
+def pool_pids():
+    """
+    Process IDs of the running parse pool workers, for memory reporting.
+    """
+    with _pool_lock:
+        processes = getattr(_pool, '_processes', None) or {}
+        return list(processes)
+
+
+def ocr_dpi(pdf_path, reader=None, page_number=1):
+    """
+    OCR_DPI, lowered for a page so large that its raster would exceed
+    OCR_MAX_PAGE_PIXELS (oversized scans would otherwise take the worker's
+    memory with them).
+    """
+    import PyPDF2
+    try:
+        reader = reader or PyPDF2.PdfReader(pdf_path)
+        box = reader.pages[page_number - 1].mediabox
+        square_inches = float(box.width) * float(box.height) / (72 * 72)
+    except Exception:
+        return Config.OCR_DPI
+    if square_inches <= 0:
+        return Config.OCR_DPI
+    dpi = min(Config.OCR_DPI, int((Config.OCR_MAX_PAGE_PIXELS / square_inches) ** 0.5))
+    return max(dpi, 1)
+
+
+def join_pages(pages):
+    """
+    Joins (page_number, text) pairs into the '[Page N]' layout used by the parsed
+    text files, skipping pages without text.
+    """
+    return "\n".join(f"\n[Page {number}]\n{text}" for number, text in pages if text)
+
+
+def extract_pages_direct(pdf_path):
+    """
+    Worker job: reads the text layer of every page with PyPDF2.
+    Returns:
+        dict: pdf_path, page_count, pages [(page_number, text)], seconds and
+        error (None on success).
+    """
+    import PyPDF2
+    from pdf2image import pdfinfo_from_path
+    start = time.perf_counter()
+    result = {'pdf_path': pdf_path, 'page_count': None, 'pages': [], 'error': None}
+    try:
+        reader = PyPDF2.PdfReader(pdf_path)
+        result['page_count'] = len(reader.pages)
+        for page_number, page in enumerate(reader.pages, start=1):
+            try:
+                text = page.extract_text() or ''
+            except Exception as e:
+                logger.warning(f"Direct extraction failed on page {page_number} of {os.path.basename(pdf_path)}: {e}")
+                text = ''
+            result['pages'].append((page_number, text))
+    except Exception as e:
+        result['error'] = f"direct extraction: {e}"
+    if result['page_count'] is None:
+        # PyPDF2 could not open it; poppler may still be able to rasterize it
+        try:
+            result['page_count'] = int(pdfinfo_from_path(pdf_path)['Pages'])
+        except Exception as e:
+            logger.warning(f"Could not count pages of {os.path.basename(pdf_path)}: {e}")
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def page_count(pdf_path):
+    """
+    Number of pages in the PDF, read from its page tree without extracting
+    any text; falls back to poppler's pdfinfo when PyPDF2 cannot open it.
+    Returns:
+        int: Page count, or None if neither can read the file.
+    """
+    import PyPDF2
+    from pdf2image import pdfinfo_from_path
+    try:
+        return len(PyPDF2.PdfReader(pdf_path).pages)
+    except Exception:
+        pass
+    try:
+        return int(pdfinfo_from_path(pdf_path)['Pages'])
+    except Exception as e:
+        logger.warning(f"Could not count pages of {os.path.basename(pdf_path)}: {e}")
+        return None
+
+
+def ocr_page_window(pdf_path, first_page, last_page):
+    """
+    Worker job: OCRs pages first_page..last_page (inclusive), rasterizing one
+    page at a time so peak memory is a single page image whatever the window,
+    and oversized pages at a DPI capped by OCR_MAX_PAGE_PIXELS.
+    Returns:
+        dict: pdf_path, pages [(page_number, text)], page_seconds (one per
+        OCR'd page), seconds and error.
+    """
+    import PyPDF2
+    import pytesseract
+    from pdf2image import convert_from_path
+    start = time.perf_counter()
+    result = {'pdf_path': pdf_path, 'pages': [], 'page_seconds': [], 'error': None}
+    errors = []
+    try:
+        reader = PyPDF2.PdfReader(pdf_path)
+    except Exception:
+        reader = None
+    for page_number in range(first_page, last_page + 1):
+        page_start = time.perf_counter()
+        try:
+            dpi = ocr_dpi(pdf_path, reader, page_number) if reader else Config.OCR_DPI
+            if dpi < Config.OCR_DPI:
+                logger.warning(f"Page {page_number} of {os.path.basename(pdf_path)} is oversized; OCR at {dpi} DPI")
+            images = convert_from_path(pdf_path, dpi=dpi, first_page=page_number, last_page=page_number)
+            for image in images:
+                result['pages'].append((page_number, pytesseract.image_to_string(image)))
+                image.close()
+            del images
+            result['page_seconds'].append(time.perf_counter() - page_start)
+        except Exception as e:
+            errors.append(f"OCR page {page_number}: {e}")
+    result['error'] = '; '.join(errors) or None
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def has_text_layer(text):
+    """
+    True when a page's extracted text is long enough to trust over OCR.
+    """
+    return bool(text) and len(re.sub(r'\s', '', text)) >= Config.MIN_TEXT_LAYER_CHARS
+
+
+def page_windows(page_numbers):
+    """
+    Groups page numbers into contiguous (first_page, last_page) runs of at
+    most OCR_PAGE_WINDOW pages, one OCR job each.
+    """
+    window = max(1, Config.OCR_PAGE_WINDOW)
+    windows = []
+    for page_number in sorted(page_numbers):
+        if windows and page_number == windows[-1][1] + 1 and page_number - windows[-1][0] < window:
+            windows[-1] = (windows[-1][0], page_number)
+        else:
+            windows.append((page_number, page_number))
+    return windows
+
+
+class _Document:
+    """
+    Tracks one PDF through direct extraction and any OCR windows.
+    """
+
+    def __init__(self, pdf_path):
+        self.pdf_path = pdf_path
+        self.started = time.perf_counter()
+        self.pages = {}
+        self.pending = 0
+        self.errors = []
+        self.ocr_pages = set()
+        self.report = {
+            'pdf': os.path.basename(pdf_path),
+            'method': 'direct',
+            'pages': 0,
+            'ocr_pages': 0,
+            'direct_seconds': 0.0,
+            'ocr_seconds': 0.0,
+        }
+
+    def finish(self):
+        self.report['seconds'] = round(time.perf_counter() - self.started, 3)
+        self.report['direct_seconds'] = round(self.report['direct_seconds'], 3)
+        self.report['ocr_seconds'] = round(self.report['ocr_seconds'], 3)
+        self.report['pages'] = sum(1 for text in self.pages.values() if text)
+        self.report['ocr_pages'] = len(self.ocr_pages)
+        self.report['error'] = '; '.join(self.errors) or None
+        return [(number, self.pages[number]) for number in sorted(self.pages)]
+
+
+class _InlineResult:
+    """
+    Result of a job run in this process, exposed like a pool future.
+    """
+
+    def __init__(self, value):
+        self._value = value
+
+    def result(self):
+        return self._value
+
+
+def parse_documents(pdf_paths):
+    """
+    Extracts the text of every PDF, fanning documents and OCR page windows
+    across the process pool when Config.PARALLEL_PROCESSING is on.
+    Pages with a usable text layer keep their direct text; only the rest are
+    rasterized and OCR'd, so mixed filings come out whole.
+    Documents are yielded as soon as all of their pages are in, so one slow or
+    broken filing never holds up or fails the others.
+    Yields:
+        tuple: (pdf_path, pages, report) where pages are (page_number, text)
+        pairs in page order and report holds per-document timings, the
+        extraction method (direct, hybrid or ocr), OCR'd page count and any
+        error.
+    """
+    parallel = Config.PARALLEL_PROCESSING and Config.PARSE_WORKERS > 1 and len(pdf_paths) > 0
+    if parallel and not pool_available():
+        logger.info("Parsing inline: this is a daemonic worker process, which cannot start a parse pool")
+        parallel = False
+    documents = {pdf_path: _Document(pdf_path) for pdf_path in pdf_paths}
+    futures = {}
+
+    def submit(fn, pdf_path, *args, attempt=1):
+        nonlocal parallel
+        generation = None
+        future = None
+        if parallel:
+            pool, generation = _get_pool()
+            try:
+                try:
+                    future = pool.submit(fn, pdf_path, *args)
+                except BrokenProcessPool:
+                    _reset_pool(generation)
+                    pool, generation = _get_pool()
+                    future = pool.submit(fn, pdf_path, *args)
+            except Exception as e:
+                # The pool could not start its workers at all; parse the rest here
+                logger.warning(f"Could not start the parse pool ({e!r}); parsing inline")
+                _reset_pool(generation)
+                parallel, generation = False, None
+        if future is None:
+            future = _InlineResult(fn(pdf_path, *args))
+        futures[future] = (pdf_path, fn, args, attempt, generation)
+        documents[pdf_path].pending += 1
+
+    def handle(future, pdf_path, fn, args, attempt, generation):
+        document = documents[pdf_path]
+        document.pending -= 1
+        try:
+            result = future.result()
+        except BrokenProcessPool as e:
+            # A worker died (e.g. killed while rasterizing) and took the pool's
+            # in-flight jobs with it; give each affected job one more try
+            _reset_pool(generation)
+            if attempt < 2:
+                submit(fn, pdf_path, *args, attempt=attempt + 1)
+                return False
+            result = {'pages': [], 'error': f"worker failure: {e}", 'seconds': 0.0}
+        except Exception as e:
+            result = {'pages': [], 'error': f"worker failure: {e}", 'seconds': 0.0}
+
+        if result.get('error'):
+            document.errors.append(result['error'])
+        if fn is extract_pages_direct:
+            metrics.observe('parse_seconds', result['seconds'], method='direct')
+            document.report['direct_seconds'] += result['seconds']
+            document.pages.update(result['pages'])
+            # Route only the pages without a usable text layer to OCR
+            page_count = result.get('page_count') or len(result['pages'])
+            document.ocr_pages = {number for number in range(1, page_count + 1)
+                                  if not has_text_layer(document.pages.get(number))}
+            if document.ocr_pages:
+                document.report['method'] = 'ocr' if len(document.ocr_pages) == page_count else 'hybrid'
+                logger.info(f"{len(document.ocr_pages)} of {page_count} pages of {document.report['pdf']} lack a text layer. Attempting OCR.")
+                for first_page, last_page in page_windows(document.ocr_pages):
+                    submit(ocr_page_window, pdf_path, first_page, last_page)
+        else:
+            for seconds in result.get('page_seconds', ()):
+                metrics.observe('parse_seconds', seconds, method='ocr')
+            metrics.inc('ocr_pages_total', len(result.get('page_seconds', ())))
+            document.report['ocr_seconds'] += result['seconds']
+            for number, text in result['pages']:
+                # Keep a short text layer over an empty OCR result
+                if text.strip() or not document.pages.get(number):
+                    document.pages[number] = text
+        return document.pending == 0
+
+    for pdf_path in pdf_paths:
+        submit(extract_pages_direct, pdf_path)
+
+    while futures:
+        # Inline results are ready at once; pool futures are waited on
+        done = [future for future in futures if isinstance(future, _InlineResult)]
+        if not done:
+            done, _ = wait(list(futures), return_when=FIRST_COMPLETED)
+        for future in done:
+            pdf_path, fn, args, attempt, generation = futures.pop(future)
+            if handle(future, pdf_path, fn, args, attempt, generation):
+                document = documents[pdf_path]
+                pages = document.finish()
+                yield pdf_path, pages, document.report
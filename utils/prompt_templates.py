@@ -0,0 +1,123 @@
+# utils/prompt_templates.py
+
+# Standard library imports
+import os
+import json
+import hashlib
+import threading
+
+# Third-party library imports
+import yaml
+
+# Local imports
+from common import CustomLogger
+from config import Config
+from utils.chunking import estimate_tokens
+
+logger = CustomLogger.get_logger(__name__, log_file=Config.GPT_HANDLER_FILE)
+logger.propagate = False
+
+# Compiled template for this worker:
+# {'signature': ((path, mtime_ns, size), ...), 'prefix': str, 'prefix_tokens': int,
+#  'prefix_hash': str, 'schema': dict}
+_template = None
+_lock = threading.Lock()
+
+
+def _config_paths():
+    return (Config.SCHEMA_PATH, Config.PROMPTS_PATH, Config.OUTPUT_REQUIREMENTS_SCHEMA)
+
+
+def _signature():
+    signature = []
+    for path in _config_paths():
+        st = os.stat(path)
+        signature.append((path, st.st_mtime_ns, st.st_size))
+    return tuple(signature)
+
+
+def _load_yaml(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f) or {}
+
+
+def _compile(signature):
+    """
+    Loads the three YAML files and renders the static prompt prefix: system
+    prompt, instructions, extraction prompt, schema JSON and output
+    requirements, in that order.
+    """
+    schema = _load_yaml(Config.SCHEMA_PATH)
+    prompts = _load_yaml(Config.PROMPTS_PATH)
+    output_requirements = _load_yaml(Config.OUTPUT_REQUIREMENTS_SCHEMA)
+    if not schema or not prompts or not output_requirements:
+        raise ValueError("Schema, prompts, or output requirements are empty.")
+
+    schema_json = json.dumps(schema.get('schema', {}), indent=2)
+    prefix = (
+        f"{prompts.get('system_prompt', '')}\n\n"
+        f"{output_requirements.get('instructions', '')}\n\n"
+        f"{prompts.get('batch_extraction_prompt', '')}\n\n"
+        f"JSON Schema:\n```json\n{schema_json}\n```\n\n"
+        f"Output Requirements:\n{output_requirements.get('output_requirements', '')}\n\n"
+    )
+    return {
+        'signature': signature,
+        'prefix': prefix,
+        'prefix_tokens': estimate_tokens(prefix),
+        'prefix_hash': hashlib.sha256(prefix.encode('utf-8')).hexdigest(),
+        'schema': schema.get('schema', {}),
+    }
+
+
+def get_template():
+    """
+    Returns the compiled prompt template, recompiling it only when the
+    schema, prompts or output requirements file changed on disk. If a
+    changed file fails to load, the previous template stays in use.
+    Returns:
+        dict: prefix, prefix_tokens, prefix_hash and schema, or None if no
+        template could ever be compiled.
+    """
+    global _template
+    try:
+        signature = _signature()
+    except OSError as e:
+        logger.error(f"Error reading prompt config files: {e}")
+        return _template
+    if _template is not None and _template['signature'] == signature:
+        return _template
+    with _lock:
+        if _template is None or _template['signature'] != signature:
+            try:
+                _template = _compile(signature)
+                logger.info(f"Compiled prompt prefix: {_template['prefix_tokens']} tokens "
+                            f"(sha256 {_template['prefix_hash'][:12]})")
+            except Exception as e:
+                logger.error(f"Error compiling prompt template: {e}")
+        return _template
+
+
+def build_prompt(text, schema_keys=None, template=None, fields=None):
+    """
+    Builds the prompt for one filing or chunk: the static prefix first, so
+    providers can reuse its cached prefix across calls, then the schema
+    sections to fill (when only some are wanted), the only fields needed
+    within them (dotted paths, when some were already read locally) and the
+    filing text.
+    """
+    template = template or get_template()
+    if template is None:
+        raise ValueError("No prompt template is available.")
+    sections = ''
+    if schema_keys is not None and set(schema_keys) != set(template['schema']):
+        sections = f"Extract only these top-level schema sections: {', '.join(schema_keys)}.\n\n"
+    if fields:
+        sections += (f"Within {', '.join(sorted({path.split('.')[0] for path in fields}))}, only these fields "
+                     f"are needed: {', '.join(fields)}. Leave the other fields of those sections empty.\n\n")
+    return (
+        f"{template['prefix']}"
+        f"{sections}"
+        f"IRS Form 990 Text:\n```text\n{text}\n```\n\n"
+        f"Please output only the JSON data as per the schema without any additional text or markdown."
+    )
@@ -0,0 +1,189 @@
+# utils/resource_governor.py
+
+# Standard library imports
+import os
+import re
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# Local imports
+from common import CustomLogger
+from config import Config
+
+logger = CustomLogger.get_logger(__name__, log_file=Config.UTILS_LOG_FILE)
+logger.propagate = False
+
+_SIZE_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([KMGT]?I?B?)\s*$', re.IGNORECASE)
+_SIZE_UNITS = {'': 1, 'B': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+# Text extracted from a PDF plus its joined and cleaned copies, per byte of
+# PDF (compressed text streams expand), while the parse stage holds them
+PARSE_BYTES_PER_PDF_BYTE = 4
+# Parsed text plus its chunk, prompt and cache-key copies during extraction
+EXTRACT_BYTES_PER_TEXT_BYTE = 4
+# Fixed overhead per filing: schema prefix, responses and merged JSON
+EXTRACT_BYTES_PER_FILING = 1024 ** 2
+
+# Reservations of the parse and extract jobs running in this worker process.
+# Jobs are admitted in arrival order, each once its estimated cost fits under
+# MEMORY_LIMIT next to the running ones; a job costlier than the whole budget
+# runs alone.
+_condition = threading.Condition()
+_reserved = 0
+_waiting = deque()
+_stages = {}
+
+
+def parse_size(value):
+    """
+    Parses a size such as '8GB', '512 MiB', '2000000' or 1.5e9 into bytes.
+    """
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = _SIZE_RE.match(str(value))
+    if not match:
+        raise ValueError(f"Invalid size: {value!r}")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2)[:1].upper()])
+
+
+def memory_limit():
+    return parse_size(Config.MEMORY_LIMIT)
+
+
+def rss_bytes(pid='self'):
+    """
+    Current resident memory of a process from /proc, or None where that is
+    unavailable (non-Linux hosts, exited processes).
+    """
+    try:
+        with open(f"/proc/{pid}/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def page_raster_bytes():
+    """
+    Memory of one US Letter page rasterized for OCR at OCR_DPI (RGB).
+    """
+    return int(8.5 * Config.OCR_DPI) * int(11 * Config.OCR_DPI) * 3
+
+
+def parse_cost(pdf_paths):
+    """
+    Estimated memory the parse stage holds in this process for pdf_paths;
+    without the parse pool, pages are also rasterized in this process.
+    """
+    cost = 0
+    for pdf_path in pdf_paths:
+        try:
+            cost += os.path.getsize(pdf_path) * PARSE_BYTES_PER_PDF_BYTE
+        except OSError:
+            continue
+    if not (Config.PARALLEL_PROCESSING and Config.PARSE_WORKERS > 1):
+        cost += page_raster_bytes()
+    return cost
+
+
+def spilled_text_cost():
+    """
+    Estimated memory of extracting one text over ENTITY_SIZE_LIMIT from disk:
+    the head read for the rules and one group of chunks in flight.
+    """
+    chunk_bytes = Config.CHUNK_MAX_TOKENS * 4 * EXTRACT_BYTES_PER_TEXT_BYTE
+    return Config.ENTITY_SIZE_LIMIT + Config.GPT_MAX_CONCURRENCY * chunk_bytes
+
+
+def extract_cost(text_files):
+    """
+    Estimated memory of extracting text_files in one pass; texts over
+    ENTITY_SIZE_LIMIT are streamed from disk and cost a bounded amount.
+    """
+    cost = 0
+    for text_file in text_files:
+        try:
+            size = os.path.getsize(text_file)
+        except OSError:
+            continue
+        if size > Config.ENTITY_SIZE_LIMIT:
+            cost += spilled_text_cost()
+        else:
+            cost += size * EXTRACT_BYTES_PER_TEXT_BYTE
+        cost += EXTRACT_BYTES_PER_FILING
+    return cost
+
+
+def _stage(stage):
+    return _stages.setdefault(stage, {'active': 0, 'queued': 0, 'reserved': 0, 'admitted': 0,
+                                      'wait_seconds': 0.0, 'rss': None, 'peak_rss': None})
+
+
+@contextmanager
+def admit(stage, cost):
+    """
+    Holds a reservation of cost bytes for a parse or extract job while the
+    block runs, first waiting until it fits under MEMORY_LIMIT next to the
+    jobs already admitted in this process.
+    """
+    global _reserved
+    limit = memory_limit()
+    cost = max(0, min(int(cost), limit))
+    start = time.perf_counter()
+    ticket = object()
+    with _condition:
+        stats = _stage(stage)
+        stats['queued'] += 1
+        _waiting.append(ticket)
+        if _waiting[0] is not ticket or (_reserved and _reserved + cost > limit):
+            logger.info(f"Queuing {stage} job of {cost / 1024 ** 2:.1f}MB: "
+                        f"{_reserved / 1024 ** 2:.1f}MB of {limit / 1024 ** 2:.1f}MB reserved")
+        while _waiting[0] is not ticket or (_reserved and _reserved + cost > limit):
+            _condition.wait()
+        _waiting.popleft()
+        # The next job in line may fit next to this one
+        _condition.notify_all()
+        stats['queued'] -= 1
+        stats['active'] += 1
+        stats['admitted'] += 1
+        stats['reserved'] += cost
+        stats['wait_seconds'] += time.perf_counter() - start
+        _reserved += cost
+    try:
+        yield
+    finally:
+        rss = rss_bytes()
+        with _condition:
+            stats['active'] -= 1
+            stats['reserved'] -= cost
+            _reserved -= cost
+            # Resident memory of the process as this stage's job finished
+            stats['rss'] = rss
+            if rss is not None:
+                stats['peak_rss'] = max(stats['peak_rss'] or 0, rss)
+            _condition.notify_all()
+        if rss is not None and rss > limit:
+            logger.warning(f"Resident memory {rss / 1024 ** 2:.1f}MB exceeds MEMORY_LIMIT {Config.MEMORY_LIMIT} "
+                           f"after a {stage} job")
+
+
+def memory_stats(child_pids=()):
+    """
+    Memory budget and use of this worker process: the limit, bytes reserved
+    by running jobs, resident memory (with child_pids, e.g. the parse pool,
+    summed separately) and per-stage active, queued and reserved jobs with
+    the resident memory seen as their last and largest jobs finished.
+    """
+    children = [rss_bytes(pid) for pid in child_pids]
+    with _condition:
+        stages = {stage: {**stats, 'wait_seconds': round(stats['wait_seconds'], 3)}
+                  for stage, stats in _stages.items()}
+        reserved = _reserved
+    return {
+        'limit': memory_limit(),
+        'reserved': reserved,
+        'rss': rss_bytes(),
+        'children_rss': sum(rss for rss in children if rss) if child_pids else None,
+        'stages': stages,
+    }
@@ -0,0 +1,289 @@
+# utils/results_store.py
+
+# Standard library imports
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+# Local imports
+from common import CustomLogger
+from config import Config
+from utils.sedb_index import normalize_name
+from utils.filing_index import parse_tax_period
+
+logger = CustomLogger.get_logger(__name__, log_file=Config.UTILS_LOG_FILE)
+logger.propagate = False
+
+# Current extraction per (EIN, tax year) in filings, every distinct earlier
+# version in filing_history, and the filings each search job produced in
+# job_filings. Query columns are denormalized out of the JSON so lookups by
+# EIN, name prefix, revenue range and year are index scans, and unfiltered
+# newest-first listings read filings_updated in order instead of sorting the
+# table. store_meta holds a generation counter bumped by every write, for
+# readers' caches.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS filings (
+    id INTEGER PRIMARY KEY,
+    ein TEXT NOT NULL,
+    tax_year TEXT NOT NULL,
+    name TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    total_revenue INTEGER,
+    total_expenses INTEGER,
+    net_assets_end INTEGER,
+    source TEXT NOT NULL,
+    file TEXT,
+    data TEXT NOT NULL,
+    data_hash TEXT NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    UNIQUE (ein, tax_year)
+);
+CREATE INDEX IF NOT EXISTS filings_name_key ON filings (name_key);
+CREATE INDEX IF NOT EXISTS filings_revenue ON filings (total_revenue);
+CREATE INDEX IF NOT EXISTS filings_year_revenue ON filings (tax_year, total_revenue);
+CREATE INDEX IF NOT EXISTS filings_hash ON filings (data_hash);
+CREATE INDEX IF NOT EXISTS filings_updated ON filings (updated DESC, id DESC);
+CREATE TABLE IF NOT EXISTS filing_history (
+    id INTEGER PRIMARY KEY,
+    filing_id INTEGER NOT NULL REFERENCES filings (id),
+    source TEXT NOT NULL,
+    file TEXT,
+    job_id TEXT,
+    data TEXT NOT NULL,
+    data_hash TEXT NOT NULL,
+    recorded REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS filing_history_filing ON filing_history (filing_id, recorded);
+CREATE TABLE IF NOT EXISTS job_filings (
+    job_id TEXT NOT NULL,
+    filing_id INTEGER NOT NULL REFERENCES filings (id),
+    PRIMARY KEY (job_id, filing_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+) WITHOUT ROWID;
+INSERT OR IGNORE INTO store_meta (key, value) VALUES ('generation', 0);
+"""
+
+_EIN_RE = re.compile(r'^(\d{9})')
+_YEAR_RE = re.compile(r'((?:19|20)\d{2})')
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+
+def _connect():
+    """
+    Returns this thread's connection to RESULTS_DB_PATH, creating the schema
+    on first use. WAL lets dashboard reads run while a job writes.
+    """
+    path = Config.RESULTS_DB_PATH
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.path == path:
+        return conn
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=Config.RESULTS_DB_TIMEOUT_SECONDS)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    with _schema_lock:
+        if path not in _schema_ready:
+            conn.executescript(_SCHEMA)
+            _schema_ready.add(path)
+    _local.conn, _local.path = conn, path
+    return conn
+
+
+def _amount(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def filing_key(result):
+    """
+    (EIN, tax year) of an extraction: from its general_info, falling back to
+    the filing name (PDF names start with the EIN and carry the tax period).
+    Returns:
+        tuple: (ein, tax_year), either of which may be None.
+    """
+    general_info = (result.get('data') or {}).get('general_info') or {}
+    file_name = result.get('file') or ''
+    ein = re.sub(r'\D', '', str(general_info.get('ein') or ''))
+    if len(ein) != 9:
+        match = _EIN_RE.match(file_name)
+        ein = match.group(1) if match else None
+    year = _YEAR_RE.search(str(general_info.get('tax_year') or ''))
+    if year:
+        tax_year = year.group(1)
+    else:
+        tax_period = parse_tax_period(file_name) if ein and file_name.startswith(ein) else None
+        tax_year = tax_period[:4] if tax_period else None
+    return ein, tax_year
+
+
+def save_results(results, job_id=None):
+    """
+    Upserts extraction results keyed by (EIN, tax year) in one transaction.
+    A changed extraction replaces the current row and is added to the
+    history; an identical one only refreshes its timestamp. Results without
+    an EIN or tax year cannot be keyed and are skipped.
+    Args:
+        results (list): {'file', 'data'} dicts, optionally with 'source'.
+        job_id (str): Search job that produced them, recorded for job lookups.
+    Returns:
+        int: Number of results stored.
+    """
+    conn = _connect()
+    now = time.time()
+    stored = 0
+    with conn:
+        for result in results:
+            ein, tax_year = filing_key(result)
+            if not ein or not tax_year:
+                logger.warning(f"Not storing {result.get('file')}: no EIN or tax year")
+                continue
+            data = result.get('data') or {}
+            general_info = data.get('general_info') or {}
+            financial_data = data.get('financial_data') or {}
+            net_assets = financial_data.get('net_assets') or {}
+            data_json = json.dumps(data, sort_keys=True)
+            data_hash = hashlib.sha256(data_json.encode('utf-8')).hexdigest()
+            name = str(general_info.get('name') or '')
+            source = result.get('source', 'gpt')
+
+            row = conn.execute('SELECT id, data_hash FROM filings WHERE ein = ? AND tax_year = ?',
+                               (ein, tax_year)).fetchone()
+            if row is None:
+                filing_id = conn.execute(
+                    'INSERT INTO filings (ein, tax_year, name, name_key, total_revenue, total_expenses, '
+                    'net_assets_end, source, file, data, data_hash, created, updated) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (ein, tax_year, name, normalize_name(name), _amount(financial_data.get('total_revenue')),
+                     _amount(financial_data.get('total_expenses')), _amount(net_assets.get('end_of_year')),
+                     source, result.get('file'), data_json, data_hash, now, now)).lastrowid
+                changed = True
+            else:
+                filing_id = row['id']
+                changed = row['data_hash'] != data_hash
+                if changed:
+                    conn.execute(
+                        'UPDATE filings SET name = ?, name_key = ?, total_revenue = ?, total_expenses = ?, '
+                        'net_assets_end = ?, source = ?, file = ?, data = ?, data_hash = ?, updated = ? '
+                        'WHERE id = ?',
+                        (name, normalize_name(name), _amount(financial_data.get('total_revenue')),
+                         _amount(financial_data.get('total_expenses')), _amount(net_assets.get('end_of_year')),
+                         source, result.get('file'), data_json, data_hash, now, filing_id))
+                else:
+                    conn.execute('UPDATE filings SET updated = ? WHERE id = ?', (now, filing_id))
+            if changed:
+                conn.execute('INSERT INTO filing_history (filing_id, source, file, job_id, data, data_hash, recorded) '
+                             'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                             (filing_id, source, result.get('file'), job_id, data_json, data_hash, now))
+            if job_id:
+                conn.execute('INSERT OR IGNORE INTO job_filings (job_id, filing_id) VALUES (?, ?)',
+                             (job_id, filing_id))
+            stored += 1
+        if stored:
+            conn.execute("UPDATE store_meta SET value = value + 1 WHERE key = 'generation'")
+    logger.info(f"Stored {stored}/{len(results)} results" + (f" for job {job_id}" if job_id else ''))
+    return stored
+
+
+def generation():
+    """
+    Returns the store's write counter; it changes whenever any worker saves
+    results, so cached views built from an older value are stale.
+    """
+    return _connect().execute("SELECT value FROM store_meta WHERE key = 'generation'").fetchone()[0]
+
+
+def filing_hashes():
+    """
+    Returns {filing id: data_hash} for every stored filing, read from the
+    covering hash index so no filing JSON is touched.
+    """
+    return dict(_connect().execute('SELECT id, data_hash FROM filings').fetchall())
+
+
+def get_filing(filing_id):
+    """
+    Returns one stored filing with its data, or None.
+    """
+    row = _connect().execute('SELECT * FROM filings WHERE id = ?', (filing_id,)).fetchone()
+    return {**_row(row, with_data=True), 'data_hash': row['data_hash']} if row else None
+
+
+def _row(row, with_data):
+    filing = {key: row[key] for key in ('id', 'ein', 'tax_year', 'name', 'total_revenue', 'total_expenses',
+                                        'net_assets_end', 'source', 'file', 'updated')}
+    if with_data:
+        filing['data'] = json.loads(row['data'])
+    return filing
+
+
+def query_filings(ein=None, name=None, min_revenue=None, max_revenue=None, year=None, job_id=None,
+                  limit=100, offset=0, with_data=True):
+    """
+    Returns the current extractions matching every given filter, most
+    recently updated first. name matches as a prefix of the normalized
+    organization name.
+    Returns:
+        list: Dicts with id, ein, tax_year, name, total_revenue,
+        total_expenses, net_assets_end, source, file, updated and (with_data) data.
+    """
+    clauses, params = [], []
+    table = 'filings f'
+    if job_id:
+        table += ' JOIN job_filings j ON j.filing_id = f.id AND j.job_id = ?'
+        params.append(job_id)
+    if ein:
+        clauses.append('f.ein = ?')
+        params.append(re.sub(r'\D', '', ein))
+    if name:
+        key = normalize_name(name)
+        clauses.append('f.name_key >= ? AND f.name_key < ?')
+        params.extend([key, key + '\uffff'])
+    if min_revenue is not None:
+        clauses.append('f.total_revenue >= ?')
+        params.append(min_revenue)
+    if max_revenue is not None:
+        clauses.append('f.total_revenue <= ?')
+        params.append(max_revenue)
+    if year:
+        clauses.append('f.tax_year = ?')
+        params.append(str(year))
+    columns = 'f.*' if with_data else ', '.join(
+        f"f.{column}" for column in ('id', 'ein', 'tax_year', 'name', 'total_revenue', 'total_expenses',
+                                     'net_assets_end', 'source', 'file', 'updated'))
+    sql = f"SELECT {columns} FROM {table}"
+    if clauses:
+        sql += ' WHERE ' + ' AND '.join(clauses)
+    sql += ' ORDER BY f.updated DESC, f.id DESC LIMIT ? OFFSET ?'
+    params.extend([limit, offset])
+    return [_row(row, with_data) for row in _connect().execute(sql, params)]
+
+
+def filing_history(ein, tax_year=None):
+    """
+    Returns every recorded version of an EIN's extractions (one tax year, or
+    all), newest first, each with its source, file, job_id and data.
+    """
+    sql = ('SELECT f.ein, f.tax_year, h.source, h.file, h.job_id, h.data, h.recorded '
+           'FROM filing_history h JOIN filings f ON f.id = h.filing_id WHERE f.ein = ?')
+    params = [re.sub(r'\D', '', ein)]
+    if tax_year:
+        sql += ' AND f.tax_year = ?'
+        params.append(str(tax_year))
+    sql += ' ORDER BY h.recorded DESC, h.id DESC'
+    return [{'ein': row['ein'], 'tax_year': row['tax_year'], 'source': row['source'], 'file': row['file'],
+             'job_id': row['job_id'], 'recorded': row['recorded'], 'data': json.loads(row['data'])}
+            for row in _connect().execute(sql, params)]
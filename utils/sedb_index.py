@@ -0,0 +1,326 @@
+# utils/sedb_index.py
+
+# Standard library imports
+import os
+import re
+import csv
+import pickle
+import bisect
+import threading
+from array import array
+
+# Local imports
+from common import CustomLogger
+from config import Config
+
+logger = CustomLogger.get_logger(__name__, log_file=Config.UTILS_LOG_FILE)
+logger.propagate = False
+
+# Bump whenever the on-disk shard layout or the name normalization changes,
+# so stale shards are rebuilt instead of being loaded.
+INDEX_VERSION = 2
+
+# Column positions in the IRS BMF extract (see data/Shared_Entity_Name_Database_(SEDB)/*.csv)
+EIN_INDEX = 0
+NAME_INDEX = 1
+CITY_INDEX = 4
+STATE_INDEX = 5
+SORT_NAME_INDEX = 27
+
+# Fuzzy search tuning: trigrams whose posting list covers more than this share
+# of a shard are only used when the query has nothing rarer, and only the
+# best-overlapping candidates get an exact similarity score.
+COMMON_TRIGRAM_RATIO = 0.05
+MAX_SCORED_CANDIDATES = 200
+MIN_FUZZY_SCORE = 0.3
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_NON_ALNUM_RE = re.compile(r'[^0-9a-z]+')
+
+# In-memory shards for this worker, keyed by CSV path:
+# {csv_path: {'signature': (mtime_ns, size),
+#             'names': {normalized_name: [ein, ...]},
+#             'records': [(ein, name, sort_name, city, state), ...],
+#             'trigrams': {trigram: array of record ids},
+#             'prefix_keys': sorted normalized NAME/SORT_NAME keys,
+#             'prefix_ids': record id for each entry of prefix_keys}}
+_shards = {}
+_lock = threading.Lock()
+
+
+def normalize_name(name):
+    """
+    Normalizes an entity name the same way for indexing and lookup:
+    lowercased with all whitespace removed.
+    """
+    return _WHITESPACE_RE.sub('', name.strip().lower())
+
+
+def _fuzzy_text(name):
+    """
+    Lowercases name and reduces punctuation and whitespace runs to single
+    spaces, padded so word boundaries produce their own trigrams.
+    """
+    return f" {_NON_ALNUM_RE.sub(' ', name.lower()).strip()} "
+
+
+def trigrams(name):
+    """
+    Returns the set of character trigrams of a name, as used by the fuzzy index.
+    """
+    text = _fuzzy_text(name)
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def sedb_csv_files():
+    """
+    Returns the BMF CSV paths that make up the SEDB (SEDB_FOLDER/1..13.csv).
+    """
+    return [os.path.join(Config.SEDB_FOLDER, f"{i}.csv") for i in range(1, 14)]
+
+
+def _shard_path(csv_file):
+    return os.path.join(Config.SEDB_INDEX_DIR, os.path.basename(csv_file) + '.idx.pickle')
+
+
+def _file_signature(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _build_shard(csv_file):
+    """
+    Scans one BMF CSV and builds its shard: the exact normalized NAME -> EINs
+    map, the per-row records, the trigram postings and the sorted prefix keys
+    over both NAME and SORT_NAME.
+    """
+    names = {}
+    records = []
+    postings = {}
+    prefix_entries = []
+    with open(csv_file, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        headers = next(reader, None)
+        if headers is None:
+            logger.warning(f"CSV file {csv_file} is empty.")
+        else:
+            for row in reader:
+                if len(row) <= max(EIN_INDEX, NAME_INDEX):
+                    continue
+                ein = row[EIN_INDEX].strip()
+                name = row[NAME_INDEX].strip()
+                key = normalize_name(name)
+                eins = names.setdefault(key, [])
+                if ein not in eins:
+                    eins.append(ein)
+
+                sort_name = row[SORT_NAME_INDEX].strip() if len(row) > SORT_NAME_INDEX else ''
+                city = row[CITY_INDEX].strip() if len(row) > CITY_INDEX else ''
+                state = row[STATE_INDEX].strip() if len(row) > STATE_INDEX else ''
+                record_id = len(records)
+                records.append((ein, name, sort_name, city, state))
+
+                grams = trigrams(name)
+                prefix_entries.append((key, record_id))
+                if sort_name:
+                    grams |= trigrams(sort_name)
+                    prefix_entries.append((normalize_name(sort_name), record_id))
+                for gram in grams:
+                    posting = postings.get(gram)
+                    if posting is None:
+                        posting = postings[gram] = array('I')
+                    posting.append(record_id)
+
+    prefix_entries.sort()
+    return {
+        'names': names,
+        'records': records,
+        'trigrams': postings,
+        'prefix_keys': [key for key, _ in prefix_entries],
+        'prefix_ids': array('I', (record_id for _, record_id in prefix_entries)),
+    }
+
+
+def _save_shard(csv_file, shard):
+    path = _shard_path(csv_file)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump({'version': INDEX_VERSION, **shard}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    # Atomic swap so concurrent workers never read a half-written shard
+    os.replace(tmp_path, path)
+
+
+def _load_shard(csv_file, signature):
+    """
+    Loads the persisted shard for csv_file if it was built from the same
+    version of the CSV, otherwise returns None.
+    """
+    path = _shard_path(csv_file)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            shard = pickle.load(f)
+    except Exception as e:
+        logger.warning(f"Discarding unreadable SEDB index shard {path}: {e}")
+        return None
+    if shard.get('version') != INDEX_VERSION or shard.get('signature') != signature:
+        return None
+    return shard
+
+
+def _refresh_shard(csv_file):
+    """
+    Makes sure the in-memory shard for csv_file matches the CSV on disk,
+    loading the persisted shard or rebuilding it when the CSV's mtime or size changed.
+    """
+    if not os.path.exists(csv_file):
+        _shards.pop(csv_file, None)
+        return None
+
+    signature = _file_signature(csv_file)
+    shard = _shards.get(csv_file)
+    if shard is not None and shard['signature'] == signature:
+        return shard
+
+    shard = _load_shard(csv_file, signature)
+    if shard is None:
+        logger.info(f"Building SEDB index shard for {os.path.basename(csv_file)}")
+        shard = {'signature': signature, **_build_shard(csv_file)}
+        try:
+            _save_shard(csv_file, shard)
+        except OSError as e:
+            # The in-memory shard is still usable; we just rebuild it next process
+            logger.error(f"Error saving SEDB index shard for {csv_file}: {e}")
+    _shards[csv_file] = shard
+    return shard
+
+
+def refresh_index():
+    """
+    Brings every shard up to date with the SEDB CSVs and returns the
+    shards that are currently loaded, in CSV order.
+    """
+    shards = []
+    with _lock:
+        for csv_file in sedb_csv_files():
+            try:
+                shard = _refresh_shard(csv_file)
+            except Exception as e:
+                logger.error(f"Error indexing SEDB file {csv_file}: {e}")
+                continue
+            if shard is None:
+                logger.warning(f"CSV file not found: {csv_file}")
+                continue
+            shards.append((csv_file, shard))
+    return shards
+
+
+def lookup_eins(entity_name):
+    """
+    Returns the EINs whose normalized NAME equals the normalized entity_name,
+    as (ein, csv_file) pairs in CSV order without duplicates.
+    """
+    key = normalize_name(entity_name)
+    matches = []
+    seen = set()
+    for csv_file, shard in refresh_index():
+        for ein in shard['names'].get(key, ()):
+            if ein not in seen:
+                seen.add(ein)
+                matches.append((ein, csv_file))
+    return matches
+
+
+def _similarity(query_grams, record):
+    """
+    Dice coefficient between the query trigrams and the better of the
+    record's NAME and SORT_NAME.
+    """
+    best = 0.0
+    for candidate in (record[1], record[2]):
+        if not candidate:
+            continue
+        grams = trigrams(candidate)
+        shared = len(query_grams & grams)
+        if shared:
+            best = max(best, 2.0 * shared / (len(query_grams) + len(grams)))
+    return best
+
+
+def _search_shard(shard, key, query_grams, limit):
+    """
+    Returns {record_id: (rank, score, match)} for one shard, where rank orders
+    exact matches before prefix matches before fuzzy matches.
+    """
+    found = {}
+    records = shard['records']
+
+    # Prefix matches over NAME and SORT_NAME via binary search on the sorted keys
+    prefix_keys = shard['prefix_keys']
+    start = bisect.bisect_left(prefix_keys, key)
+    for pos in range(start, min(start + limit * 4, len(prefix_keys))):
+        candidate_key = prefix_keys[pos]
+        if not candidate_key.startswith(key):
+            break
+        record_id = shard['prefix_ids'][pos]
+        rank = 0 if candidate_key == key else 1
+        score = len(key) / len(candidate_key)
+        if record_id not in found or (rank, -score) < found[record_id][:2]:
+            found[record_id] = (rank, -score, 'exact' if rank == 0 else 'prefix')
+
+    # Fuzzy matches: count shared trigrams over the rarer postings, then score
+    # the best-overlapping candidates exactly
+    postings = [shard['trigrams'][g] for g in query_grams if g in shard['trigrams']]
+    if postings:
+        postings.sort(key=len)
+        common_cutoff = max(1, int(len(records) * COMMON_TRIGRAM_RATIO))
+        selective = [p for p in postings if len(p) <= common_cutoff] or postings[:1]
+        overlap = {}
+        for posting in selective:
+            for record_id in posting:
+                overlap[record_id] = overlap.get(record_id, 0) + 1
+        best = sorted(overlap, key=overlap.get, reverse=True)[:MAX_SCORED_CANDIDATES]
+        for record_id in best:
+            if record_id in found:
+                continue
+            score = _similarity(query_grams, records[record_id])
+            if score >= MIN_FUZZY_SCORE:
+                found[record_id] = (2, -score, 'fuzzy')
+    return found
+
+
+def search_entities(query, limit=10):
+    """
+    Ranked exact, prefix and trigram fuzzy search over the NAME and SORT_NAME
+    columns of the SEDB.
+    Args:
+        query (str): Partial or misspelled entity name.
+        limit (int): Maximum number of matches to return.
+    Returns:
+        list: Up to `limit` dicts with ein, name, sort_name, city, state,
+        score and match ('exact', 'prefix' or 'fuzzy'), best first, one per EIN.
+    """
+    key = normalize_name(query)
+    query_grams = trigrams(query)
+    if not key:
+        return []
+
+    ranked = {}
+    for _, shard in refresh_index():
+        for record_id, (rank, neg_score, match) in _search_shard(shard, key, query_grams, limit).items():
+            ein, name, sort_name, city, state = shard['records'][record_id]
+            order = (rank, neg_score, name)
+            if ein in ranked and ranked[ein][0] <= order:
+                continue
+            ranked[ein] = (order, {
+                'ein': ein,
+                'name': name,
+                'sort_name': sort_name,
+                'city': city,
+                'state': state,
+                'score': round(-neg_score, 3),
+                'match': match,
+            })
+    return [entry for _, entry in sorted(ranked.values(), key=lambda item: item[0])[:limit]]
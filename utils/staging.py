@@ -0,0 +1,112 @@
+# utils/staging.py
+
+# Standard library imports
+import os
+import time
+import shutil
+
+# Local imports
+from common import CustomLogger
+from config import Config
+from utils import metrics
+
+logger = CustomLogger.get_logger(__name__, log_file=Config.UTILS_LOG_FILE)
+logger.propagate = False
+
+# Staging strategies tried in order for each Config.STAGING_MODE
+_STRATEGIES = {
+    'link': ('hardlink', 'symlink', 'copy'),
+    'symlink': ('symlink', 'copy'),
+    'copy': ('copy',),
+}
+
+
+def new_stage_stats():
+    """
+    Returns an empty metrics dict for stage_file to accumulate into.
+    """
+    return {
+        'files': 0,
+        'hardlinked': 0,
+        'symlinked': 0,
+        'copied': 0,
+        'skipped': 0,
+        'bytes_copied': 0,
+        'stage_seconds': 0.0,
+    }
+
+
+def _already_staged(src_stat, dest):
+    """
+    True when dest already holds this filing: the same inode, or a file
+    (or symlink target) with the same size and mtime.
+    """
+    try:
+        dest_stat = os.stat(dest)
+    except FileNotFoundError:
+        return False
+    if (dest_stat.st_dev, dest_stat.st_ino) == (src_stat.st_dev, src_stat.st_ino):
+        return True
+    return dest_stat.st_size == src_stat.st_size and dest_stat.st_mtime_ns == src_stat.st_mtime_ns
+
+
+def _remove_stale(dest):
+    if os.path.lexists(dest):
+        os.remove(dest)
+
+
+def stage_file(src, dest_dir, stats=None):
+    """
+    Makes src available in dest_dir without copying bytes where possible:
+    hardlink first, then symlink, and a full copy only when the filesystem
+    allows neither (e.g. across devices). Files already staged with the same
+    size and mtime are left alone.
+    Args:
+        src (str): Path of the filing in PDF_FOLDER.
+        dest_dir (str): Staging directory, e.g. SHARED_ENTITY_990.
+        stats (dict): Optional metrics from new_stage_stats() to update.
+    Returns:
+        str: Path of the staged file.
+    """
+    start = time.perf_counter()
+    if stats is None:
+        stats = new_stage_stats()
+    os.makedirs(dest_dir, exist_ok=True)
+    dest = os.path.join(dest_dir, os.path.basename(src))
+    src_stat = os.stat(src)
+    stats['files'] += 1
+
+    try:
+        if _already_staged(src_stat, dest):
+            stats['skipped'] += 1
+            logger.info(f"Already staged: {os.path.basename(dest)}")
+            metrics.inc('staged_bytes_total', src_stat.st_size, method='skipped')
+            metrics.observe('staging_seconds', time.perf_counter() - start, method='skipped')
+            return dest
+
+        _remove_stale(dest)
+        strategies = _STRATEGIES.get(Config.STAGING_MODE, _STRATEGIES['link'])
+        for strategy in strategies:
+            try:
+                if strategy == 'hardlink':
+                    os.link(src, dest)
+                    stats['hardlinked'] += 1
+                elif strategy == 'symlink':
+                    os.symlink(os.path.abspath(src), dest)
+                    stats['symlinked'] += 1
+                else:
+                    # copy2 keeps the mtime so the next search can skip this file
+                    shutil.copy2(src, dest)
+                    stats['copied'] += 1
+                    stats['bytes_copied'] += src_stat.st_size
+                logger.info(f"Staged {os.path.basename(dest)} via {strategy}")
+                metrics.inc('staged_bytes_total', src_stat.st_size, method=strategy)
+                metrics.observe('staging_seconds', time.perf_counter() - start, method=strategy)
+                return dest
+            except OSError as e:
+                if strategy == strategies[-1]:
+                    raise
+                logger.debug("Could not %s %s: %s. Falling back.", strategy, os.path.basename(src), e)
+                _remove_stale(dest)
+    finally:
+        stats['stage_seconds'] += time.perf_counter() - start
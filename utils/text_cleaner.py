@@ -0,0 +1,137 @@
+# utils/text_cleaner.py
+
+# Standard library imports
+import re
+from collections import Counter
+
+# Local imports
+from config import Config
+from utils.chunking import estimate_tokens
+
+_PAGE_MARKER_RE = re.compile(r'^\[Page \d+\]$')
+_SPACES_RE = re.compile(r'[ \t\u00a0\u2000-\u200a\u202f\u3000]+')
+_DOT_LEADER_RE = re.compile(r'(?:\s?\.){4,}\s?')
+# Explicit page numbers only ("Page 3", "Page 3 of 12", "- 3 -", "3 of 12"); a bare
+# number on its own line is usually a wrapped amount and must never count as repeated
+_PAGE_NUMBER_RE = re.compile(r'\bpage\s*\d+(?:\s*of\s*\d+)?|^-\s*\d{1,3}\s*-$|^\d{1,3}\s*of\s*\d{1,3}$')
+
+
+class _TranslateTable(dict):
+    """
+    str.translate table that removes every non-printable character, private
+    use ones included, except the whitespace the cleaner handles itself: tabs
+    become spaces and carriage returns, form feeds, vertical tabs and
+    line/paragraph separators become newlines. Other code points, in or
+    beyond the BMP, are classified the first time they are seen and cached.
+    """
+
+    def __missing__(self, code):
+        value = code if chr(code).isprintable() else None
+        self[code] = value
+        return value
+
+
+_TRANSLATE_TABLE = _TranslateTable({ord('\n'): '\n', ord('\t'): ' ',
+                                    **{code: '\n' for code in (0x0b, 0x0c, 0x0d, 0x2028, 0x2029)}})
+
+
+def _line_key(line):
+    """
+    Normalizes a line for repeat detection, so "Form 990 (2019) Page 3" and
+    "Form 990 (2019) Page 4", or bare "- 3 -" footers, count as the same line.
+    """
+    return _PAGE_NUMBER_RE.sub('#', line.lower())
+
+
+def _clean_lines(text):
+    """
+    Yields lines with non-printables removed, whitespace runs and dot
+    leaders collapsed (e.g. "Total revenue ....... 1,234" -> "Total revenue 1,234")
+    and trailing space stripped.
+    """
+    for line in text.replace('\r\n', '\n').translate(_TRANSLATE_TABLE).split('\n'):
+        line = _DOT_LEADER_RE.sub(' ', line)
+        yield _SPACES_RE.sub(' ', line).strip()
+
+
+def _split_pages(lines):
+    """
+    Groups lines into pages on their '[Page N]' marker lines. Each page is
+    (marker line or None, content lines).
+    """
+    pages = []
+    marker, content = None, []
+    for line in lines:
+        if _PAGE_MARKER_RE.match(line):
+            if marker is not None or content:
+                pages.append((marker, content))
+            marker, content = line, []
+        else:
+            content.append(line)
+    if marker is not None or content:
+        pages.append((marker, content))
+    return pages
+
+
+def _edge_lines(content):
+    """
+    Indexes of the first and last REPEATED_LINE_WINDOW non-blank lines of a
+    page, where running headers and footers sit.
+    """
+    filled = [index for index, line in enumerate(content) if line]
+    window = Config.REPEATED_LINE_WINDOW
+    return set(filled[:window] + filled[-window:])
+
+
+def _repeated_keys(pages):
+    """
+    Returns the normalized header/footer lines that appear at the edge of
+    at least REPEATED_LINE_MIN_PAGES pages and REPEATED_LINE_RATIO of all pages.
+    """
+    if len(pages) < Config.REPEATED_LINE_MIN_PAGES:
+        return set()
+    counts = Counter()
+    for _, content in pages:
+        counts.update({_line_key(content[index]) for index in _edge_lines(content)
+                       if len(content[index]) <= Config.REPEATED_LINE_MAX_CHARS})
+    threshold = max(Config.REPEATED_LINE_MIN_PAGES, Config.REPEATED_LINE_RATIO * len(pages))
+    return {key for key, count in counts.items() if count >= threshold}
+
+
+def clean_text(raw_text):
+    """
+    Cleans parsed filing text while keeping its line structure: strips
+    non-printable characters through one translate table, collapses space
+    runs and dot leaders in table rows, drops running headers and footers
+    repeated across pages (form titles, "Form 990 (2019) Page N", OMB
+    numbers) and squeezes blank-line runs.
+    Returns:
+        tuple: (cleaned_text, stats) where stats holds chars and estimated
+        tokens before and after, and the number of repeated lines removed.
+    """
+    pages = _split_pages(_clean_lines(raw_text))
+    repeated = _repeated_keys(pages)
+
+    out = []
+    removed = 0
+    for marker, content in pages:
+        if marker is not None:
+            out.append(marker)
+        edges = _edge_lines(content) if repeated else ()
+        for index, line in enumerate(content):
+            if index in edges and _line_key(line) in repeated:
+                removed += 1
+                continue
+            if not line and (not out or not out[-1]):
+                continue
+            out.append(line)
+    cleaned_text = '\n'.join(out).strip('\n')
+
+    stats = {
+        'chars_before': len(raw_text),
+        'chars_after': len(cleaned_text),
+        'tokens_before': estimate_tokens(raw_text),
+        'tokens_after': estimate_tokens(cleaned_text),
+        'repeated_lines_removed': removed,
+    }
+    return cleaned_text, stats
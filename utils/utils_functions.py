@@ -3,19 +3,21 @@
 # Standard library imports
 import os
 import glob
-import shutil
-import re
+import json
 import time
-import csv
-
-# Third-party library imports
-from pdf2image import convert_from_path
-import pytesseract
-import PyPDF2  # For direct text extraction from PDFs
 
 # Local imports
 from common import CustomLogger, log_function
 from config import Config
+from utils.sedb_index import lookup_eins
+from utils.filing_index import find_filings
+from utils.efile_index import find_returns
+from utils.efile_xml import parse_return
+from utils.staging import stage_file
+from utils.parse_engine import parse_documents, join_pages, extract_pages_direct, ocr_page_window, page_windows, page_count
+from utils import parse_cache
+from utils.text_cleaner import clean_text
+from utils.resource_governor import admit, parse_cost
 
 # Initialize custom logger for utils_functions with its own log file
 logger = CustomLogger.get_logger(__name__, log_file=Config.UTILS_LOG_FILE)
@@ -24,66 +26,64 @@ logger.propagate = False
 @log_function(logger)
 def search_csv_for_name(entity_name):
     """
-    Searches all CSV files in the Shared Entity Name Database (SEDB) directory
-    for the given entity_name in column B (index 1). Extracts the corresponding
-    EIN from column A (index 0).
+    Looks up the given entity_name in the Shared Entity Name Database (SEDB)
+    and returns the matching EINs (column A) for the NAME column (column B).
+    Uses the persisted name index in SEDB_INDEX_DIR, which is rebuilt per CSV
+    only when that CSV's mtime or size changes.
     """
     ein_list = []
     try:
-        # Define the path to the SEDB directory
-        sedb_directory = Config.SEDB_FOLDER  # We'll define this in config.py
-        csv_files = [os.path.join(sedb_directory, f"{i}.csv") for i in range(1, 14)]
-        normalized_entity = re.sub(r'\s+', '', entity_name.lower())
-        for csv_file in csv_files:
-            if not os.path.exists(csv_file):
-                logger.warning(f"CSV file not found: {csv_file}")
-                continue
-            with open(csv_file, 'r', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                # Assuming the first row is the header
-                headers = next(reader, None)
-                if headers is None:
-                    logger.warning(f"CSV file {csv_file} is empty.")
-                    continue
-                # Determine the indices for EIN and NAME columns
-                ein_index = 0  # Column A
-                name_index = 1  # Column B
-                for row in reader:
-                    if len(row) <= max(ein_index, name_index):
-                        continue
-                    name = row[name_index].strip().lower()
-                    ein = row[ein_index].strip()
-                    normalized_name = re.sub(r'\s+', '', name)
-                    if normalized_entity == normalized_name and ein not in ein_list:
-                        ein_list.append(ein)
-                        logger.info(f"Found EIN: {ein} for entity: '{entity_name}' in file: {os.path.basename(csv_file)}")
+        for ein, csv_file in lookup_eins(entity_name):
+            ein_list.append(ein)
+            logger.info(f"Found EIN: {ein} for entity: '{entity_name}' in file: {os.path.basename(csv_file)}")
         return ein_list
     except Exception as e:
         logger.error(f"Error searching CSVs: {e}")
         return []
 
 @log_function(logger)
-def search_pdf_by_ein(ein):
+def search_xml_by_ein(ein):
+    """
+    Finds the IRS e-file XML returns of the given EIN through the e-file index.
+    Returns:
+        list: Return records with path, tax_period and return_type.
+    """
+    try:
+        xml_filings = find_returns(ein)
+        logger.info(f"Found {len(xml_filings)} e-file XML returns for EIN: {ein}")
+        return xml_filings
+    except Exception as e:
+        logger.error(f"Error searching e-file XML for EIN '{ein}': {e}")
+        return []
+
+def _covered_period(tax_period, xml_periods):
+    # PDF periods are 'YYYYMM' or just 'YYYY'; XML periods are always 'YYYYMM'
+    return bool(tax_period) and any(period.startswith(tax_period) for period in xml_periods)
+
+@log_function(logger)
+def search_pdf_by_ein(ein, stage_stats=None, dest_dir=None, xml_periods=()):
     """
     Finds PDF files that match the given EIN (first 9 digits of the filename)
-    and copies them to the shared_entity_990 directory.
+    through the filing index and stages them into dest_dir (a job workspace's
+    filings directory, or the shared_entity_990 directory by default).
+    PDFs for a tax period in xml_periods are skipped, since the e-file XML
+    return of that period is used instead.
+    Staging metrics are accumulated into stage_stats when one is passed.
     """
     matched_pdfs = []
     try:
-        pdf_root = Config.PDF_FOLDER
         logger.info(f"Searching PDFs for EIN: {ein}")
-        # Walk through all subdirectories in the PDF_FOLDER
-        for root, dirs, files in os.walk(pdf_root):
-            for file in files:
-                if file.startswith(ein) and file.endswith('.pdf'):
-                    pdf_path = os.path.join(root, file)
-                    try:
-                        os.makedirs(Config.SHARED_ENTITY_990, exist_ok=True)
-                        shutil.copy(pdf_path, Config.SHARED_ENTITY_990)
-                        matched_pdfs.append(os.path.join(Config.SHARED_ENTITY_990, os.path.basename(file)))
-                        logger.info(f"Copied PDF: {os.path.basename(file)}")
-                    except Exception as copy_err:
-                        logger.error(f"Error copying PDF '{pdf_path}': {copy_err}")
+        for filing in find_filings(ein):
+            pdf_path = filing['path']
+            if _covered_period(filing['tax_period'], xml_periods):
+                logger.info(f"Skipping PDF {filing['name']}: e-file XML covers tax period {filing['tax_period']}")
+                continue
+            try:
+                staged_path = stage_file(pdf_path, dest_dir or Config.SHARED_ENTITY_990, stage_stats)
+                matched_pdfs.append(staged_path)
+                logger.info(f"Staged PDF: {filing['name']} (tax period: {filing['tax_period']})")
+            except Exception as stage_err:
+                logger.error(f"Error staging PDF '{pdf_path}': {stage_err}")
         if not matched_pdfs:
             logger.warning(f"No PDFs found for EIN: {ein}")
     except Exception as e:
@@ -102,95 +102,219 @@ def wait_for_pdf(timeout=60):
     return None  # Return None if no PDF is found within the timeout period
 
 @log_function(logger)
-def process_pdfs():
+def process_pdfs(source_dir=None, output_dir=None):
     """
-    Processes all PDFs in the SHARED_ENTITY_990 directory.
-    Uses both direct text extraction and OCR for parsing.
+    Processes all PDFs in the SHARED_ENTITY_990 directory (or source_dir) in
+    parallel across the parse pool. Uses direct text extraction per page and
+    OCR only for the pages without a usable text layer.
+    Filings already in the parse cache (same content hash and extractor
+    version) are written straight from the cache without being parsed.
+    Returns a per-document report list with status, method, pages and timings.
     """
-    pdf_files = glob.glob(os.path.join(Config.SHARED_ENTITY_990, '*.pdf'))
-    logger.info(f"Found {len(pdf_files)} PDF files in {Config.SHARED_ENTITY_990}")
+    source_dir = source_dir or Config.SHARED_ENTITY_990
+    output_dir = output_dir or Config.PARSED_TEXT_DIR
+    pdf_files = sorted(glob.glob(os.path.join(source_dir, '*.pdf')))
+    logger.info(f"Found {len(pdf_files)} PDF files in {source_dir}")
 
+    reports = []
+    start_time = time.perf_counter()
+    cache_keys = {}
+    # Cache keys this search claimed, until released: {pdf_path: key}
+    claims = {}
+    claimed = []
+    waiting = []
     for pdf_path in pdf_files:
         try:
-            logger.info(f"Processing PDF: {os.path.basename(pdf_path)}")
-            # First attempt direct text extraction
-            raw_text = extract_text_from_pdf_direct(pdf_path)
-            if not raw_text.strip():
-                logger.info(f"No text extracted using direct method for {os.path.basename(pdf_path)}. Attempting OCR.")
-                # If direct extraction fails, use OCR
-                raw_text = extract_text_from_pdf_ocr(pdf_path)
+            cache_keys[pdf_path] = parse_cache.cache_key(pdf_path)
+            cached_text = parse_cache.get(cache_keys[pdf_path])
+        except OSError as e:
+            logger.error(f"Error reading parse cache for {os.path.basename(pdf_path)}: {e}")
+            cached_text = None
+        if cached_text is not None:
+            reports.append(_write_cached_text(pdf_path, cached_text, output_dir))
+        elif pdf_path in cache_keys and not parse_cache.claim(cache_keys[pdf_path]):
+            # A concurrent search in this worker is already parsing this filing
+            waiting.append(pdf_path)
+        else:
+            claimed.append(pdf_path)
+            if pdf_path in cache_keys:
+                claims[pdf_path] = cache_keys[pdf_path]
+
+    try:
+        reports.extend(_parse_pdfs(claimed, claims, output_dir))
+    finally:
+        # Whatever the parse did not get to release, e.g. when it failed to start
+        for pdf_path in list(claims):
+            _release_claim(claims, pdf_path)
+
+    unresolved = []
+    for pdf_path in waiting:
+        cached_text = parse_cache.wait_for(cache_keys[pdf_path], timeout=Config.PARSE_WAIT_SECONDS)
+        if cached_text is None:
+            # The other parse failed or is taking too long; parse it here
+            unresolved.append(pdf_path)
+        else:
+            reports.append(_write_cached_text(pdf_path, cached_text, output_dir))
+    reports.extend(_parse_pdfs(unresolved, {}, output_dir))
+
+    parsed_here = len(claimed) + len(unresolved)
+    logger.info(f"Processed {len(reports)} PDFs in {time.perf_counter() - start_time:.2f}s "
+                f"({len(pdf_files) - parsed_here} from cache)")
+    return reports
+
+def _parse_pdfs(pdf_paths, claims, output_dir):
+    """
+    Parses pdf_paths through the parse engine, writes each cleaned text to
+    output_dir and stores complete parses of the claimed filings in the parse
+    cache, once the resource governor admits their estimated memory. Each
+    claim is released as soon as its filing is done.
+    Returns the per-document reports.
+    """
+    if not pdf_paths:
+        return []
+    with admit('parse', parse_cost(pdf_paths)):
+        return _parse_admitted(pdf_paths, claims, output_dir)
+
+def _release_claim(claims, pdf_path):
+    """
+    Releases this search's claim on a filing, once: after release another
+    search may claim the same key, and a second release would drop its claim.
+    """
+    key = claims.pop(pdf_path, None)
+    if key is not None:
+        parse_cache.release(key)
+
+def _parse_admitted(pdf_paths, claims, output_dir):
+    reports = []
+    for pdf_path, pages, report in parse_documents(pdf_paths):
+        try:
+            if report['error']:
+                logger.error(f"Error processing PDF {report['pdf']}: {report['error']}")
+            raw_text = join_pages(pages)
             if not raw_text.strip():
-                logger.warning(f"No text extracted from {os.path.basename(pdf_path)}. Skipping file.")
+                logger.warning(f"No text extracted from {report['pdf']}. Skipping file.")
+                report['status'] = 'empty' if not report['error'] else 'failed'
                 continue
 
-            cleaned_text = clean_batch_txt(raw_text)
-            output_filename = os.path.splitext(os.path.basename(pdf_path))[0] + '_parsed.txt'
-            output_path = os.path.join(Config.PARSED_TEXT_DIR, output_filename)
+            cleaned_text, report['clean'] = clean_text(raw_text)
+            logger.info(f"Cleaned {report['pdf']}: {report['clean']}")
+            output_path = _parsed_output_path(pdf_path, output_dir)
             save_text_to_file(cleaned_text, output_path)
+            report['status'] = 'parsed'
+            report['output'] = output_path
+            logger.info(f"Parsed {report['pdf']} via {report['method']}: {report['pages']} pages in {report['seconds']}s")
+            # Only complete parses are cached; failed pages get another try next time
+            if not report['error'] and pdf_path in claims:
+                parse_cache.put(claims[pdf_path], cleaned_text)
         except Exception as e:
-            logger.error(f"Error processing PDF {os.path.basename(pdf_path)}: {e}")
-            pass
+            logger.error(f"Error processing PDF {report['pdf']}: {e}")
+            report['status'] = 'failed'
+            report['error'] = str(e)
+        finally:
+            _release_claim(claims, pdf_path)
+            reports.append(report)
+    return reports
+
+def _write_cached_text(pdf_path, cached_text, output_dir):
+    output_path = _parsed_output_path(pdf_path, output_dir)
+    save_text_to_file(cached_text, output_path)
+    logger.info(f"Parse cache hit for {os.path.basename(pdf_path)}")
+    return {'pdf': os.path.basename(pdf_path), 'method': 'cache', 'status': 'parsed',
+            'output': output_path, 'error': None}
+
+def _parsed_output_path(pdf_path, output_dir):
+    output_filename = os.path.splitext(os.path.basename(pdf_path))[0] + '_parsed.txt'
+    return os.path.join(output_dir, output_filename)
 
 @log_function(logger)
 def extract_text_from_pdf_direct(pdf_path):
     """
     Extracts text from a PDF using PyPDF2 (direct text extraction).
     """
-    try:
-        logger.info(f"Extracting text directly from PDF: {os.path.basename(pdf_path)}")
-        reader = PyPDF2.PdfReader(pdf_path)
-        full_text = []
-        for page_number, page in enumerate(reader.pages, start=1):
-            text = page.extract_text()
-            if text:
-                full_text.append(f"\n[Page {page_number}]\n{text}")
-        combined_text = "\n".join(full_text)
-        logger.info(f"Successfully extracted text directly from PDF: {os.path.basename(pdf_path)}")
-        return combined_text
-    except Exception as e:
-        logger.error(f"Error during direct text extraction for {os.path.basename(pdf_path)}: {e}")
+    logger.info(f"Extracting text directly from PDF: {os.path.basename(pdf_path)}")
+    result = extract_pages_direct(pdf_path)
+    if result['error']:
+        logger.error(f"Error during direct text extraction for {os.path.basename(pdf_path)}: {result['error']}")
         return ""
+    logger.info(f"Successfully extracted text directly from PDF: {os.path.basename(pdf_path)}")
+    return join_pages(result['pages'])
 
 @log_function(logger)
 def extract_text_from_pdf_ocr(pdf_path):
     """
-    Extracts text from a PDF using OCR (pytesseract).
+    Extracts text from a PDF using OCR (pytesseract), rasterizing one page at a time.
     """
-    try:
-        logger.info(f"Converting PDF to images for OCR: {os.path.basename(pdf_path)}")
-        images = convert_from_path(pdf_path, dpi=300)
-        full_text = []
-
-        for page_number, image in enumerate(images, start=1):
-            text = pytesseract.image_to_string(image)
-            if text:
-                full_text.append(f"\n[Page {page_number}]\n{text}")
-        combined_text = "\n".join(full_text)
-        logger.info(f"Successfully extracted text via OCR from PDF: {os.path.basename(pdf_path)}")
-        return combined_text
-    except Exception as e:
-        logger.error(f"Error during OCR for {os.path.basename(pdf_path)}: {e}")
+    logger.info(f"Converting PDF to images for OCR: {os.path.basename(pdf_path)}")
+    pages_in_pdf = page_count(pdf_path)
+    if not pages_in_pdf:
+        logger.error(f"Error during OCR for {os.path.basename(pdf_path)}: page count unavailable")
         return ""
+    pages = []
+    for first_page, last_page in page_windows(range(1, pages_in_pdf + 1)):
+        result = ocr_page_window(pdf_path, first_page, last_page)
+        if result['error']:
+            logger.error(f"Error during OCR for {os.path.basename(pdf_path)}: {result['error']}")
+            return ""
+        pages.extend(result['pages'])
+    logger.info(f"Successfully extracted text via OCR from PDF: {os.path.basename(pdf_path)}")
+    return join_pages(pages)
 
 def clean_batch_txt(raw_text):
     """
-    Cleans the raw text extracted from the PDF.
+    Cleans the raw text extracted from the PDF, keeping its line structure
+    and dropping headers/footers repeated on every page.
     """
     try:
         logger.info("Cleaning extracted text...")
-        # Preserve headings and key naming conventions
-        # Remove unnecessary whitespace but keep line breaks
-        cleaned_text = re.sub(r'[ \t]+', ' ', raw_text)
-        # Normalize line endings
-        cleaned_text = cleaned_text.replace('\r\n', '\n').replace('\r', '\n')
-        # Remove non-printable characters
-        cleaned_text = ''.join(c for c in cleaned_text if c.isprintable())
-        logger.info("Text cleaned successfully.")
+        cleaned_text, stats = clean_text(raw_text)
+        logger.info(f"Text cleaned successfully: {stats}")
         return cleaned_text
     except Exception as e:
         logger.error(f"Error during text cleaning: {e}")
         return raw_text
 
+@log_function(logger)
+def process_xml_filings(xml_filings, output_dir):
+    """
+    Parses e-file XML returns straight into schema-shaped JSON files in
+    output_dir, next to the parsed text of PDF filings. No OCR or GPT call
+    is involved.
+    Returns:
+        list: Per-return reports with file, tax_period, status, seconds and error.
+    """
+    reports = []
+    for filing in xml_filings:
+        start = time.perf_counter()
+        report = {'file': filing['name'], 'tax_period': filing['tax_period'], 'status': 'failed', 'error': None}
+        try:
+            data = parse_return(filing['path'])
+            output_path = os.path.join(output_dir, os.path.splitext(filing['name'])[0] + '.json')
+            with open(output_path, 'w', encoding='utf-8') as f:
+                json.dump({'file': filing['name'], 'source': 'efile_xml', 'data': data}, f, indent=2)
+            report['status'] = 'parsed'
+        except Exception as e:
+            logger.error(f"Error parsing e-file XML {filing['path']}: {e}")
+            report['error'] = str(e)
+        report['seconds'] = round(time.perf_counter() - start, 3)
+        reports.append(report)
+    return reports
+
+@log_function(logger)
+def get_xml_results(directory):
+    """
+    Loads the e-file XML results written by process_xml_filings.
+    Returns:
+        list: {'file', 'source', 'data'} dicts in file name order.
+    """
+    results = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                results.append(json.load(f))
+        except (OSError, ValueError) as e:
+            logger.error(f"Error reading e-file XML result {path}: {e}")
+    return results
+
 @log_function(logger)
 def get_parsed_files(directory):
     """
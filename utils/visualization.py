@@ -0,0 +1,85 @@
+# utils/visualization.py
+
+# Local imports
+from config import Config
+from utils.sedb_index import normalize_name
+
+
+def _add_node(nodes, node_id, label, group):
+    if node_id not in nodes:
+        nodes[node_id] = {'id': node_id, 'label': label, 'group': group}
+
+
+def network_graph(filings, max_nodes=None):
+    """
+    Builds the vis.js network of the filing organizations and their board
+    members, grant recipients and related entities. Nodes are deduplicated
+    across filings (organizations by EIN, others by normalized name) and
+    the graph stops growing at max_nodes (DASHBOARD_GRAPH_MAX_NODES).
+    Returns:
+        dict: nodes, edges and truncated (True when nodes were dropped).
+    """
+    max_nodes = max_nodes or Config.DASHBOARD_GRAPH_MAX_NODES
+    nodes = {}
+    edges = {}
+    truncated = False
+
+    def link(source, target_id, label, group, edge_label):
+        nonlocal truncated
+        if target_id not in nodes and len(nodes) >= max_nodes:
+            truncated = True
+            return
+        _add_node(nodes, target_id, label, group)
+        edges.setdefault((source, target_id), {'from': source, 'to': target_id, 'label': edge_label})
+
+    for filing in filings:
+        data = filing.get('data') or {}
+        org_id = f"org:{filing['ein']}"
+        if org_id not in nodes and len(nodes) >= max_nodes:
+            truncated = True
+            continue
+        _add_node(nodes, org_id, filing.get('name') or filing['ein'], 'organization')
+        for member in data.get('board_members') or []:
+            if member.get('name'):
+                link(org_id, f"person:{normalize_name(member['name'])}", member['name'], 'person',
+                     member.get('title') or '')
+        for grant in (data.get('grants') or {}).get('paid') or []:
+            if grant.get('recipient'):
+                link(org_id, f"name:{normalize_name(grant['recipient'])}", grant['recipient'], 'grantee', 'grant')
+        for entity in data.get('related_entities') or []:
+            if not entity.get('name') and not entity.get('ein'):
+                continue
+            entity_id = f"org:{entity['ein']}" if entity.get('ein') else f"name:{normalize_name(entity['name'])}"
+            link(org_id, entity_id, entity.get('name') or entity['ein'], 'related',
+                 entity.get('relationship') or '')
+    return {'nodes': list(nodes.values()), 'edges': list(edges.values()), 'truncated': truncated}
+
+
+def bar_chart(filings):
+    """
+    Revenue/expense and net asset series for the charts, oldest tax year
+    first. Points are labeled with the year, plus the organization name
+    when the filings span several EINs.
+    """
+    several = len({filing['ein'] for filing in filings}) > 1
+    revenue_vs_expenses = []
+    assets_over_time = []
+    for filing in sorted(filings, key=lambda filing: (filing['tax_year'], filing['ein'])):
+        label = f"{filing['tax_year']} {filing.get('name') or filing['ein']}" if several else filing['tax_year']
+        revenue_vs_expenses.append({'year': label, 'total_revenue': filing.get('total_revenue') or 0,
+                                    'total_expenses': filing.get('total_expenses') or 0})
+        assets_over_time.append({'year': label, 'net_assets': filing.get('net_assets_end') or 0})
+    return {'revenue_vs_expenses': revenue_vs_expenses, 'assets_over_time': assets_over_time}
+
+
+def dashboard_payload(filings):
+    """
+    Precomputes what the dashboard renders for a set of stored filings
+    (most recently updated first): the network graph, the chart series and
+    the analysis summary of the newest filing.
+    """
+    analysis_summary = (filings[0].get('data') or {}).get('analysis_summary', {}) if filings else {}
+    return {
+        'visualization': {'network_graph': network_graph(filings), 'bar_chart': bar_chart(filings)},
+        'analysis_summary': analysis_summary,
+    }
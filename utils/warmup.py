@@ -0,0 +1,79 @@
+# utils/warmup.py
+
+# Standard library imports
+import gc
+import time
+import importlib
+import threading
+
+# Local imports
+from common import CustomLogger
+from config import Config
+
+logger = CustomLogger.get_logger(__name__, log_file=Config.UTILS_LOG_FILE)
+logger.propagate = False
+
+# Modules the web and job workers import on first use; loading them before
+# the fork puts their code and objects in pages every worker shares
+PRELOAD_MODULES = ('openai', 'httpx', 'tenacity', 'PyPDF2', 'pdf2image', 'pytesseract', 'utils.job_queue')
+
+_warmed = None
+_lock = threading.Lock()
+
+
+def _load_indexes():
+    from utils import sedb_index, filing_index, efile_index
+    shards = sedb_index.refresh_index()
+    filing_index.refresh_index()
+    if Config.EFILE_XML_ENABLED:
+        efile_index.refresh_index()
+    return f"{len(shards)} SEDB shards"
+
+
+def _load_template():
+    from utils.prompt_templates import get_template
+    template = get_template()
+    return f"{template['prefix_tokens']} prefix tokens" if template else 'no template'
+
+
+def warmup():
+    """
+    Loads what each worker would otherwise load on its first request: the
+    lazily imported libraries, the SEDB, filing and e-file indexes and the
+    compiled prompt template. Meant for the parent process of pre-forking
+    servers (PREWARM; gunicorn --preload, the Celery prefork pool), so the
+    forked workers share all of it copy-on-write. The loaded objects are then
+    frozen out of the garbage collector, whose passes would otherwise write
+    to, and so copy, every shared page they visit.
+    Runs once per process; a failing step is logged and skipped.
+    Returns:
+        dict: Seconds and outcome per step.
+    """
+    global _warmed
+    with _lock:
+        if _warmed is not None:
+            return _warmed
+        steps = {}
+        start = time.perf_counter()
+        for module in PRELOAD_MODULES:
+            step_start = time.perf_counter()
+            try:
+                importlib.import_module(module)
+                steps[f"import {module}"] = {'seconds': round(time.perf_counter() - step_start, 3), 'result': 'ok'}
+            except Exception as e:
+                logger.warning(f"Warmup could not import {module}: {e}")
+                steps[f"import {module}"] = {'seconds': 0.0, 'result': f"failed: {e}"}
+        for name, step in (('indexes', _load_indexes), ('prompt_template', _load_template)):
+            step_start = time.perf_counter()
+            try:
+                result = step()
+            except Exception as e:
+                logger.error(f"Warmup step {name} failed: {e}")
+                result = f"failed: {e}"
+            steps[name] = {'seconds': round(time.perf_counter() - step_start, 3), 'result': result}
+        gc.collect()
+        gc.freeze()
+        _warmed = steps
+        logger.info(f"Warmup finished in {time.perf_counter() - start:.2f}s: "
+                    + ', '.join(f"{name} {step['seconds']}s" for name, step in steps.items()))
+        return steps
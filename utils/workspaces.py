@@ -0,0 +1,122 @@
+# utils/workspaces.py
+
+# Standard library imports
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import threading
+
+# Local imports
+from common import CustomLogger
+from config import Config
+
+logger = CustomLogger.get_logger(__name__, log_file=Config.UTILS_LOG_FILE)
+logger.propagate = False
+
+_JOB_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+_META_FILE = 'job.json'
+
+# Time of the last purge in this worker, so purging stays off the hot path
+_last_purge = None
+_lock = threading.Lock()
+
+
+def _workspace(job_id):
+    root = os.path.join(Config.JOBS_DIR, job_id)
+    return {
+        'job_id': job_id,
+        'root': root,
+        'filings_dir': os.path.join(root, 'filings'),
+        'parsed_dir': os.path.join(root, 'parsed'),
+    }
+
+
+def create_workspace(entity_name=None):
+    """
+    Creates an isolated workspace for one search under JOBS_DIR: a filings
+    directory to stage PDFs into and a parsed directory for the cleaned text
+    (extraction results go to the results store under the job_id). Expired
+    workspaces are purged first.
+    Returns:
+        dict: job_id, root, filings_dir and parsed_dir.
+    """
+    purge_expired()
+    workspace = _workspace(uuid.uuid4().hex)
+    os.makedirs(workspace['filings_dir'])
+    os.makedirs(workspace['parsed_dir'])
+    with open(os.path.join(workspace['root'], _META_FILE), 'w', encoding='utf-8') as f:
+        json.dump({'job_id': workspace['job_id'], 'entity_name': entity_name, 'created': time.time()}, f)
+    logger.info(f"Created job workspace {workspace['job_id']} for '{entity_name}'")
+    return workspace
+
+
+def get_workspace(job_id):
+    """
+    Returns the workspace for job_id, or None if the ID is malformed or the
+    workspace has expired. Access refreshes its retention clock.
+    """
+    if not job_id or not _JOB_ID_RE.match(job_id):
+        return None
+    workspace = _workspace(job_id)
+    meta_path = os.path.join(workspace['root'], _META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    os.utime(meta_path)
+    return workspace
+
+
+def release_filings(workspace):
+    """
+    Removes the staged filings once they are parsed. They are links (or
+    copies) of PDF_FOLDER files, so nothing is lost; the parsed text stays.
+    """
+    if Config.JOB_KEEP_FILINGS:
+        return
+    shutil.rmtree(workspace['filings_dir'], ignore_errors=True)
+
+
+def remove_workspace(workspace):
+    shutil.rmtree(workspace['root'], ignore_errors=True)
+    logger.info(f"Removed job workspace {workspace['job_id']}")
+
+
+def purge_expired(force=False):
+    """
+    Deletes workspaces idle for longer than JOB_RETENTION_SECONDS, then the
+    least recently used ones beyond JOB_MAX_WORKSPACES. Runs at most once per
+    JOB_PURGE_INTERVAL_SECONDS per worker unless force is set.
+    Returns:
+        int: Number of workspaces removed.
+    """
+    global _last_purge
+    now = time.time()
+    with _lock:
+        if not force and _last_purge is not None and now - _last_purge < Config.JOB_PURGE_INTERVAL_SECONDS:
+            return 0
+        _last_purge = now
+
+    if not os.path.isdir(Config.JOBS_DIR):
+        return 0
+    workspaces = []
+    for entry in os.scandir(Config.JOBS_DIR):
+        if not entry.is_dir() or not _JOB_ID_RE.match(entry.name):
+            continue
+        try:
+            last_used = os.stat(os.path.join(entry.path, _META_FILE)).st_mtime
+        except FileNotFoundError:
+            # Half-created or half-removed workspace: age it by the directory itself
+            last_used = entry.stat().st_mtime
+        workspaces.append((last_used, entry.name))
+
+    workspaces.sort(reverse=True)
+    removed = 0
+    for position, (last_used, job_id) in enumerate(workspaces):
+        if now - last_used > Config.JOB_RETENTION_SECONDS or position >= Config.JOB_MAX_WORKSPACES:
+            remove_workspace(_workspace(job_id))
+            removed += 1
+    if removed:
+        logger.info(f"Purged {removed} expired job workspaces")
+    return removed